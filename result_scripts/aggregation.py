@@ -0,0 +1,241 @@
+import json
+import math
+import sys
+from collections import Counter
+from itertools import islice
+import numpy as np
+
+# Shared by the task scripts: each output file is read once, in batches of lines parsed by a
+# single json.loads call, into NumPy columns with labels such as tar names dictionary-encoded;
+# all per-tar and overall numbers are then grouped array operations instead of per-line
+# dictionary updates. Page counts, the largest output, are folded batch by batch into
+# RunningStats instead of being kept as columns.
+
+BATCH_LINES = 100000
+
+
+class Labels:
+    """Encodes labels as integer codes in order of first appearance, like filling a dict."""
+
+    def __init__(self):
+        self.codes = {}
+
+    def encode(self, labels):
+        codes = self.codes
+        return np.fromiter((codes.setdefault(label, len(codes)) for label in labels),
+                           dtype=np.int64, count=len(labels))
+
+    @property
+    def labels(self):
+        return list(self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+
+def parse_lines(lines, skip_invalid=False):
+    for line in lines:
+        try:
+            yield json.loads(line.strip())
+        except json.JSONDecodeError:
+            if not skip_invalid:
+                raise
+            print("Skipping invalid JSON line", file=sys.stderr)
+
+def read_batches(file_path, skip_invalid=False):
+    """The records of a JSONL file in lists of up to BATCH_LINES."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        while True:
+            lines = list(islice(f, BATCH_LINES))
+            if not lines:
+                return
+            try:
+                # One parser call for the whole batch instead of one per line
+                yield json.loads('[' + ','.join(lines) + ']')
+            except json.JSONDecodeError:
+                yield list(parse_lines(lines, skip_invalid))
+
+def group_sum(groups, values, n_groups):
+    """Sum of integer values per group."""
+    return np.bincount(groups, weights=values, minlength=n_groups).astype(np.int64)
+
+
+def missing_file_summary(file_path):
+    """task-1: count the Missing .gz / Missing .pdf entries of mapping.jsonl, overall and per tar file."""
+    statuses = Labels()
+    tars = Labels()
+    tar_codes = []
+    is_gz = []
+    total_missing = 0
+    for batch in read_batches(file_path):
+        total_missing += len(batch)
+        status_codes = statuses.encode([data["status"] for data in batch])
+        # Each distinct status is classified once
+        kinds = np.array([1 if "Missing .gz" in status else 2 if "Missing .pdf" in status else 0
+                          for status in statuses.labels], dtype=np.int8)[status_codes]
+        counted = np.flatnonzero(kinds)
+        # Extract tar file name (e.g., "arXiv_pdf_2310_104.tar")
+        tar_codes.append(tars.encode([batch[row]["path"].split("/")[-2] for row in counted]))
+        is_gz.append(kinds[counted] == 1)
+
+    tar_codes = np.concatenate(tar_codes) if tar_codes else np.zeros(0, dtype=np.int64)
+    is_gz = np.concatenate(is_gz) if is_gz else np.zeros(0, dtype=bool)
+    gz_counts = group_sum(tar_codes, is_gz, len(tars))
+    pdf_counts = group_sum(tar_codes, ~is_gz, len(tars))
+    return {
+        "total_missing": total_missing,
+        "missing_gz": int(is_gz.sum()),
+        "missing_pdf": int((~is_gz).sum()),
+        "tar_file_details": {tar: {"missing_gz": int(gz), "missing_pdf": int(pdf)}
+                             for tar, gz, pdf in zip(tars.labels, gz_counts, pdf_counts)}
+    }
+
+def mapped_file_summary(file_path):
+    """task-2: .gz and .pdf files in the mapped directories of every tar pair in mapped.jsonl."""
+    pairs = Labels()
+    pair_codes = []
+    gz_counts = []
+    pdf_counts = []
+    for batch in read_batches(file_path, skip_invalid=True):
+        pair_codes.append(pairs.encode([data.get("tar_pair", "Unknown") for data in batch]))
+        gz_counts.extend(sum(1 for f in data.get("mapped_files", []) if "source_file" in f) for data in batch)
+        pdf_counts.extend(sum(1 for f in data.get("mapped_files", []) if "pdf_file" in f) for data in batch)
+
+    pair_codes = np.concatenate(pair_codes) if pair_codes else np.zeros(0, dtype=np.int64)
+    total_gz = group_sum(pair_codes, np.array(gz_counts, dtype=np.int64), len(pairs))
+    total_pdf = group_sum(pair_codes, np.array(pdf_counts, dtype=np.int64), len(pairs))
+    return {pair: {"total_gz": int(gz), "total_pdf": int(pdf)}
+            for pair, gz, pdf in zip(pairs.labels, total_gz, total_pdf)}
+
+def gz_has_data(entry):
+    """Whether a detailed_analysis entry found any figure, table or equation."""
+    for file_analysis in entry.get("analysis", {}).get("files", []):
+        file_data = file_analysis.get("analysis", {})
+        if file_data.get("figures") or file_data.get("tables", 0) > 0 or file_data.get("equations", 0) > 0:
+            return True
+    return False
+
+def tar_analysis_summary(file_path):
+    """
+    task-4: sum the stats of all_tar_analysis.jsonl overall and per tar, and count the .gz files
+    with at least one figure, table or equation per tar and overall (by file name).
+    Returns total_stats, tar_stats, the per-tar .gz counts and the overall .gz count.
+    """
+    tars = Labels()
+    stat_keys = Labels()
+    stat_rows = []
+    tar_keys = {}
+    gz_files = Labels()
+    gz_tar_codes = []
+    gz_codes = []
+    for batch in read_batches(file_path):
+        for data in batch:
+            tar_code = tars.encode([data.get("tar_file", "unknown")])[0]
+            stats = data.get("stats", {})
+            key_codes = stat_keys.encode(list(stats))
+            stat_rows.append((tar_code, key_codes, list(stats.values())))
+            # Keys keep the order they were first seen in for each tar
+            tar_keys.setdefault(tar_code, {}).update(dict.fromkeys(key_codes.tolist()))
+
+            gz_with_data = [entry.get("file", "unknown") for entry in data.get("detailed_analysis", [])
+                            if gz_has_data(entry)]
+            gz_codes.append(gz_files.encode(gz_with_data))
+            gz_tar_codes.append(np.full(len(gz_with_data), tar_code, dtype=np.int64))
+
+    # One row of stat columns per record, summed per tar and overall
+    values = np.zeros((len(stat_rows), len(stat_keys)), dtype=np.int64)
+    record_tars = np.zeros(len(stat_rows), dtype=np.int64)
+    for row, (tar_code, key_codes, stat_values) in enumerate(stat_rows):
+        record_tars[row] = tar_code
+        values[row, key_codes] = stat_values
+    per_tar = np.zeros((len(tars), len(stat_keys)), dtype=np.int64)
+    np.add.at(per_tar, record_tars, values)
+
+    total_stats = dict(zip(stat_keys.labels, values.sum(axis=0).tolist()))
+    key_labels = stat_keys.labels
+    tar_stats = {tar: {key_labels[key_code]: int(per_tar[tar_code, key_code]) for key_code in tar_keys[tar_code]}
+                 for tar_code, tar in enumerate(tars.labels)}
+
+    # Distinct (tar, .gz) pairs and distinct .gz names with data
+    gz_codes = np.concatenate(gz_codes) if gz_codes else np.zeros(0, dtype=np.int64)
+    gz_tar_codes = np.concatenate(gz_tar_codes) if gz_tar_codes else np.zeros(0, dtype=np.int64)
+    n_gz = max(len(gz_files), 1)
+    distinct = np.unique(gz_tar_codes * n_gz + gz_codes)
+    tar_gz_count = np.bincount(distinct // n_gz, minlength=len(tars))
+    return (total_stats, tar_stats,
+            {tar: int(count) for tar, count in zip(tars.labels, tar_gz_count)},
+            len(np.unique(gz_codes)))
+
+
+class RunningStats:
+    """
+    Count, sum, sum of squares, the first smallest and largest value with their labels and a
+    histogram with one bin per (integer) value, updated batch by batch: memory grows with the
+    number of distinct values, not with the number of values.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.total_squares = 0
+        self.min_value = self.max_value = None
+        self.min_label = self.max_label = None
+        self.histogram = Counter()
+
+    def update(self, values, labels):
+        """Add an integer array of values with one label each; on ties the earliest value is kept."""
+        self.count += len(values)
+        self.total += int(values.sum())
+        self.total_squares += int((values * values).sum())
+        low, high = int(np.argmin(values)), int(np.argmax(values))
+        if self.min_value is None or values[low] < self.min_value:
+            self.min_value, self.min_label = int(values[low]), labels[low]
+        if self.max_value is None or values[high] > self.max_value:
+            self.max_value, self.max_label = int(values[high]), labels[high]
+        found, counts = np.unique(values, return_counts=True)
+        self.histogram.update(dict(zip(found.tolist(), counts.tolist())))
+
+    def merge(self, other):
+        """Add the values of another RunningStats as coming after this one's."""
+        self.count += other.count
+        self.total += other.total
+        self.total_squares += other.total_squares
+        if other.count and (self.min_value is None or other.min_value < self.min_value):
+            self.min_value, self.min_label = other.min_value, other.min_label
+        if other.count and (self.max_value is None or other.max_value > self.max_value):
+            self.max_value, self.max_label = other.max_value, other.max_label
+        self.histogram.update(other.histogram)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    @property
+    def std(self):
+        """Population standard deviation, like np.std."""
+        if not self.count:
+            return 0
+        return math.sqrt(max(self.count * self.total_squares - self.total * self.total, 0)) / self.count
+
+
+def page_count_stats(file_path):
+    """
+    task6: RunningStats of the page counts of pdf_page_counts.jsonl per subdirectory (the tar
+    each PDF came from), labelled with the file names, in order of first appearance.
+    Only one batch of the file is in memory at a time.
+    """
+    subdirs = Labels()
+    stats = []
+    for batch in read_batches(file_path):
+        paths = [obj["filepath"].split("/")[-2:] for obj in batch]
+        groups = subdirs.encode([path[0] for path in paths])
+        filenames = [path[1] for path in paths]
+        page_counts = np.array([obj["page_count"] for obj in batch], dtype=np.int64)
+        stats.extend(RunningStats() for _ in range(len(subdirs) - len(stats)))
+
+        # The rows of each subdir in file order, one update per subdir found in the batch
+        order = np.argsort(groups, kind='stable')
+        for rows in np.split(order, np.flatnonzero(np.diff(groups[order])) + 1):
+            if len(rows):
+                stats[groups[rows[0]]].update(page_counts[rows], [filenames[row] for row in rows])
+    return dict(zip(subdirs.labels, stats))
@@ -1,26 +1,8 @@
-import json
-import sys
-from collections import defaultdict
+from aggregation import mapped_file_summary
 
 def process_jsonl(file_path):
-    tar_summary = defaultdict(lambda: {"total_gz": 0, "total_pdf": 0})
-    
-    with open(file_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            try:
-                data = json.loads(line.strip())
-                tar_name = data.get("tar_pair", "Unknown")
-                
-                gz_count = sum(1 for f in data.get("mapped_files", []) if "source_file" in f)
-                pdf_count = sum(1 for f in data.get("mapped_files", []) if "pdf_file" in f)
-                
-                tar_summary[tar_name]["total_gz"] += gz_count
-                tar_summary[tar_name]["total_pdf"] += pdf_count
-            except json.JSONDecodeError:
-                print("Skipping invalid JSON line", file=sys.stderr)
-                continue
-    
-    return tar_summary
+    # Per tar pair .gz/.pdf totals, summed with grouped array operations (see aggregation.py)
+    return mapped_file_summary(file_path)
 
 def main():
     file_path = "mapped.jsonl"  # Change this to your actual file path
@@ -1,51 +1,12 @@
-import json
-from collections import defaultdict
+from aggregation import tar_analysis_summary
 
 # Path to JSONL file
 jsonl_file = "all_tar_analysis.jsonl"
 output_txt = "tar_analysis_results.txt"
 
 def process_jsonl(file_path):
-    total_stats = defaultdict(int)
-    tar_stats = defaultdict(lambda: defaultdict(int))
-    tar_gz_count = defaultdict(set)
-    total_gz_with_data = set()
-
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            data = json.loads(line)
-            tar_name = data.get("tar_file", "unknown")
-            stats = data.get("stats", {})
-            detailed_analysis = data.get("detailed_analysis", [])
-            
-            # Aggregate totals
-            for key, value in stats.items():
-                total_stats[key] += value
-            
-            # Aggregate per tar file
-            for key, value in stats.items():
-                tar_stats[tar_name][key] += value
-            
-            # Track .gz files with data
-            for entry in detailed_analysis:
-                gz_file = entry.get("file", "unknown")
-                analysis = entry.get("analysis", {}).get("files", [])
-                
-                figures, tables, equations = 0, 0, 0
-                missing_figures = 0
-                
-                for file_analysis in analysis:
-                    file_data = file_analysis.get("analysis", {})
-                    figures += len(file_data.get("figures", []))
-                    tables += file_data.get("tables", 0)
-                    equations += file_data.get("equations", 0)
-                    missing_figures += len(file_analysis.get("missing_figures", []))
-                
-                if figures > 0 or tables > 0 or equations > 0:
-                    tar_gz_count[tar_name].add(gz_file)
-                    total_gz_with_data.add(gz_file)
-    
-    return total_stats, tar_stats, tar_gz_count, len(total_gz_with_data)
+    # Stats summed per tar and overall, and .gz files with data counted, as array operations (see aggregation.py)
+    return tar_analysis_summary(file_path)
 
 def save_results_to_txt(total_stats, tar_stats, tar_gz_count, total_gz_count, file_path):
     with open(file_path, "w", encoding="utf-8") as f:
@@ -60,7 +21,7 @@ def save_results_to_txt(total_stats, tar_stats, tar_gz_count, total_gz_count, fi
             f.write(f"TAR: {tar}\n")
             for key, value in stats.items():
                 f.write(f"  {key.replace('_', ' ').title()}: {value}\n")
-            f.write(f"  .gz files with figures/tables/equations: {len(tar_gz_count[tar])}\n\n")
+            f.write(f"  .gz files with figures/tables/equations: {tar_gz_count[tar]}\n\n")
 
 def main():
     total_stats, tar_stats, tar_gz_count, total_gz_count = process_jsonl(jsonl_file)
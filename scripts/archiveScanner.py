@@ -0,0 +1,1021 @@
+import os
+import io
+import gzip
+import json
+import time
+import queue
+import tarfile
+import threading
+from pathlib import Path
+
+import figureTable
+import latexType
+import mapping
+import pdfPageCount
+import sourcePDFcopy
+from fileTransfer import DEFAULT_TRANSFER, atomic_write
+from runMetrics import start_tar, finish_tar
+from decodeCache import paper_key, cached_paper
+from sourcePDFcopy import is_source_tar, is_copied_pdf
+
+
+def in_directory(tar_path, directory):
+    """Check whether tar_path sits directly inside directory."""
+    return os.path.abspath(os.path.dirname(tar_path)) == os.path.abspath(directory)
+
+def safe_join(base_dir, member_name):
+    """Join a tar member name onto base_dir, refusing absolute paths and '..' like the 'data' filter."""
+    if os.path.isabs(member_name) or '..' in Path(member_name).parts:
+        raise ValueError(f"Refusing to write {member_name} outside {base_dir}")
+    return os.path.join(base_dir, member_name)
+
+def write_member(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    atomic_write(path, lambda f: f.write(data))
+
+
+class MemberData:
+    """
+    What ArchiveAnalyzer.process_member gets as read: calling it returns the member's bytes
+    (None if it has no data), read from the tar at most once and only if an analyzer asks.
+    In a pipelined scan the bytes are read ahead, and inflated holds the decompressed data of
+    a .gz member for analyzers that use it (None otherwise, or if it could not be decompressed).
+    """
+
+    inflated = None
+
+    def __init__(self, tar=None, member=None):
+        self.tar = tar
+        self.member = member
+        self.loaded = False
+        self.data = None
+
+    @classmethod
+    def read_ahead(cls, data):
+        member_data = cls()
+        member_data.loaded = True
+        member_data.data = data
+        return member_data
+
+    def __call__(self):
+        if not self.loaded:
+            file = self.tar.extractfile(self.member) if self.member.isfile() else None
+            self.data = file.read() if file is not None else None
+            self.loaded = True
+        return self.data
+
+
+class ArchiveAnalyzer:
+    """
+    Base class for analyzers plugged into ArchiveScanner.
+    The scanner calls start_tar, then process_member for every member, then finish_tar
+    with the exception that stopped the scan (or None).
+    Analyzers with a stage are cached: finish_tar sets cache_value to what replay needs
+    to reproduce the tar's outputs on a later run, or leaves it None to not cache the tar.
+    They are also checkpointed: open(resume=True) appends to the outputs of an interrupted run.
+    When the run records metrics, process_member returning True counts the member as analyzed
+    and count() adds the analyzer's own counters (bytes decompressed or written, errors).
+    Analyzers with a store keep their results in a paperStore.PaperStore, and the scanner
+    skips the tars it holds unchanged like checkpointed ones.
+    """
+
+    # Name of the analysis in the result cache and run checkpoints, None if it has neither
+    stage = None
+    cache_value = None
+    # Whether process_member uses read.inflated, so a pipelined scan decompresses .gz members for it
+    uses_inflated = False
+    # runMetrics.TarMetrics of the tar being scanned if the run records metrics, else None
+    tar_metrics = None
+    # paperStore.PaperStore the analyzer's results are kept in, if any
+    store = None
+
+    def open(self, resume=False):
+        pass
+
+    def accepts(self, tar_path):
+        return False
+
+    def cache_tars(self, tar_path):
+        """The tars the cached result of tar_path depends on."""
+        return [tar_path]
+
+    def replay(self, tar_path, value):
+        """Write the outputs of tar_path from a cached value; False if the value can't be used."""
+        return False
+
+    def completes(self, tar_path):
+        """Whether the outputs of cache_tars(tar_path) are all written once tar_path is finished."""
+        return True
+
+    def start_tar(self, tar_path):
+        pass
+
+    def process_member(self, member, read):
+        """read() returns the member's bytes (None if it has no data), see MemberData."""
+        pass
+
+    def finish_tar(self, tar_path, error):
+        pass
+
+    def close(self):
+        pass
+
+    def count(self, **counts):
+        if self.tar_metrics is not None:
+            self.tar_metrics.add(**counts)
+
+
+class FigureTableAnalyzer(ArchiveAnalyzer):
+    """Produces all_tar_analysis.jsonl exactly like figureTable.process_parent_directory."""
+
+    stage = figureTable.CACHE_STAGE
+    uses_inflated = True
+
+    def __init__(self, parent_dir, decode_cache=None, store=None):
+        self.parent_dir = parent_dir
+        self.decode_cache = decode_cache
+        self.store = store
+        self.output_file = os.path.join(parent_dir, "all_tar_analysis.jsonl")
+
+    def open(self, resume=False):
+        self.out = open(self.output_file, 'a' if resume else 'w')
+        self.all_non_processed_files = []
+        self.total_script_start_time = time.time()
+
+    def accepts(self, tar_path):
+        filename = os.path.basename(tar_path)
+        return (in_directory(tar_path, self.parent_dir) and filename.endswith('.tar')
+                and not any(skip in filename for skip in figureTable.skip_files))
+
+    def start_tar(self, tar_path):
+        self.tar_path = tar_path
+        self.stats = figureTable.new_tar_stats()
+        self.detailed_analysis = []
+        self.non_processed_files = []
+        self.tar_start_time = time.time()
+
+    def process_member(self, member, read):
+        if not member.isfile():
+            return
+        self.stats['total_files'] += 1
+        if not member.name.endswith('.gz'):
+            return
+        self.stats['total_gz_files'] += 1
+        data = read()
+        if data is None:
+            self.non_processed_files.append(member.name)
+            self.count(errors=1)
+            return
+        gz_path = os.path.join(os.path.dirname(self.tar_path), member.name)
+        cache_key = paper_key(self.tar_path, member)
+        if read.inflated is not None:
+            contains_latex, latex_category, latex_source_found, latex_analysis = figureTable.inspect_gz_file(
+                gz_path, io.BytesIO(read.inflated), decompressed=True, tar_metrics=self.tar_metrics,
+                decode_cache=self.decode_cache, cache_key=cache_key)
+        else:
+            contains_latex, latex_category, latex_source_found, latex_analysis = figureTable.inspect_gz_file(
+                gz_path, io.BytesIO(data), tar_metrics=self.tar_metrics, decode_cache=self.decode_cache,
+                cache_key=cache_key)
+        figureTable.record_gz_analysis(self.stats, self.detailed_analysis, gz_path, contains_latex, latex_analysis)
+        return True
+
+    def finish_tar(self, tar_path, error):
+        if error is not None:
+            # The original reads the whole header chain before analysing anything, so a
+            # broken tar yields an empty record rather than partial counts.
+            print(f"Error processing tar file {tar_path}: {error}")
+            self.stats = figureTable.new_tar_stats()
+            self.detailed_analysis = []
+            self.non_processed_files.append(tar_path)
+        self.all_non_processed_files.extend(self.non_processed_files)
+
+        tar_processing_time = time.time() - self.tar_start_time
+        result = {
+            'tar_file': os.path.abspath(tar_path),
+            'stats': self.stats,
+            'detailed_analysis': self.detailed_analysis,
+            'processing_time_seconds': tar_processing_time
+        }
+        figureTable.write_result(self.out, tar_path, result)
+        if self.store is not None:
+            self.store.write(self.stage, [tar_path], [result, self.non_processed_files], retry=error is not None)
+        if error is None:
+            self.cache_value = [result, self.non_processed_files]
+
+    def replay(self, tar_path, value):
+        result, non_processed_files = value
+        print(f"Using cached result for {tar_path}")
+        self.all_non_processed_files.extend(non_processed_files)
+        figureTable.write_result(self.out, tar_path, result)
+        if self.store is not None:
+            self.store.write(self.stage, [tar_path], value)
+        return True
+
+    def close(self):
+        self.out.close()
+        if self.store is not None:
+            self.store.export(self.stage, self.parent_dir, self.output_file)
+        print(f"All results saved to {self.output_file}")
+        print(f"Non-processed files (corrupted): {len(self.all_non_processed_files)}")
+        print(f"Non-processed files list: {self.all_non_processed_files}")
+        print(f"Total script running time: {time.time() - self.total_script_start_time:.2f} seconds")
+
+
+class LatexTypeAnalyzer(ArchiveAnalyzer):
+    """Produces insideTarAnalysis.jsonl and insideTarAnalysisNumbers.jsonl like latexType.process_parent_directory."""
+
+    def __init__(self, parent_dir, latex_mode='full', decode_cache=None, store=None):
+        self.parent_dir = parent_dir
+        self.decode_cache = decode_cache
+        self.store = store
+        self.stage = latexType.latex_stage(latex_mode)
+        self.scan_limit = latexType.latex_scan_limit(latex_mode)
+        self.summary_file = os.path.join(parent_dir, "insideTarAnalysisNumbers.jsonl")
+        self.output_file = os.path.join(parent_dir, "insideTarAnalysis.jsonl")
+
+    def open(self, resume=False):
+        mode = 'a' if resume else 'w'
+        self.summary_f = open(self.summary_file, mode)
+        self.output_f = open(self.output_file, mode)
+        self.processed_files = []
+        self.corrupted_files = []
+
+    def accepts(self, tar_path):
+        return in_directory(tar_path, self.parent_dir) and tar_path.endswith('.tar')
+
+    def start_tar(self, tar_path):
+        self.tar_path = tar_path
+        self.gz_results = []
+        self.tar_start_time = time.time()
+
+    def process_member(self, member, read):
+        if not member.name.endswith('.gz') or member.name.startswith('__MACOSX'):
+            return
+        try:
+            gz_file_obj = io.BytesIO(read() or b'')
+            paper = cached_paper(self.decode_cache, self.tar_path, member)
+            self.gz_results.append(
+                (member.name, latexType.inspect_gz_file(gz_file_obj, self.tar_metrics, self.scan_limit, paper, member.name)))
+        except Exception as e:
+            print(f"Error processing .gz file {member.name} in {self.parent_dir}: {e}")
+            self.count(errors=1)
+        return True
+
+    def finish_tar(self, tar_path, error):
+        if error is not None:
+            print(f"Error processing tar file {tar_path}: {error}")
+            self.corrupted_files.append(tar_path)
+            if self.store is not None:
+                self.store.discard(self.stage, [tar_path])
+            return
+
+        # The original inspects the .gz members sorted by name
+        archive_results = {
+            'tar_file': os.path.abspath(tar_path),
+            'gz_files': [result for _, result in sorted(self.gz_results, key=lambda x: x[0])]
+        }
+        tar_stats = latexType.summarize_archive_results(archive_results, self.tar_start_time)
+        self.write_results(tar_path, archive_results, tar_stats)
+        self.cache_value = [archive_results, tar_stats]
+
+    def replay(self, tar_path, value):
+        print(f"Using cached result for {tar_path}")
+        self.write_results(tar_path, *value)
+        return True
+
+    def write_results(self, tar_path, archive_results, tar_stats):
+        self.output_f.write(json.dumps(archive_results) + '\n')
+        self.output_f.flush()
+
+        self.summary_f.write(json.dumps(tar_stats) + '\n')
+        self.summary_f.flush()
+        if self.store is not None:
+            self.store.write(self.stage, [tar_path], [archive_results, tar_stats])
+
+        print(f"Done processing {tar_path}")
+        self.processed_files.append(tar_path)
+
+    def close(self):
+        self.summary_f.close()
+        self.output_f.close()
+        if self.store is not None:
+            self.store.export(self.stage, self.parent_dir, self.output_file, self.summary_file)
+        print(f"\nProcessing complete. Stats:")
+        print(f"Processed .tar files = {len(self.processed_files)}")
+        print(f"Not processed / Corrupted .tar files = {len(self.corrupted_files)}")
+        if self.corrupted_files:
+            print(f"Corrupted .tar files: {', '.join(self.corrupted_files)}")
+        print(f"Summary saved to {self.summary_file}")
+        print(f"All results saved to {self.output_file}")
+
+
+class SourcePdfCopyAnalyzer(ArchiveAnalyzer):
+    """Copies PDFs embedded in source tars into target_dir like sourcePDFcopy.process_directory."""
+
+    stage = sourcePDFcopy.CACHE_STAGE
+
+    def __init__(self, root_dir, target_dir, output_jsonl):
+        self.root_dir = root_dir
+        self.target_dir = target_dir
+        self.output_jsonl = output_jsonl
+
+    def open(self, resume=False):
+        os.makedirs(self.target_dir, exist_ok=True)
+        self.processed_files = []
+        self.corrupted_files = []
+
+    def accepts(self, tar_path):
+        return in_directory(tar_path, self.root_dir) and is_source_tar(os.path.basename(tar_path))
+
+    def start_tar(self, tar_path):
+        tar_name_without_ext = os.path.splitext(os.path.basename(tar_path))[0]
+        self.target_subdir = os.path.join(self.target_dir, f"{tar_name_without_ext}_test")
+        os.makedirs(self.target_subdir, exist_ok=True)
+        self.pdfs_copied = []
+        self.start_time = time.time()
+
+    def process_member(self, member, read):
+        if not is_copied_pdf(member):
+            return
+        target_pdf_path = os.path.join(self.target_subdir, os.path.basename(member.name))
+        write_member(target_pdf_path, read())
+        self.pdfs_copied.append(os.path.abspath(target_pdf_path))
+        self.count(bytes_written=member.size)
+        return True
+
+    def finish_tar(self, tar_path, error):
+        if error is not None:
+            self.corrupted_files.append(tar_path)
+            return
+
+        result = {
+            "tar_file": os.path.abspath(tar_path),
+            "pdfs_copied": self.pdfs_copied,
+            "total_pdfs_copied": len(self.pdfs_copied),
+            "processing_time_seconds": round(time.time() - self.start_time, 2)
+        }
+        with open(self.output_jsonl, 'a') as jsonl_file:
+            jsonl_file.write(json.dumps(result) + '\n')
+
+        self.processed_files.append(tar_path)
+        print(f"Done processing {tar_path}")
+        self.cache_value = result
+
+    def replay(self, tar_path, value):
+        # The copies themselves are not cached, so they must still be in place
+        if not all(os.path.exists(path) for path in value["pdfs_copied"]):
+            return False
+        print(f"Using cached result for {tar_path}")
+        with open(self.output_jsonl, 'a') as jsonl_file:
+            jsonl_file.write(json.dumps(value) + '\n')
+        self.processed_files.append(tar_path)
+        return True
+
+    def close(self):
+        print(f"\nProcessing complete. Stats:")
+        print(f"Processed .tar files = {len(self.processed_files)}")
+        print(f"Not processed / Corrupted .tar files = {len(self.corrupted_files)}")
+        if self.corrupted_files:
+            print(f"Corrupted .tar files: {', '.join(self.corrupted_files)}")
+
+
+class MappingAnalyzer(ArchiveAnalyzer):
+    """
+    Produces mapping.jsonl, the mapped jsonl and the mapped directory like mapping.compare_directories.
+    Each side of a pair is staged as it is scanned (extracted, or only listed in the 'direct' and
+    'manifest' modes); the pair is recorded once both sides are done. In the 'direct' mode the
+    matched members, known from the other tar's member list, are written straight to their place
+    in the mapped directory as they are scanned.
+    A pair's cached result depends on both of its tars.
+    """
+
+    def __init__(self, src_dir, pdf_dir, mapped_dir="./mapped_data", mapped_jsonl="mapped.jsonl",
+                 mapping_mode='extract', transfer=DEFAULT_TRANSFER):
+        self.src_dir = src_dir
+        self.pdf_dir = pdf_dir
+        self.mapped_dir = mapped_dir
+        self.mapped_jsonl = mapped_jsonl
+        self.mapping_mode = mapping_mode
+        self.transfer = transfer
+        self.stage = mapping.mapping_stage(mapping_mode)
+
+    def open(self, resume=False):
+        os.makedirs(self.mapped_dir, exist_ok=True)
+        self.src_mapping, self.pdf_mapping = mapping.find_tar_pairs(self.src_dir, self.pdf_dir)
+        self.matching_pairs = set(self.src_mapping.keys()) & set(self.pdf_mapping.keys())
+        self.total_stats = []
+        self.unpaired_files = []
+        self.pairs = {}
+        self.replayed = set()
+
+        current_dir = Path(os.getcwd())
+        mode = 'a' if resume else 'w'
+        self.mapping_file = (current_dir / "mapping.jsonl").open(mode)
+        self.mapped_file = (current_dir / self.mapped_jsonl).open(mode)
+
+    def pair_key(self, tar_path):
+        parsed = mapping.parse_filename(os.path.basename(tar_path))
+        if parsed is None:
+            return None, None
+        x, y, file_type = parsed
+        if (x, y) not in self.matching_pairs:
+            return None, None
+        if file_type == 'src' and in_directory(tar_path, self.src_dir):
+            return (x, y), file_type
+        if file_type == 'pdf' and in_directory(tar_path, self.pdf_dir):
+            return (x, y), file_type
+        return None, None
+
+    def accepts(self, tar_path):
+        return self.pair_key(tar_path)[0] is not None
+
+    def cache_tars(self, tar_path):
+        key, _ = self.pair_key(tar_path)
+        return [os.path.join(self.src_dir, self.src_mapping[key]),
+                os.path.join(self.pdf_dir, self.pdf_mapping[key])]
+
+    def replay(self, tar_path, value):
+        key, _ = self.pair_key(tar_path)
+        # The second tar of a replayed pair has nothing left to do
+        if key in self.replayed:
+            return True
+        if key in self.pairs or not mapping.mapped_files_exist(value["mapped_entry"]):
+            return False
+        print(f"Using cached result for pair {key[0]}_{key[1]}")
+        mapping.write_pair_results(self.mapping_file, self.mapped_file,
+                                   value["mapping_entries"], value["mapped_entry"])
+        self.total_stats.append(value["stats"])
+        self.replayed.add(key)
+        return True
+
+    def completes(self, tar_path):
+        # The first tar of a pair only stages its side
+        return self.pair_key(tar_path)[0] not in self.pairs
+
+    def start_tar(self, tar_path):
+        key, file_type = self.pair_key(tar_path)
+        pair_name = f"{key[0]}_{key[1]}"
+        pair = self.pairs.setdefault(key, {'start_time': time.time(), 'written': {}})
+        if file_type == 'src':
+            self.file_ext = ".gz"
+            self.extract_dir = f"./gz_extracted/{pair_name}"
+        else:
+            self.file_ext = ".pdf"
+            self.extract_dir = f"./pdf_extracted/{pair_name}"
+        self.current = (key, file_type)
+        self.pair_name = pair_name
+        if self.mapping_mode == 'extract':
+            Path(self.extract_dir).mkdir(parents=True, exist_ok=True)
+            self.extracted_files = set()
+        else:
+            self.extracted_files = {}
+        if self.mapping_mode == 'direct':
+            # The papers of the other side: as scanned if it was, else from its tar's member list
+            other_type = 'pdf' if file_type == 'src' else 'src'
+            if other_type in pair:
+                self.matched_bases = {base for base, _ in pair[other_type] or {}}
+            else:
+                src_tar, pdf_tar = self.cache_tars(tar_path)
+                self.matched_bases = (mapping.listed_bases(pdf_tar, ".pdf") if file_type == 'src'
+                                      else mapping.listed_bases(src_tar, ".gz"))
+
+    def process_member(self, member, read):
+        if not member.name.lower().endswith(self.file_ext) or "__MACOSX" in member.name:
+            return
+        base_name = os.path.splitext(os.path.basename(member.name))[0]
+        if self.mapping_mode == 'extract':
+            write_member(safe_join(self.extract_dir, member.name), read() or b'')
+            self.extracted_files.add((base_name, member.name))
+            self.count(bytes_written=member.size)
+            return True
+        # Listed like mapping.list_tar
+        self.extracted_files[(base_name, member.name)] = member
+        if self.mapping_mode == 'manifest' or base_name not in self.matched_bases:
+            return
+        # A matched paper's member goes straight to its place in the mapped directory
+        _, src_path, pdf_path = mapping.mapped_paths(self.mapped_dir, self.pair_name, base_name)
+        path = src_path if self.file_ext == ".gz" else pdf_path
+        write_member(path, read() or b'')
+        os.utime(path, (member.mtime, member.mtime))
+        self.pairs[self.current[0]]['written'][path] = base_name
+        self.count(bytes_written=member.size)
+        return True
+
+    def finish_tar(self, tar_path, error):
+        key, file_type = self.current
+        if error is not None:
+            print(f"Error: Unable to read tar file {tar_path}")
+        self.pairs[key][file_type] = None if error is not None else self.extracted_files
+        if 'src' in self.pairs[key] and 'pdf' in self.pairs[key]:
+            self.cache_value = self.record_pair(key)
+
+    def record_pair(self, key):
+        pair = self.pairs.pop(key)
+        x, y = key
+        src_file = self.src_mapping[key]
+        pdf_file = self.pdf_mapping[key]
+        pair_name = f"{x}_{y}"
+        if self.mapping_mode == 'extract':
+            extract_dirs = (f"./gz_extracted/{pair_name}", f"./pdf_extracted/{pair_name}")
+            materialize = None
+        else:
+            extract_dirs = (None, None)
+            materialize = mapping.pair_materializer(
+                self.mapping_mode, self.mapped_dir, pair_name,
+                os.path.join(self.src_dir, src_file), os.path.join(self.pdf_dir, pdf_file), self.tar_metrics,
+                pair['written'])
+        pair_result = mapping.record_tar_pair(
+            pair['src'], pair['pdf'], self.mapping_file, self.mapped_file, pair_name,
+            self.src_dir, self.pdf_dir, src_file, pdf_file, self.mapped_dir,
+            *extract_dirs, pair['start_time'], materialize, self.transfer)
+        if pair_result is None:
+            mapping.remove_written_files(pair['written'])
+            self.unpaired_files.append(f"Corrupted file in pair: {src_file} or {pdf_file}")
+        else:
+            self.total_stats.append(pair_result["stats"])
+        self.mapping_file.flush()
+        self.mapped_file.flush()
+        return pair_result
+
+    def close(self):
+        self.mapping_file.close()
+        self.mapped_file.close()
+        self.unpaired_files.extend(mapping.find_unpaired_files(self.src_mapping, self.pdf_mapping))
+        mapping.print_summary(self.total_stats, self.unpaired_files)
+
+
+class PageCountAnalyzer(ArchiveAnalyzer):
+    """Appends to pdf_page_counts.jsonl like pdfPageCount.process_tar_files, without extracting the tar."""
+
+    def __init__(self, directory, engine=pdfPageCount.DEFAULT_ENGINE):
+        self.directory = directory
+        self.engine = engine
+        self.stage = pdfPageCount.page_count_stage(engine)
+
+    def open(self, resume=False):
+        output_file = Path(os.getcwd()) / "pdf_page_counts.jsonl"
+        self.out = open(output_file, 'a', buffering=1, encoding='utf-8')
+        self.processed_files = []
+        self.corrupted_files = []
+
+    def accepts(self, tar_path):
+        return in_directory(tar_path, self.directory) and tar_path.lower().endswith('.tar')
+
+    def start_tar(self, tar_path):
+        self.tar_path = tar_path
+        self.top_dir = None
+        self.entries = []
+        print(f"Processing {os.path.basename(tar_path)}...")
+
+    def process_member(self, member, read):
+        # Only PDFs directly inside the tar's top-level directory are counted
+        if self.top_dir is None:
+            self.top_dir = member.name.split('/')[0]
+        filename = os.path.basename(member.name)
+        if (not member.isfile() or os.path.dirname(member.name) != self.top_dir
+                or not filename.lower().endswith('.pdf')):
+            return
+        try:
+            num_pages = pdfPageCount.count_pages(read(), self.engine)
+            self.entries.append({
+                "filepath": f"{self.tar_path}/{filename}",
+                "page_count": num_pages
+            })
+        except Exception as e:
+            print(f"Error processing {filename}: {str(e)}")
+            self.count(errors=1)
+        return True
+
+    def finish_tar(self, tar_path, error):
+        tar_filename = os.path.basename(tar_path)
+        if error is not None:
+            print(f"Error processing {tar_filename}: {str(error)}")
+            self.corrupted_files.append(tar_filename)
+            return
+
+        # Entries are only written once the whole tar was read, as with extractall
+        stats = pdfPageCount.page_count_stats([entry["page_count"] for entry in self.entries])
+        pdfPageCount.write_entries(self.out, self.entries)
+        print(f"Done processing {tar_filename}")
+        print(stats)
+        self.processed_files.append(tar_filename)
+        self.cache_value = [self.entries, stats]
+
+    def replay(self, tar_path, value):
+        entries, stats = value
+        print(f"Using cached result for {os.path.basename(tar_path)}")
+        pdfPageCount.write_entries(self.out, entries)
+        print(stats)
+        self.processed_files.append(os.path.basename(tar_path))
+        return True
+
+    def close(self):
+        self.out.close()
+        print(f"\nProcessing complete. Stats:")
+        print(f"Processed .tar files = {len(self.processed_files)}")
+        print(f"Not processed / Corrupted .tar files = {len(self.corrupted_files)}")
+        if self.corrupted_files:
+            print(f"Corrupted .tar files: {', '.join(self.corrupted_files)}")
+
+
+# End of a tar's members in the pipeline queues, followed by the error that ended its read or None
+END_OF_TAR = object()
+
+# Members waiting between two pipeline stages; a member is held with all its data
+PIPELINE_QUEUE_SIZE = 16
+
+# Metrics stage of the scan itself: every tar read, with all its members and the bytes read
+SCAN_STAGE = 'archiveScanner'
+
+
+def stream_members(tar_path):
+    """(member, MemberData) for every member of tar_path, read in stream mode as they are dispatched."""
+    with tarfile.open(tar_path, 'r|') as tar:
+        for member in tar:
+            yield member, MemberData(tar, member)
+
+
+class ArchivePipeline:
+    """
+    Reads tars ahead of their analysis, in the order given: a reader thread walks each tar in
+    stream mode and reads every member's data, a decompress thread inflates the .gz members of
+    the tars in inflate_tars, and the analysis takes the members from the last of two bounded
+    queues. Disk reads and zlib release the GIL, so both overlap with the analyzers' Python work
+    and a scan runs at the pace of whichever of the three is slowest.
+    """
+
+    def __init__(self, tar_paths, inflate_tars=(), queue_size=PIPELINE_QUEUE_SIZE):
+        self.tar_paths = list(tar_paths)
+        self.inflate_tars = set(inflate_tars)
+        self.read_queue = queue.Queue(queue_size)
+        self.ready_queue = queue.Queue(queue_size)
+        self.stopped = threading.Event()
+        # Tars not handed to the analysis yet, and whether the current one was read to its end
+        self.next_index = 0
+        self.finished = True
+        self.threads = [threading.Thread(target=self.read_tars, daemon=True),
+                        threading.Thread(target=self.inflate_members, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, q, item):
+        # A stopped pipeline must not leave its threads blocked on a full queue
+        while not self.stopped.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(self, q):
+        while not self.stopped.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return END_OF_TAR, None
+
+    def read_tars(self):
+        for tar_path in self.tar_paths:
+            error = None
+            try:
+                with tarfile.open(tar_path, 'r|') as tar:
+                    for member in tar:
+                        file = tar.extractfile(member) if member.isfile() else None
+                        if not self.put(self.read_queue, (member, file.read() if file is not None else None)):
+                            return
+            except Exception as e:
+                error = e
+            if not self.put(self.read_queue, (END_OF_TAR, error)):
+                return
+
+    def inflate_members(self):
+        for tar_path in self.tar_paths:
+            inflate = tar_path in self.inflate_tars
+            while not self.stopped.is_set():
+                member, data = self.get(self.read_queue)
+                if member is END_OF_TAR:
+                    self.put(self.ready_queue, (member, data))
+                    break
+                member_data = MemberData.read_ahead(data)
+                if inflate and data is not None and member.name.endswith('.gz'):
+                    try:
+                        member_data.inflated = gzip.decompress(data)
+                    except Exception:
+                        # The analyzer decompresses it itself and reports the error
+                        pass
+                self.put(self.ready_queue, (member, member_data))
+
+    def reads(self, tar_path):
+        """Whether tar_path is the next tar this pipeline has read ahead."""
+        return self.next_index < len(self.tar_paths) and self.tar_paths[self.next_index] == tar_path
+
+    def members(self, tar_path):
+        """(member, MemberData) of tar_path, the next tar; the iteration raises the error that ended its read."""
+        if not self.reads(tar_path):
+            raise ValueError(f"{tar_path} is not the next tar of the pipeline")
+        self.next_index += 1
+        self.finished = False
+        return self.ready_members()
+
+    def ready_members(self):
+        while not self.finished:
+            member, data = self.get(self.ready_queue)
+            if member is END_OF_TAR:
+                self.finished = True
+                if data is not None:
+                    raise data
+                return
+            yield member, data
+
+    def finish(self):
+        """Drop what is left of the current tar, e.g. after its analysis stopped early."""
+        while not self.finished:
+            member, _ = self.get(self.ready_queue)
+            self.finished = member is END_OF_TAR
+
+    def skip(self, tar_path):
+        """Drop all of tar_path, the next tar."""
+        self.members(tar_path)
+        self.finish()
+
+    def close(self):
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+
+
+class ArchiveScanner:
+    """
+    Reads every tar exactly once, in stream mode, and dispatches each member to all
+    analyzers that accept the tar. Member data is only read if an analyzer asks for it.
+    With a ResultCache, analyzers replay the stored results of unchanged tars, and a tar
+    is not read at all when every analyzer accepting it could replay.
+    With a Checkpoint, each analyzer records the tars it has finished; a resumed run skips them.
+    With an outputSink.ParquetSink, every result an analyzer could cache is also written as Parquet.
+    With pipelined, the tars to scan are read (and decompressed) ahead by an ArchivePipeline
+    while the analyzers work, which still see every tar and member in the same order.
+    With runMetrics.Metrics, each analyzer's stage gets a record per tar (or tar pair) timing
+    only that analyzer's calls, and SCAN_STAGE one per tar read; the scan itself is profiled.
+    """
+
+    def __init__(self, analyzers, cache=None, checkpoint=None, sink=None, pipelined=False, metrics=None):
+        self.analyzers = analyzers
+        self.cache = cache
+        self.checkpoint = checkpoint
+        self.sink = sink
+        self.pipelined = pipelined
+        self.pipeline = None
+        self.metrics = metrics
+        # TarMetrics (and error) of pairs whose first tar is scanned, and the tars already recorded
+        self.open_metrics = {}
+        self.recorded_metrics = set()
+
+    def checkpointed(self, analyzer):
+        return self.checkpoint is not None and analyzer.stage is not None
+
+    def done(self, analyzer, tar_path):
+        if analyzer.store is not None and analyzer.store.has(analyzer.stage, analyzer.cache_tars(tar_path)):
+            return True
+        return self.checkpointed(analyzer) and self.checkpoint.done(analyzer.stage, analyzer.cache_tars(tar_path))
+
+    def mark(self, analyzer, tar_path):
+        if self.checkpointed(analyzer) and analyzer.completes(tar_path):
+            self.checkpoint.mark(analyzer.stage, analyzer.cache_tars(tar_path))
+
+    def replay(self, analyzer, tar_path):
+        if self.cache is None or analyzer.stage is None:
+            return False
+        value = self.cache.get(analyzer.stage, analyzer.cache_tars(tar_path))
+        if value is None or not analyzer.replay(tar_path, value):
+            return False
+        if self.sink is not None:
+            self.sink.write(analyzer.stage, analyzer.cache_tars(tar_path), value)
+        return True
+
+    def may_scan(self, analyzer, tar_path):
+        """Whether analyzer will probably need tar_path read, i.e. it has no cached result to replay."""
+        if not analyzer.accepts(tar_path) or self.done(analyzer, tar_path):
+            return False
+        return (self.cache is None or analyzer.stage is None
+                or self.cache.get(analyzer.stage, analyzer.cache_tars(tar_path)) is None)
+
+    def metrics_key(self, analyzer, tar_path):
+        return analyzer.stage, tuple(analyzer.cache_tars(tar_path))
+
+    def start_metrics(self, analyzer, tar_path):
+        """Give analyzer the TarMetrics of tar_path, the one its pair already has if any."""
+        if self.metrics is None:
+            return
+        key = self.metrics_key(analyzer, tar_path)
+        if key in self.open_metrics:
+            analyzer.tar_metrics = self.open_metrics[key][0]
+        else:
+            analyzer.tar_metrics = start_tar(self.metrics, analyzer.stage, key[1])
+
+    def finish_metrics(self, analyzer, tar_path, cached=False, error=None):
+        """Record the TarMetrics of analyzer, or keep it for the rest of a pair it doesn't complete."""
+        tar_metrics = analyzer.tar_metrics
+        if tar_metrics is None:
+            return
+        analyzer.tar_metrics = None
+        key = self.metrics_key(analyzer, tar_path)
+        _, earlier_error = self.open_metrics.pop(key, (None, None))
+        error = error if error is not None else earlier_error
+        if not analyzer.completes(tar_path):
+            self.open_metrics[key] = (tar_metrics, error)
+        elif key not in self.recorded_metrics:
+            # Both tars of a replayed pair replay it, it is recorded once
+            self.recorded_metrics.add(key)
+            finish_tar(self.metrics, tar_metrics, cached, error)
+
+    def timed(self, analyzer, call, *args):
+        """call(*args), adding its time to the wall time of analyzer's TarMetrics."""
+        tar_metrics = analyzer.tar_metrics
+        if tar_metrics is None:
+            return call(*args)
+        tar_metrics.restart()
+        try:
+            return call(*args)
+        finally:
+            tar_metrics.stop()
+
+    def process_member(self, analyzer, member, read):
+        tar_metrics = analyzer.tar_metrics
+        if tar_metrics is None:
+            analyzer.process_member(member, read)
+            return
+        tar_metrics.restart()
+        try:
+            if analyzer.process_member(member, read):
+                tar_metrics.member(member.name, time.perf_counter() - tar_metrics.started, bytes_read=member.size)
+        finally:
+            tar_metrics.stop()
+
+    def start_pipeline(self, tar_paths):
+        read_ahead = []
+        inflate_tars = []
+        for tar_path in tar_paths:
+            scanning = [analyzer for analyzer in self.analyzers if self.may_scan(analyzer, tar_path)]
+            if scanning:
+                read_ahead.append(tar_path)
+            if any(analyzer.uses_inflated for analyzer in scanning):
+                inflate_tars.append(tar_path)
+        self.pipeline = ArchivePipeline(read_ahead, inflate_tars)
+
+    def scan_tar(self, tar_path):
+        scan_metrics = start_tar(self.metrics, SCAN_STAGE, [tar_path])
+        active = []
+        for analyzer in self.analyzers:
+            if not analyzer.accepts(tar_path) or self.done(analyzer, tar_path):
+                continue
+            self.start_metrics(analyzer, tar_path)
+            if self.timed(analyzer, self.replay, analyzer, tar_path):
+                self.finish_metrics(analyzer, tar_path, cached=True)
+                self.mark(analyzer, tar_path)
+            else:
+                active.append(analyzer)
+
+        # A tar read ahead is only skipped if a replay the plan did not expect succeeded,
+        # and one that wasn't (the other way round) is read here like without the pipeline
+        read_ahead = self.pipeline is not None and self.pipeline.reads(tar_path)
+        if not active:
+            if read_ahead:
+                self.pipeline.skip(tar_path)
+            finish_tar(self.metrics, scan_metrics, cached=True)
+            return
+
+        print(f"Scanning {tar_path}...")
+        for analyzer in active:
+            self.timed(analyzer, analyzer.start_tar, tar_path)
+
+        # A failing analyzer is dropped for the rest of this tar without affecting the others
+        errors = {}
+        tar_error = None
+        try:
+            members = self.pipeline.members(tar_path) if read_ahead else stream_members(tar_path)
+            for member, read in members:
+                for analyzer in active:
+                    if analyzer in errors:
+                        continue
+                    try:
+                        self.process_member(analyzer, member, read)
+                    except tarfile.TarError:
+                        raise
+                    except Exception as e:
+                        errors[analyzer] = e
+                        analyzer.count(errors=1)
+                scan_metrics.add(members=1, bytes_read=member.size if read.loaded else 0)
+        except Exception as e:
+            tar_error = e
+        if read_ahead:
+            self.pipeline.finish()
+
+        for analyzer in active:
+            analyzer.cache_value = None
+            error = errors.get(analyzer, tar_error)
+            self.timed(analyzer, analyzer.finish_tar, tar_path, error)
+            if analyzer.stage is not None and analyzer.cache_value is not None:
+                if self.cache is not None:
+                    self.cache.put(analyzer.stage, analyzer.cache_tars(tar_path), analyzer.cache_value)
+                if self.sink is not None:
+                    self.sink.write(analyzer.stage, analyzer.cache_tars(tar_path), analyzer.cache_value)
+            self.finish_metrics(analyzer, tar_path, error=error)
+            self.mark(analyzer, tar_path)
+        finish_tar(self.metrics, scan_metrics, error=tar_error)
+
+    def run(self, tar_paths):
+        resume = self.checkpoint is not None and self.checkpoint.resume
+        if self.metrics is not None:
+            self.metrics.start(SCAN_STAGE)
+        for analyzer in self.analyzers:
+            if self.checkpointed(analyzer):
+                self.checkpoint.start(analyzer.stage)
+            if self.sink is not None and analyzer.stage is not None:
+                self.sink.start(analyzer.stage)
+            if self.metrics is not None and analyzer.stage is not None:
+                # The analyzers run inside the scan, whose profile covers them
+                self.metrics.start(analyzer.stage, profile=False)
+            analyzer.open(resume)
+        try:
+            if self.pipelined:
+                self.start_pipeline(tar_paths)
+            for tar_path in tar_paths:
+                self.scan_tar(tar_path)
+        finally:
+            if self.pipeline is not None:
+                self.pipeline.close()
+                self.pipeline = None
+            for analyzer in self.analyzers:
+                analyzer.close()
+            if self.metrics is not None:
+                for tar_metrics, error in self.open_metrics.values():
+                    finish_tar(self.metrics, tar_metrics, error=error)
+                self.open_metrics = {}
+                for analyzer in self.analyzers:
+                    if analyzer.stage is not None:
+                        self.metrics.finish(analyzer.stage)
+                self.metrics.finish(SCAN_STAGE)
+
+
+def build_scan_order(src_dir, pdf_dir):
+    """
+    List every tar in both directories, placing each pdf tar right after its source
+    counterpart so the mapping analyzer only ever stages one pair at a time.
+    """
+    src_tars = sorted(f for f in os.listdir(src_dir) if f.lower().endswith('.tar'))
+    pdf_tars = sorted(f for f in os.listdir(pdf_dir) if f.lower().endswith('.tar'))
+    src_mapping, pdf_mapping = mapping.find_tar_pairs(src_dir, pdf_dir)
+    pdf_by_src = {src_mapping[key]: pdf_mapping[key] for key in src_mapping if key in pdf_mapping}
+
+    tar_paths = []
+    paired_pdfs = set()
+    for filename in src_tars:
+        tar_paths.append(os.path.join(src_dir, filename))
+        if filename in pdf_by_src:
+            tar_paths.append(os.path.join(pdf_dir, pdf_by_src[filename]))
+            paired_pdfs.add(pdf_by_src[filename])
+    tar_paths.extend(os.path.join(pdf_dir, f) for f in pdf_tars if f not in paired_pdfs)
+
+    # Don't scan the same tar twice if both directories are the same
+    unique_paths = []
+    seen = set()
+    for tar_path in tar_paths:
+        if os.path.abspath(tar_path) not in seen:
+            seen.add(os.path.abspath(tar_path))
+            unique_paths.append(tar_path)
+    return unique_paths
+
+
+def scan_archives(src_dir, pdf_dir, mapped_dir, mapped_jsonl, target_dir, output_jsonl, figure_table=True,
+                  map_pairs=True, cache=None, checkpoint=None, page_engine=pdfPageCount.DEFAULT_ENGINE, mapping_mode='extract',
+                  transfer=DEFAULT_TRANSFER, sink=None, pipelined=False, metrics=None, latex_mode='full',
+                  decode_cache=None, store=None):
+    """
+    Run all five analyses over src_dir and pdf_dir reading each tar once.
+    figure_table=False leaves out the figure/table analysis, e.g. when it runs on its own process pool,
+    and map_pairs=False the mapping, e.g. when mapping.compare_directories maps pairs in parallel.
+    cache is an optional resultCache.ResultCache and checkpoint an optional runCheckpoint.Checkpoint,
+    both shared with the multi-pass scripts. page_engine picks how pdfPageCount counts pages
+    and mapping_mode how mapping materializes matched papers (see mapping.MAPPING_MODES); in the
+    'extract' mode transfer is how they leave the extraction (see fileTransfer.TRANSFER_STRATEGIES).
+    Source PDFs are written from the scanned tar directly, so transfer doesn't apply to them.
+    sink is an optional outputSink.ParquetSink also receiving every stage's records.
+    pipelined reads and decompresses tars ahead on background threads (see ArchivePipeline).
+    metrics is an optional runMetrics.Metrics recording every stage's tars (see ArchiveScanner).
+    latex_mode is one of latexType.LATEX_MODES.
+    decode_cache is an optional decodeCache.DecodeCache through which the latex type analysis reuses
+    the papers the figure/table analysis read before it.
+    store is an optional paperStore.PaperStore keeping the figure/table and latex type results per paper;
+    their JSONL files are then exported from it.
+    """
+    analyzers = [FigureTableAnalyzer(src_dir, decode_cache, store)] if figure_table else []
+    analyzers.append(LatexTypeAnalyzer(src_dir, latex_mode, decode_cache, store))
+    if map_pairs:
+        analyzers.append(MappingAnalyzer(src_dir, pdf_dir, mapped_dir, mapped_jsonl, mapping_mode, transfer))
+    analyzers += [
+        PageCountAnalyzer(pdf_dir, page_engine),
+        SourcePdfCopyAnalyzer(src_dir, target_dir, output_jsonl),
+    ]
+    ArchiveScanner(analyzers, cache, checkpoint, sink, pipelined, metrics).run(build_scan_order(src_dir, pdf_dir))
@@ -0,0 +1,94 @@
+import os
+import io
+import gzip
+import time
+import tarfile
+import argparse
+
+from figureTable import parse_tex_file, parse_tex_file_regex, is_latex_file_by_content
+
+
+def tex_from_gz(data):
+    """Yield the LaTeX sources of one arXiv paper (.gz holding a tar or a single file)."""
+    with gzip.open(io.BytesIO(data), 'rb') as gz_file:
+        content = gz_file.read()
+    try:
+        with tarfile.open(fileobj=io.BytesIO(content), mode='r') as tar:
+            for member in tar:
+                if member.isfile() and member.name.endswith('.tex'):
+                    yield tar.extractfile(member).read().decode('utf-8', errors='ignore')
+    except tarfile.ReadError:
+        text = content.decode('utf-8', errors='ignore')
+        if is_latex_file_by_content(text[:500]):
+            yield text
+
+def load_corpus(paths, limit):
+    """Collect .tex contents from .tex files, directories of them and arXiv_src_*.tar files."""
+    corpus = []
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        else:
+            files.append(path)
+
+    for path in files:
+        if len(corpus) >= limit:
+            break
+        if path.endswith('.tex'):
+            with open(path, 'rb') as f:
+                corpus.append(f.read().decode('utf-8', errors='ignore'))
+        elif path.endswith('.tar'):
+            try:
+                with tarfile.open(path, 'r|') as tar:
+                    for member in tar:
+                        if len(corpus) >= limit:
+                            break
+                        if member.isfile() and member.name.endswith('.gz'):
+                            try:
+                                corpus.extend(tex_from_gz(tar.extractfile(member).read()))
+                            except (OSError, EOFError) as e:
+                                print(f"Skipping {member.name} in {path}: {e}")
+            except tarfile.TarError as e:
+                print(f"Error reading {path}: {e}")
+    return corpus[:limit]
+
+def time_parser(parser, corpus, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [parser(content) for content in corpus]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+def same_result(a, b):
+    return (sorted(a['figures']) == sorted(b['figures'])
+            and a['tables'] == b['tables'] and a['equations'] == b['equations'])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parse_tex_file against the per-regex reference")
+    parser.add_argument("paths", nargs='+', help=".tex files, directories or arXiv_src_*.tar files")
+    parser.add_argument("--limit", type=int, default=5000, help="maximum number of .tex files to use")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per parser; the best time is reported")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.paths, args.limit)
+    if not corpus:
+        print("No .tex content found")
+        return
+    total_mb = sum(len(content.encode('utf-8')) for content in corpus) / (1024 * 1024)
+    print(f"Corpus: {len(corpus)} .tex files, {total_mb:.2f} MB")
+
+    regex_time, regex_results = time_parser(parse_tex_file_regex, corpus, args.repeat)
+    scan_time, scan_results = time_parser(parse_tex_file, corpus, args.repeat)
+    mismatches = sum(not same_result(a, b) for a, b in zip(regex_results, scan_results))
+
+    print(f"Per-regex passes: {regex_time:.3f} s ({total_mb / regex_time:.2f} MB/s)")
+    print(f"Single pass:      {scan_time:.3f} s ({total_mb / scan_time:.2f} MB/s)")
+    print(f"Speedup: {regex_time / scan_time:.2f}x")
+    print(f"Files with different results: {mismatches}")
+
+if __name__ == "__main__":
+    main()
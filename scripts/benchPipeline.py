@@ -0,0 +1,167 @@
+import os
+import sys
+import glob
+import json
+import time
+import shlex
+import shutil
+import tarfile
+import argparse
+import contextlib
+import subprocess
+
+import figureTable
+import latexType
+import mapping
+import pdfPageCount
+import sourcePDFcopy
+from syntheticCorpus import (SRC_DIR_NAME, PDF_DIR_NAME, MANIFEST_FILE, generate_corpus, add_corpus_arguments,
+                             corpus_options, print_manifest)
+
+# Which tars each stage reads: the source tars, the PDF tars or both
+STAGE_INPUTS = {
+    'figureTable': 'src',
+    'latexType': 'src',
+    'mapping': 'both',
+    'pdfPageCount': 'pdf',
+    'sourcePDFcopy': 'src',
+    'main': 'both'
+}
+STAGES = list(STAGE_INPUTS)
+
+# main.py takes its directories from module constants, so it is run through this instead of as a script
+MAIN_RUNNER = "import sys, main; main.EDA_DIR, main.PDF_DIR = sys.argv[1:3]; sys.argv[1:3] = []; main.main()"
+
+
+def count_inputs(directory):
+    """Tar bytes and papers (.gz or .pdf members outside __MACOSX) of the tars in directory."""
+    total_bytes = 0
+    papers = 0
+    for tar_path in sorted(glob.glob(os.path.join(directory, '*.tar'))):
+        total_bytes += os.path.getsize(tar_path)
+        try:
+            with tarfile.open(tar_path, 'r|') as tar:
+                for member in tar:
+                    if member.isfile() and '__MACOSX' not in member.name and member.name.endswith(('.gz', '.pdf')):
+                        papers += 1
+        except tarfile.TarError:
+            # A corrupt tar still counts with the members before the damage
+            pass
+    return total_bytes, papers
+
+def clean_corpus(src_dir, pdf_dir, warm_indexes):
+    """Remove what a run left next to the tars: figureTable/latexType outputs and unless warm_indexes the tar indexes."""
+    for directory in (src_dir, pdf_dir):
+        for path in glob.glob(os.path.join(directory, '*.jsonl')):
+            os.remove(path)
+        if not warm_indexes:
+            for path in glob.glob(os.path.join(directory, '*.index.json')):
+                os.remove(path)
+
+def run_stage(stage, src_dir, pdf_dir, args):
+    """Run one stage in the current directory, without result cache or checkpoints."""
+    if stage == 'figureTable':
+        figureTable.process_parent_directory(src_dir, workers=args.workers)
+    elif stage == 'latexType':
+        latexType.process_parent_directory(src_dir, latex_mode=args.latex_mode)
+    elif stage == 'mapping':
+        mapping.compare_directories(src_dir, pdf_dir, "./mapped_data", "mapped.jsonl", mapping_mode=args.mapping_mode,
+                                    workers=args.mapping_workers)
+    elif stage == 'pdfPageCount':
+        pdfPageCount.process_tar_files(pdf_dir, engine=args.page_engine)
+    elif stage == 'sourcePDFcopy':
+        sourcePDFcopy.process_directory(src_dir, "test_data", "pdf_copy_results.jsonl")
+    else:
+        scripts_dir = os.path.dirname(os.path.abspath(__file__))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [scripts_dir, os.environ.get('PYTHONPATH')])))
+        output = None if args.verbose else subprocess.DEVNULL
+        subprocess.run([sys.executable, "-c", MAIN_RUNNER, src_dir, pdf_dir] + shlex.split(args.main_args),
+                       env=env, stdout=output, stderr=output, check=True)
+
+def time_stage(stage, src_dir, pdf_dir, work_dir, args):
+    """Best wall time of args.repeat runs of stage, each in a fresh work_dir on a cleaned corpus."""
+    best = None
+    for _ in range(args.repeat):
+        clean_corpus(src_dir, pdf_dir, args.warm_indexes)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir)
+        cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            with open(os.devnull, 'w') as devnull, \
+                    contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+                start = time.perf_counter()
+                run_stage(stage, src_dir, pdf_dir, args)
+                elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+        best = elapsed if best is None else min(best, elapsed)
+    clean_corpus(src_dir, pdf_dir, args.warm_indexes)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the pipeline scripts end to end on a synthetic (or real) arXiv tar dump")
+    parser.add_argument("corpus", help=f"corpus root holding {SRC_DIR_NAME}/ and {PDF_DIR_NAME}/; "
+                                       "a synthetic one is generated there if it doesn't exist")
+    parser.add_argument("--stages", nargs='+', choices=STAGES, default=STAGES,
+                        help="stages to time, 'main' being main.py as a whole (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per stage; the best time is reported")
+    parser.add_argument("--workers", type=int, default=1, help="figureTable --workers")
+    parser.add_argument("--latex-mode", choices=latexType.LATEX_MODES, default='full', help="latexType mode")
+    parser.add_argument("--mapping-mode", choices=mapping.MAPPING_MODES, default='direct', help="mapping --mode")
+    parser.add_argument("--mapping-workers", type=int, default=1, help="mapping --workers")
+    parser.add_argument("--page-engine", choices=pdfPageCount.PAGE_COUNT_ENGINES, default=pdfPageCount.DEFAULT_ENGINE,
+                        help="pdfPageCount --engine")
+    parser.add_argument("--main-args", default="--no-cache",
+                        help="arguments for main.py, as one string (default: %(default)s)")
+    parser.add_argument("--warm-indexes", action="store_true",
+                        help="keep the <tar>.index.json member lists between runs instead of timing "
+                             "every run as a first one")
+    parser.add_argument("--json", metavar="PATH", help="append one JSON line per stage with its results to PATH")
+    parser.add_argument("--verbose", action="store_true", help="show the output of the scripts")
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+
+    corpus = os.path.abspath(args.corpus)
+    src_dir = os.path.join(corpus, SRC_DIR_NAME)
+    pdf_dir = os.path.join(corpus, PDF_DIR_NAME)
+    if not os.path.isdir(src_dir) or not os.path.isdir(pdf_dir):
+        print(f"Generating a synthetic corpus in {corpus}...")
+        print_manifest(corpus, generate_corpus(corpus, **corpus_options(args)))
+
+    inputs = {'src': count_inputs(src_dir), 'pdf': count_inputs(pdf_dir)}
+    inputs['both'] = tuple(map(sum, zip(inputs['src'], inputs['pdf'])))
+    print(f"Source tars: {inputs['src'][0] / 1e6:.1f} MB, {inputs['src'][1]} papers; "
+          f"PDF tars: {inputs['pdf'][0] / 1e6:.1f} MB, {inputs['pdf'][1]} PDFs")
+
+    manifest = None
+    if os.path.exists(os.path.join(corpus, MANIFEST_FILE)):
+        with open(os.path.join(corpus, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+
+    print(f"{'Stage':<15}{'Time (s)':>10}{'Papers/s':>12}{'MB/s':>10}")
+    for stage in args.stages:
+        elapsed = time_stage(stage, src_dir, pdf_dir, os.path.join(corpus, f"bench_{stage}"), args)
+        total_bytes, papers = inputs[STAGE_INPUTS[stage]]
+        result = {
+            'stage': stage,
+            'seconds': round(elapsed, 4),
+            'papers': papers,
+            'megabytes': round(total_bytes / 1e6, 3),
+            'papers_per_second': round(papers / elapsed, 2),
+            'megabytes_per_second': round(total_bytes / 1e6 / elapsed, 2),
+            'repeat': args.repeat,
+            'options': {'workers': args.workers, 'latex_mode': args.latex_mode, 'mapping_mode': args.mapping_mode,
+                        'mapping_workers': args.mapping_workers, 'page_engine': args.page_engine,
+                        'main_args': args.main_args, 'warm_indexes': args.warm_indexes},
+            'corpus': manifest['parameters'] if manifest is not None else corpus
+        }
+        print(f"{stage:<15}{elapsed:>10.2f}{result['papers_per_second']:>12.1f}{result['megabytes_per_second']:>10.1f}")
+        if args.json:
+            with open(args.json, 'a') as f:
+                f.write(json.dumps(result) + '\n')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+import pickle
+import sqlite3
+from collections import OrderedDict
+
+DEFAULT_DECODE_CACHE_MB = 256
+
+# Bytes kept from the start of every file of a paper; latexType sniffs the first 500 of them
+HEAD_BYTES = 512
+
+# Rough cost of a member's bookkeeping, counted against the byte budget on top of its data
+MEMBER_OVERHEAD_BYTES = 200
+
+
+def paper_key(tar_path, member):
+    """Key of the paper stored as member of tar_path, the same in every script reading it."""
+    return f"{os.path.abspath(tar_path)}:{member.offset}:{member.name}"
+
+def cached_paper(decode_cache, tar_path, member):
+    """The DecodedPaper of member if decode_cache (which may be None) holds it, else None."""
+    if decode_cache is None:
+        return None
+    return decode_cache.get(paper_key(tar_path, member))
+
+
+class PaperMember:
+    """
+    One member of a paper's inner tar, with the first HEAD_BYTES bytes of its data as head
+    (None for directories and members without data).
+    """
+
+    __slots__ = ('name', 'isdir', 'offset_data', 'size', 'head')
+
+    def __init__(self, member):
+        self.name = member.name
+        self.isdir = member.isdir()
+        self.offset_data = member.offset_data
+        self.size = member.size
+        self.head = None
+
+    def nbytes(self):
+        return MEMBER_OVERHEAD_BYTES + len(self.name) + len(self.head or b'')
+
+
+class DecodedPaper:
+    """
+    What figureTable's full read of a paper (.gz member of a source tar) leaves for latexType,
+    so latexType need not decompress it again: is_tar says whether it holds an inner tar and
+    members lists that tar's members in order as PaperMembers. A paper that could not be read
+    in full is not complete and is not cached.
+    """
+
+    def __init__(self, is_tar):
+        self.is_tar = is_tar
+        self.members = []
+        self.complete = True
+
+    def add(self, member):
+        paper_member = PaperMember(member)
+        self.members.append(paper_member)
+        return paper_member
+
+    def nbytes(self):
+        return MEMBER_OVERHEAD_BYTES + sum(paper_member.nbytes() for paper_member in self.members)
+
+
+class DecodeCache:
+    """
+    Papers read by figureTable for latexType to reuse within a run, so each paper is
+    decompressed and decoded once (see DecodedPaper). Papers are evicted least recently used
+    first to stay within max_bytes. With spill_path the evicted papers go to a SQLite file
+    there instead of being dropped, which --multi-pass needs: latexType only starts after
+    figureTable has read every tar. The spill file is started over and removed on close.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_DECODE_CACHE_MB * 1024 * 1024, spill_path=None):
+        self.max_bytes = max_bytes
+        self.papers = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.spilled = 0
+        self.spill_path = spill_path
+        self.conn = None
+        if spill_path is not None:
+            if os.path.exists(spill_path):
+                os.remove(spill_path)
+            self.conn = sqlite3.connect(spill_path)
+            # Nothing in it outlives the run, so it needn't survive a crash either
+            self.conn.execute("PRAGMA journal_mode = OFF")
+            self.conn.execute("PRAGMA synchronous = OFF")
+            self.conn.execute("CREATE TABLE papers (paper_key TEXT PRIMARY KEY, paper BLOB)")
+
+    def get(self, key):
+        """The DecodedPaper stored under key, or None."""
+        if key in self.papers:
+            self.papers.move_to_end(key)
+            self.hits += 1
+            return self.papers[key][0]
+        if self.conn is not None:
+            row = self.conn.execute("SELECT paper FROM papers WHERE paper_key = ?", (key,)).fetchone()
+            if row is not None:
+                self.hits += 1
+                return pickle.loads(row[0])
+        self.misses += 1
+        return None
+
+    def put(self, key, paper):
+        if not paper.complete:
+            return
+        if key in self.papers:
+            self.nbytes -= self.papers.pop(key)[1]
+        size = paper.nbytes()
+        self.papers[key] = (paper, size)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes and self.papers:
+            evicted_key, (evicted, evicted_size) = self.papers.popitem(last=False)
+            self.nbytes -= evicted_size
+            if self.conn is not None:
+                self.conn.execute("INSERT OR REPLACE INTO papers VALUES (?, ?)",
+                                  (evicted_key, pickle.dumps(evicted, pickle.HIGHEST_PROTOCOL)))
+                self.spilled += 1
+
+    def close(self):
+        print(f"Decode cache: {self.hits} papers reused, {self.misses} decoded again, {self.spilled} spilled to disk")
+        self.papers.clear()
+        self.nbytes = 0
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+            os.remove(self.spill_path)
@@ -6,10 +6,18 @@ import tarfile
 import zipfile
 import shutil
 import time
-import io
+import codecs
+import tempfile
+import argparse
 from collections import defaultdict
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from runCheckpoint import output_mode
+from runMetrics import start_tar, finish_tar, measured
+from decodeCache import DecodedPaper, HEAD_BYTES, paper_key
+
 
 # List of extensions associated with LaTeX source files
 latex_extensions = ['.tex', '.sty', '.cls', '.bib']
@@ -20,16 +28,125 @@ image_extensions = ['.png', '.jpg', '.jpeg', '.pdf', '.eps', '.svg', '.gif', '.p
 # Files and directories to skip
 skip_files = ['__MACOSX', '._']
 
+# Read size used when streaming members out of a decompressed paper
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Name of this analysis in the result cache and run checkpoints
+CACHE_STAGE = 'figureTable'
+
+# .gz files larger than this are spilled to a temporary file instead of being held in memory
+MAX_IN_MEMORY_GZ_BYTES = 64 * 1024 * 1024
+
 def remove_comments(content):
     """
     Remove LaTeX comments from the content.
     """
     return re.sub(r"(?<!\\)%.*", "", content)
 
+# Every command parse_tex_file looks at, found in a single scan of the content.
+# None of these can start inside another, so finditer sees every occurrence.
+TEX_TOKEN_PATTERN = re.compile(r"\\(?:includegraphics|psfig\{file=|epsfig\{file=|epsfbox\{|epsfysize=|begin\{|\[|boxed\{)|\$\$")
+
+# Figure commands, matched at the token position with the same patterns as before
+FIGURE_COMMAND_PATTERNS = {
+    '\\includegraphics': re.compile(r"\\includegraphics(?:\[[^\]]*\])?\{([^}]+)\}"),  # \includegraphics[options]{file}
+    '\\psfig{file=': re.compile(r"\\psfig\{file=([^,]+),"),  # \psfig{file=fig1.ps,width=7cm,angle=90}
+    '\\epsfig{file=': re.compile(r"\\epsfig\{file=([^,]+),"),  # \epsfig{file=fig1.ps,width=7cm,angle=90}
+    '\\epsfbox{': re.compile(r"\\epsfbox\{([^}]+)\}"),  # \epsfbox{fig1.ps}
+    '\\epsfysize=': re.compile(r"\\epsfysize=[^ ]+ \\epsfbox\{([^}]+)\}"),  # \epsfysize=600pt \epsfbox{fig1.ps}
+}
+
+ENVIRONMENT_NAME_PATTERN = re.compile(r"([A-Za-z]+\*?)\}")
+
+# Environments and commands counted as equations
+equation_environments = {
+    'equation', 'equation*', 'align', 'align*', 'multline', 'multline*', 'gather', 'gather*',
+    'cases', 'matrix', 'bmatrix', 'pmatrix', 'vmatrix', 'Bmatrix', 'smallmatrix', 'array'
+}
+equation_commands = {'\\[', '$$', '\\boxed{'}
+
 def parse_tex_file(content):
     """
     Analyzes LaTeX content for figures, tables, and equations.
     Includes all occurrences in the uncommented part of the content.
+    All commands are collected in one scan; the figure patterns are then applied only at
+    the collected positions, reproducing the results of running each regex separately.
+    """
+    content = remove_comments(content)
+    
+    tables = 0
+    equations = 0
+    figure_begins = []
+    command_positions = defaultdict(list)
+    
+    for token in TEX_TOKEN_PATTERN.finditer(content):
+        text = token.group()
+        if text in equation_commands:
+            equations += 1
+        elif text == '\\begin{':
+            name = ENVIRONMENT_NAME_PATTERN.match(content, token.end())
+            if name is None:
+                continue
+            name = name.group(1)
+            if name == 'figure':
+                figure_begins.append(token.start())
+            elif name == 'table':
+                tables += 1
+            elif name in equation_environments:
+                equations += 1
+        else:
+            command_positions[text].append(token.start())
+    
+    figures = set()
+    for command, positions in command_positions.items():
+        pattern = FIGURE_COMMAND_PATTERNS[command]
+        matches = {}
+        
+        # Like re.findall: matches don't overlap and scanning resumes after each one
+        resume = 0
+        for position in positions:
+            if position < resume:
+                continue
+            match = pattern.match(content, position)
+            matches[position] = match
+            if match:
+                figures.add(match.group(1).strip())
+                resume = match.end()
+        
+        # Like re.findall with "\begin{figure}.*?<command>": each figure environment takes the
+        # first matching command after it, and the search resumes after that command
+        resume = 0
+        index = 0
+        for begin in figure_begins:
+            if begin < resume:
+                continue
+            start = begin + len('\\begin{figure}')
+            while index < len(positions) and positions[index] < start:
+                index += 1
+            match = None
+            while index < len(positions):
+                position = positions[index]
+                if position not in matches:
+                    matches[position] = pattern.match(content, position)
+                match = matches[position]
+                if match:
+                    break
+                index += 1
+            if match is None:
+                break
+            figures.add(match.group(1).strip())
+            resume = match.end()
+    
+    return {
+        "figures": list(figures),  # All figure occurrences
+        "tables": tables,    # All table occurrences
+        "equations": equations  # All equation occurrences
+    }
+
+def parse_tex_file_regex(content):
+    """
+    Reference implementation of parse_tex_file running one regex per pattern.
+    Kept to validate and benchmark the single-pass scanner.
     """
     content = remove_comments(content)
     
@@ -120,11 +237,55 @@ def analyze_latex_content(content):
         "column_format": column_format
     }
 
-def check_missing_figures(figures, archive_files):
+def build_archive_index(archive_files):
+    """
+    Index the archive members once so check_missing_figures can look figures up directly.
+    A figure matches a member when the case-folded member name, or the name without one of
+    the image extensions, ends with it. Those stems are keyed by every suffix of their last
+    path component. Names that case folding can't handle exactly (non-ASCII, newlines)
+    are left to the regex search.
+    """
+    lower_names = []
+    suffixes = defaultdict(set)
+    unindexed = []
+    
+    for i, archive_file in enumerate(archive_files):
+        if not archive_file.isascii() or '\n' in archive_file:
+            lower_names.append(None)
+            unindexed.append(i)
+            continue
+        
+        lower = archive_file.lower()
+        lower_names.append(lower)
+        stems = {lower}
+        for ext in image_extensions:
+            # The '.' of the extension matches any character in the original pattern
+            if len(lower) >= len(ext) and lower.endswith(ext[1:]):
+                stems.add(lower[:-len(ext)])
+        
+        for stem in stems:
+            base = stem.rsplit('/', 1)[-1]
+            for k in range(len(base) + 1):
+                suffixes[base[k:]].add(i)
+    
+    return {
+        'files': archive_files,
+        'lower_names': lower_names,
+        'suffixes': suffixes,
+        'unindexed': unindexed
+    }
+
+def check_missing_figures(figures, archive_files, archive_index=None):
     """
     Check which figures are missing from the archive.
     Ensures unique entries for found and missing figures.
+    For every image extension the first archive file matching the figure is reported,
+    as with a case-insensitive re.search of "<figure>(<ext>)?$" over archive_files.
     """
+    if archive_index is None:
+        archive_index = build_archive_index(archive_files)
+    lower_names = archive_index['lower_names']
+    
     found_figures = set()
     missing_figures = set()
     
@@ -132,11 +293,27 @@ def check_missing_figures(figures, archive_files):
         figure_found = False
         figure_base = re.escape(figure)  # Properly escape for regex
         
+        if figure.isascii():
+            figure_lower = figure.lower()
+            key = figure_lower.rsplit('/', 1)[-1]
+            candidates = sorted(archive_index['suffixes'].get(key, set()).union(archive_index['unindexed']))
+        else:
+            figure_lower = None
+            candidates = range(len(archive_files))
+        
         for ext in image_extensions:
             pattern = f"{figure_base}({ext})?$"
             
-            for archive_file in archive_files:
-                if re.search(pattern, archive_file, re.IGNORECASE):
+            for i in candidates:
+                archive_file = archive_files[i]
+                lower = lower_names[i]
+                if figure_lower is None or lower is None:
+                    matched = re.search(pattern, archive_file, re.IGNORECASE) is not None
+                else:
+                    matched = lower.endswith(figure_lower) or (
+                        len(lower) >= len(ext) and lower.endswith(ext[1:])
+                        and lower[:-len(ext)].endswith(figure_lower))
+                if matched:
                     found_figures.add(archive_file)
                     figure_found = True
                     break
@@ -146,65 +323,125 @@ def check_missing_figures(figures, archive_files):
     
     return list(found_figures), list(missing_figures)
 
-def inspect_gz_file(gz_path):
+def read_text_preview(file, length=500):
+    """
+    Reads just enough of a file to decode its first length characters.
+    Returns the raw bytes read and the decoded preview.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    raw = b''
+    preview = ''
+    while len(preview) < length:
+        chunk = file.read(STREAM_CHUNK_BYTES)
+        if not chunk:
+            break
+        raw += chunk
+        preview += decoder.decode(chunk)
+    return raw, preview[:length]
+
+def inspect_gz_file(gz_path, fileobj=None, decompressed=False, tar_metrics=None, decode_cache=None,
+                    cache_key=None):
     """
     Inspects a gzipped file for LaTeX content and analyzes it.
+    If fileobj is given the gz data is read from it and gz_path is only used as a label;
+    with decompressed, fileobj holds the data already decompressed.
+    The bytes decompressed are counted in tar_metrics (a runMetrics.TarMetrics) if given.
+    The gz is decompressed as a stream and inner tars are read in stream mode, so only
+    LaTeX sources are held in memory; other members are skipped after a short preview.
+    With decode_cache (a decodeCache.DecodeCache) what latexType needs of the paper is stored
+    under cache_key, so latexType doesn't decompress it again.
     """
     contains_latex = False
     latex_category = None
     latex_source_found = False
     latex_analysis = defaultdict(list)
     all_archive_files = []
+    latex_sources = []
+    paper = None
 
     try:
-        with gzip.open(gz_path, 'rb') as gz_file:
-            decompressed_data = io.BytesIO(gz_file.read())
+        opened = nullcontext(fileobj) if decompressed else gzip.open(gz_path if fileobj is None else fileobj, 'rb')
+        with opened as gz_file:
+            try:
+                # Opening in stream mode reads the first block and fails if it isn't a tar header
+                tar = tarfile.open(fileobj=gz_file, mode='r|*')
+            except tarfile.ReadError:
+                tar = None
+            paper = DecodedPaper(tar is not None)
             
-            if tarfile.is_tarfile(decompressed_data):
-                with tarfile.open(fileobj=decompressed_data, mode='r') as tar:
-                    all_archive_files = [member.name for member in tar.getmembers() if not member.isdir()]
-                    
-                    for member in tar.getmembers():
-                        if member.isdir() or any(skip in member.name for skip in skip_files):
+            if tar is not None:
+                with tar:
+                    # latexType reads a doubly compressed paper as no tar, so it can't reuse this one
+                    paper.complete = tar.fileobj.comptype == 'tar'
+                    for member in tar:
+                        paper_member = paper.add(member)
+                        if member.isdir():
                             continue
+                        all_archive_files.append(member.name)
+                        skipped = any(skip in member.name for skip in skip_files)
                             
                         try:
                             file = tar.extractfile(member)
                             if file is None:
                                 continue
-                                
-                            file_content = file.read().decode('utf-8', errors='ignore')
+                            if skipped:
+                                # Not analyzed here, but latexType sniffs them as well
+                                paper_member.head = file.read(HEAD_BYTES)
+                                continue
+                            
+                            raw, preview = read_text_preview(file)
+                            paper_member.head = raw[:HEAD_BYTES]
+                            is_latex_content = is_latex_file_by_content(preview)
                             
-                            if any(member.name.endswith(ext) for ext in latex_extensions) or is_latex_file_by_content(file_content):
+                            if any(member.name.endswith(ext) for ext in latex_extensions) or is_latex_content:
                                 contains_latex = True
-                                if member.name.endswith('.tex') or is_latex_file_by_content(file_content):
-                                    latex_category = '.tex' if member.name.endswith('.tex') else 'content'
-                                    analysis = analyze_latex_content(file_content)
-                                    found_figures, missing_figures = check_missing_figures(
-                                        analysis['figures'],
-                                        all_archive_files
-                                    )
-                                    latex_analysis['files'].append({
-                                        'filename': member.name,
-                                        'analysis': analysis,
-                                        'found_figures': found_figures,
-                                        'missing_figures': missing_figures
-                                    })
+                                if member.name.endswith('.tex') or is_latex_content:
+                                    file_content = (raw + file.read()).decode('utf-8', errors='ignore')
+                                    latex_sources.append((member.name, file_content))
                                 
                         except Exception as e:
-                            print(f"Error processing file {member.name} in {gz_path}: {e}")
+                            paper.complete = False
+                            if not skipped:
+                                print(f"Error processing file {member.name} in {gz_path}: {e}")
                             continue
 
+                # Figures can only be checked once every file name of the archive is known
+                archive_index = build_archive_index(all_archive_files)
+                for name, file_content in latex_sources:
+                    try:
+                        latex_category = '.tex' if name.endswith('.tex') else 'content'
+                        analysis = analyze_latex_content(file_content)
+                        found_figures, missing_figures = check_missing_figures(
+                            analysis['figures'],
+                            all_archive_files,
+                            archive_index
+                        )
+                        latex_analysis['files'].append({
+                            'filename': name,
+                            'analysis': analysis,
+                            'found_figures': found_figures,
+                            'missing_figures': missing_figures
+                        })
+                    except Exception as e:
+                        print(f"Error processing file {name} in {gz_path}: {e}")
+                        continue
+
+            if tar_metrics is not None:
+                tar_metrics.add(bytes_decompressed=gz_file.tell())
+
     except Exception as e:
         print(f"Error processing archive {gz_path}: {e}")
+    else:
+        if decode_cache is not None:
+            decode_cache.put(cache_key, paper)
 
     return contains_latex, latex_category, latex_source_found, latex_analysis
 
-def process_tar_file(tar_path):
+def new_tar_stats():
     """
-    Process a tar file, extract its contents, and analyze LaTeX content.
+    Returns an empty per-tar statistics dictionary.
     """
-    stats = {
+    return {
         'total_files': 0,
         'total_gz_files': 0,
         'gz_files_with_figures': 0,
@@ -220,6 +457,90 @@ def process_tar_file(tar_path):
         'gz_files_missing_figures': 0,
         'gz_files_all_figures_present': 0
     }
+
+def record_gz_analysis(stats, detailed_analysis, gz_path, contains_latex, latex_analysis):
+    """
+    Adds the result of inspect_gz_file for one .gz file to the per-tar statistics.
+    """
+    if not contains_latex:
+        return
+
+    has_figures = False
+    has_tables = False
+    has_equations = False
+    has_missing_figures = False
+    has_single_column = False
+    has_multi_column = False
+    
+    for file_analysis in latex_analysis['files']:
+        analysis = file_analysis['analysis']
+        
+        # Figures
+        figures_count = len(analysis['figures'])
+        if figures_count > 0:
+            has_figures = True
+            stats['total_figures'] += figures_count
+        
+        # Tables
+        if analysis['tables'] > 0:
+            has_tables = True
+            stats['total_tables'] += analysis['tables']
+        
+        # Equations
+        if analysis['equations'] > 0:
+            has_equations = True
+            stats['total_equations'] += analysis['equations']
+        
+        # Column format
+        if analysis['column_format'] == 'single-column':
+            has_single_column = True
+        else:
+            has_multi_column = True
+        
+        # Missing figures
+        missing_count = len(file_analysis.get('missing_figures', []))
+        found_count = len(file_analysis.get('found_figures', []))
+        stats['total_missing_figures'] += missing_count
+        stats['total_found_figures'] += found_count
+        
+        if missing_count > 0:
+            has_missing_figures = True
+    
+    # Update file-level statistics
+    if has_figures:
+        stats['gz_files_with_figures'] += 1
+        if has_missing_figures:
+            stats['gz_files_missing_figures'] += 1
+        else:
+            stats['gz_files_all_figures_present'] += 1
+    
+    if has_tables:
+        stats['gz_files_with_tables'] += 1
+    
+    if has_equations:
+        stats['gz_files_with_equations'] += 1
+    
+    if has_single_column:
+        stats['gz_files_with_single_column'] += 1
+    
+    if has_multi_column:
+        stats['gz_files_with_multi_column'] += 1
+    
+    if latex_analysis['files']:
+        detailed_analysis.append({
+            'file': gz_path,
+            'analysis': latex_analysis
+        })
+
+def process_tar_file(tar_path, max_in_memory=MAX_IN_MEMORY_GZ_BYTES, tar_metrics=None, decode_cache=None):
+    """
+    Process a tar file and analyze the LaTeX content of its .gz files.
+    Each .gz is inspected straight from the tar; it is buffered in memory up to
+    max_in_memory bytes and spilled to a temporary file beyond that.
+    Every .gz is timed and counted in tar_metrics (a runMetrics.TarMetrics) if given,
+    and left in decode_cache (a decodeCache.DecodeCache) for latexType if given.
+    """
+    stats = new_tar_stats()
     
     detailed_analysis = []
     non_processed_files = []
@@ -234,91 +555,22 @@ def process_tar_file(tar_path):
                         gz_file = tar.extractfile(member)
                         if gz_file is None:
                             non_processed_files.append(member.name)
+                            if tar_metrics is not None:
+                                tar_metrics.add(errors=1)
                             continue
                         
-                        # Create the subdirectory if it doesn't exist
-                        gz_dir = os.path.dirname(member.name)
-                        if gz_dir:
-                            os.makedirs(os.path.join(os.path.dirname(tar_path), gz_dir), exist_ok=True)
-                        
+                        member_start_time = time.perf_counter()
                         gz_path = os.path.join(os.path.dirname(tar_path), member.name)
-                        with open(gz_path, 'wb') as f:
-                            f.write(gz_file.read())
-                        
-                        contains_latex, latex_category, latex_source_found, latex_analysis = inspect_gz_file(gz_path)
-                        
-                        if contains_latex:
-                            has_figures = False
-                            has_tables = False
-                            has_equations = False
-                            has_missing_figures = False
-                            has_single_column = False
-                            has_multi_column = False
-                            
-                            for file_analysis in latex_analysis['files']:
-                                analysis = file_analysis['analysis']
-                                
-                                # Figures
-                                figures_count = len(analysis['figures'])
-                                if figures_count > 0:
-                                    has_figures = True
-                                    stats['total_figures'] += figures_count
-                                
-                                # Tables
-                                if analysis['tables'] > 0:
-                                    has_tables = True
-                                    stats['total_tables'] += analysis['tables']
-                                
-                                # Equations
-                                if analysis['equations'] > 0:
-                                    has_equations = True
-                                    stats['total_equations'] += analysis['equations']
-                                
-                                # Column format
-                                if analysis['column_format'] == 'single-column':
-                                    has_single_column = True
-                                else:
-                                    has_multi_column = True
-                                
-                                # Missing figures
-                                missing_count = len(file_analysis.get('missing_figures', []))
-                                found_count = len(file_analysis.get('found_figures', []))
-                                stats['total_missing_figures'] += missing_count
-                                stats['total_found_figures'] += found_count
-                                
-                                if missing_count > 0:
-                                    has_missing_figures = True
-                            
-                            # Update file-level statistics
-                            if has_figures:
-                                stats['gz_files_with_figures'] += 1
-                                if has_missing_figures:
-                                    stats['gz_files_missing_figures'] += 1
-                                else:
-                                    stats['gz_files_all_figures_present'] += 1
-                            
-                            if has_tables:
-                                stats['gz_files_with_tables'] += 1
-                            
-                            if has_equations:
-                                stats['gz_files_with_equations'] += 1
-                            
-                            if has_single_column:
-                                stats['gz_files_with_single_column'] += 1
-                            
-                            if has_multi_column:
-                                stats['gz_files_with_multi_column'] += 1
-                            
-                            if latex_analysis['files']:
-                                detailed_analysis.append({
-                                    'file': gz_path,
-                                    'analysis': latex_analysis
-                                })
-                        
-                        os.remove(gz_path)
-                        # Remove the subdirectory if it was created
-                        if gz_dir:
-                            shutil.rmtree(os.path.join(os.path.dirname(tar_path), gz_dir))
+                        with tempfile.SpooledTemporaryFile(max_size=max_in_memory) as buffer:
+                            shutil.copyfileobj(gz_file, buffer)
+                            buffer.seek(0)
+                            contains_latex, latex_category, latex_source_found, latex_analysis = inspect_gz_file(
+                                gz_path, buffer, tar_metrics=tar_metrics, decode_cache=decode_cache,
+                                cache_key=paper_key(tar_path, member))
+                        record_gz_analysis(stats, detailed_analysis, gz_path, contains_latex, latex_analysis)
+                        if tar_metrics is not None:
+                            tar_metrics.member(member.name, time.perf_counter() - member_start_time,
+                                               bytes_read=member.size)
     
     except tarfile.TarError as e:
         print(f"Error processing tar file {tar_path}: {e}")
@@ -329,10 +581,52 @@ def process_tar_file(tar_path):
     
     return stats, detailed_analysis, non_processed_files
 
-def process_parent_directory(parent_dir):
+def analyze_tar(tar_path, tar_metrics=None, decode_cache=None):
+    """
+    Process one tar file and build its all_tar_analysis.jsonl record.
+    """
+    # Start the timer for the current tar file
+    tar_start_time = time.time()
+    
+    # Process the tar file
+    stats, detailed_analysis, non_processed_files = process_tar_file(tar_path, tar_metrics=tar_metrics,
+                                                                      decode_cache=decode_cache)
+    
+    # End the timer for the current tar file
+    tar_end_time = time.time()
+    tar_processing_time = tar_end_time - tar_start_time
+    
+    result = {
+        'tar_file': os.path.abspath(tar_path),  # Absolute path of the tar file
+        'stats': stats,
+        'detailed_analysis': detailed_analysis,
+        'processing_time_seconds': tar_processing_time
+    }
+    return result, non_processed_files
+
+def write_result(f, tar_path, result):
+    """
+    Write one tar's record to the JSONL file immediately.
+    """
+    f.write(json.dumps(result) + '\n')
+    f.flush()  # Ensure the result is written to the file immediately
+    print(f"Done processing {tar_path}. Time taken: {result['processing_time_seconds']:.2f} seconds")
+
+def process_parent_directory(parent_dir, workers=1, cache=None, checkpoint=None, sink=None, metrics=None,
+                             decode_cache=None, store=None):
     """
     Process all tar files in a parent directory and analyze their contents.
     Dynamically dump results into a JSONL file after processing each tar.
+    With workers > 1 the tar files are analyzed in a process pool, one tar per task;
+    this process stays the only writer and records results in submission order.
+    With a ResultCache, tars analyzed by an earlier run reuse their stored record.
+    With a resuming Checkpoint, tars done by an interrupted run are skipped and the file is appended to.
+    With an outputSink.ParquetSink, the records of successfully analyzed tars are also written as Parquet.
+    With runMetrics.Metrics, every tar's time and counters are recorded as well.
+    With a decodeCache.DecodeCache, the papers read are left in it for latexType; pool workers
+    run in other processes, so with workers > 1 it is not filled.
+    With a paperStore.PaperStore, tars it holds unchanged are skipped, the others are stored per
+    paper, and the JSONL file is exported from it in the end.
     """
     # Ensure the parent directory exists
     if not os.path.exists(parent_dir):
@@ -350,35 +644,68 @@ def process_parent_directory(parent_dir):
     # Start the total script timer
     total_script_start_time = time.time()
     
+    tar_paths = [os.path.join(parent_dir, filename) for filename in os.listdir(parent_dir)
+                 if filename.endswith('.tar') and not any(skip in filename for skip in skip_files)]
+    if checkpoint is not None:
+        checkpoint.start(CACHE_STAGE)
+        tar_paths = [tar_path for tar_path in tar_paths if not checkpoint.done(CACHE_STAGE, [tar_path])]
+    if store is not None:
+        tar_paths = [tar_path for tar_path in tar_paths if not store.has(CACHE_STAGE, [tar_path])]
+    
+    if sink is not None:
+        sink.start(CACHE_STAGE)
+    if metrics is not None:
+        metrics.start(CACHE_STAGE)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    
     # Open the JSONL file in append mode
-    with open(output_file, 'w') as f:
-        for filename in os.listdir(parent_dir):
-            if filename.endswith('.tar') and not any(skip in filename for skip in skip_files):
-                tar_path = os.path.join(parent_dir, filename)
-                print(f"Processing {tar_path}...")
-                
-                # Start the timer for the current tar file
-                tar_start_time = time.time()
-                
-                # Process the tar file
-                stats, detailed_analysis, non_processed_files = process_tar_file(tar_path)
+    with open(output_file, output_mode(checkpoint)) as f:
+        try:
+            # Cached tars are resolved first; the rest go to the pool straight away
+            jobs = []
+            for tar_path in tar_paths:
+                cached = cache.get(CACHE_STAGE, [tar_path]) if cache is not None else None
+                tar_metrics = start_tar(metrics, CACHE_STAGE, [tar_path])
+                if cached is None and executor is not None:
+                    jobs.append((tar_path, cached, tar_metrics, executor.submit(measured, tar_metrics, analyze_tar, tar_path)))
+                else:
+                    jobs.append((tar_path, cached, tar_metrics, None))
+            if executor is not None:
+                print(f"Processing {len(tar_paths)} tar files with {workers} workers...")
+            
+            for tar_path, cached, tar_metrics, future in jobs:
+                if future is None:
+                    tar_metrics.restart()
+                if cached is not None:
+                    print(f"Using cached result for {tar_path}")
+                    result, non_processed_files = cached
+                else:
+                    if future is None:
+                        print(f"Processing {tar_path}...")
+                        result, non_processed_files = analyze_tar(tar_path, tar_metrics, decode_cache)
+                    else:
+                        (result, non_processed_files), tar_metrics = future.result()
+                    # Failed tars are retried on the next run
+                    if cache is not None and tar_path not in non_processed_files:
+                        cache.put(CACHE_STAGE, [tar_path], [result, non_processed_files])
                 all_non_processed_files.extend(non_processed_files)
-                
-                # End the timer for the current tar file
-                tar_end_time = time.time()
-                tar_processing_time = tar_end_time - tar_start_time
-                
-                # Write the result to the JSONL file immediately
-                result = {
-                    'tar_file': os.path.abspath(tar_path),  # Absolute path of the tar file
-                    'stats': stats,
-                    'detailed_analysis': detailed_analysis,
-                    'processing_time_seconds': tar_processing_time
-                }
-                f.write(json.dumps(result) + '\n')
-                f.flush()  # Ensure the result is written to the file immediately
-                
-                print(f"Done processing {tar_path}. Time taken: {tar_processing_time:.2f} seconds")
+                write_result(f, tar_path, result)
+                if sink is not None and tar_path not in non_processed_files:
+                    sink.write(CACHE_STAGE, [tar_path], [result, non_processed_files])
+                if store is not None:
+                    store.write(CACHE_STAGE, [tar_path], [result, non_processed_files],
+                                retry=tar_path in non_processed_files)
+                finish_tar(metrics, tar_metrics, cached is not None,
+                           f"{tar_path} could not be read" if tar_path in non_processed_files else None)
+                if checkpoint is not None:
+                    checkpoint.mark(CACHE_STAGE, [tar_path])
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if metrics is not None:
+                metrics.finish(CACHE_STAGE)
+    if store is not None:
+        store.export(CACHE_STAGE, parent_dir, output_file)
     
     # End the total script timer
     total_script_end_time = time.time()
@@ -391,5 +718,9 @@ def process_parent_directory(parent_dir):
 
 # Example usage
 if __name__== "__main__":
+    parser = argparse.ArgumentParser(description="Analyze figures, tables and equations in arXiv source tars")
+    parser.add_argument("--workers", type=int, default=1, help="number of tar files processed in parallel")
+    args = parser.parse_args()
+
     parent_directory = 'workingData/eda'  # Path to directory with tar files
-    process_parent_directory(parent_directory)
\ No newline at end of file
+    process_parent_directory(parent_directory, workers=args.workers)
\ No newline at end of file
@@ -0,0 +1,73 @@
+import os
+import errno
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# How a file extracted to a temporary directory gets to its final place:
+# 'copy' writes it again, 'move' renames it (the temporary copy is deleted afterwards anyway),
+# 'hardlink' links it and 'reflink' clones its blocks on filesystems that support it (btrfs, XFS, APFS...).
+# 'hardlink' and 'reflink' fall back to copying when the filesystem refuses.
+TRANSFER_STRATEGIES = ['copy', 'move', 'hardlink', 'reflink']
+DEFAULT_TRANSFER = 'copy'
+
+# ioctl request of Linux' FICLONE, which shares all blocks of one file with another
+FICLONE = 0x40049409
+
+# Strategies already reported as falling back, so a whole run warns only once for each
+reported_fallbacks = set()
+
+
+def reflink(src_path, dst_path):
+    """Clone src_path into dst_path without copying its data; raises OSError where not supported."""
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflinks are not supported on this platform")
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(dst_path)
+            raise
+    shutil.copystat(src_path, dst_path)
+
+def hardlink(src_path, dst_path):
+    # Like a copy, an existing file at dst_path is replaced
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+    os.link(src_path, dst_path)
+
+def transfer_file(src_path, dst_path, strategy=DEFAULT_TRANSFER, copy_function=shutil.copy2):
+    """Put the file at src_path at dst_path using one of TRANSFER_STRATEGIES."""
+    if strategy == 'move':
+        shutil.move(src_path, dst_path)
+        return
+    if strategy in ('hardlink', 'reflink'):
+        try:
+            (hardlink if strategy == 'hardlink' else reflink)(src_path, dst_path)
+            return
+        except OSError as e:
+            if strategy not in reported_fallbacks:
+                reported_fallbacks.add(strategy)
+                print(f"Could not {strategy} {src_path} to {dst_path} ({e}), copying instead")
+    copy_function(src_path, dst_path)
+
+def atomic_write(path, write):
+    """
+    Create the file at path with write(file), given a temporary file next to it (unique to this run)
+    that is renamed into place once complete, so path never holds a half-written file.
+    The temporary file is removed if writing fails.
+    """
+    directory, file = os.path.split(path)
+    temp_path = os.path.join(directory, f".{file}.{os.getpid()}.part")
+    try:
+        with open(temp_path, 'wb') as f:
+            write(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
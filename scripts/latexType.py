@@ -3,30 +3,104 @@ import gzip
 import tarfile
 import json
 import time
-import io
 import re
 from pathlib import Path
 
+from runCheckpoint import output_mode
+from tarIndex import tar_members
+from runMetrics import start_tar, finish_tar
+from decodeCache import cached_paper
+
 
 latex_extensions = ['.tex', '.sty', '.cls', '.bib']
 
+# Name of this analysis in the result cache and run checkpoints
+CACHE_STAGE = 'latexType'
+
+# Bytes of a file is_latex_file_by_content looks at
+CONTENT_SNIFF_BYTES = 500
+
+# 'full' reads a paper's inner tar up to its first .tex member, however far in that is;
+# 'headers' also stops once reaching the next member would inflate more than HEADER_SCAN_BYTES,
+# marking the paper scan_truncated, so big figures ahead of the .tex are never decompressed
+LATEX_MODES = ['full', 'headers']
+HEADER_SCAN_BYTES = 512 * 1024
+
+def latex_stage(latex_mode):
+    """Cache and checkpoint stage name; 'headers' results may differ, so they are kept apart."""
+    return CACHE_STAGE if latex_mode == 'full' else f"{CACHE_STAGE}-{latex_mode}"
+
+def latex_scan_limit(latex_mode):
+    return HEADER_SCAN_BYTES if latex_mode == 'headers' else None
+
 def is_latex_file_by_content(content):
     latex_commands = ['\\documentclass', '\\begin{document}', '\\end{document}', '\\usepackage']
     return any(command in content for command in latex_commands)
 
-def inspect_gz_file(gz_file_obj):
+def gzip_size(gz_file_obj, start):
+    """Decompressed size (modulo 4 GiB) from the gzip trailer, None if gz_file_obj can't seek to it."""
+    try:
+        gz_file_obj.seek(-4, os.SEEK_END)
+        size = int.from_bytes(gz_file_obj.read(4), 'little')
+        gz_file_obj.seek(start)
+    except (OSError, ValueError):
+        return None
+    return size
+
+def inspect_decoded_paper(result, paper, scan_limit=None):
+    """inspect_gz_file's walk of an inner tar, over the members of a decodeCache.DecodedPaper."""
+    for member in paper.members:
+        if member.name.endswith('.tex'):
+            result['contains_tex'] = True
+            break
+        if any(member.name.endswith(ext) for ext in latex_extensions if ext != '.tex'):
+            result['contains_other_latex'] = True
+        if member.head is not None:
+            file_content = member.head[:CONTENT_SNIFF_BYTES].decode('utf-8', errors='ignore')
+            if is_latex_file_by_content(file_content):
+                result['contains_content_latex'] = True
+        if scan_limit is not None and member.offset_data + member.size > scan_limit:
+            result['scan_truncated'] = True
+            break
+
+def inspect_gz_file(gz_file_obj, tar_metrics=None, scan_limit=None, paper=None, name=None):
+    """
+    Classify one paper. An inner tar is inflated only up to its first .tex member, and with
+    scan_limit no further than the member reaching scan_limit decompressed bytes.
+    tar_metrics (a runMetrics.TarMetrics) counts the bytes inflated and those never inflated.
+    paper is the paper's decodeCache.DecodedPaper if figureTable already read it, which is then
+    classified without decompressing anything.
+    name is the paper's member name in its source tar, recorded as its gz_file (by default gz_file_obj.name).
+    """
+    if name is None:
+        name = gz_file_obj.name
     result = {
-        'gz_file': gz_file_obj.name,
+        'gz_file': name,
         'contains_tex': False,
         'contains_content_latex': False,
         'contains_other_latex': False
     }
 
     try:
-        decompressed_data = io.BytesIO(gz_file_obj.read())
-        if tarfile.is_tarfile(decompressed_data):
-            with tarfile.open(fileobj=decompressed_data, mode='r') as tar:
-                for member in tar.getmembers():
+        # Stream mode decompresses as it goes and reads the first block to tell a tar
+        # from a single file, so the paper is never held in memory as a whole
+        start = gz_file_obj.tell()
+        tar = None
+        if paper is not None:
+            if tar_metrics is not None:
+                tar_metrics.add(decode_hits=1)
+        else:
+            size = gzip_size(gz_file_obj, start) if tar_metrics is not None else None
+            try:
+                tar = tarfile.open(fileobj=gz_file_obj, mode='r|*')
+            except tarfile.ReadError:
+                pass
+
+        if paper is not None and paper.is_tar:
+            inspect_decoded_paper(result, paper, scan_limit)
+        elif tar is not None:
+            with tar:
+                for member in tar:
                     if member.name.endswith('.tex'):
                         result['contains_tex'] = True
                         break
@@ -34,15 +108,24 @@ def inspect_gz_file(gz_file_obj):
                         result['contains_other_latex'] = True
                     file = tar.extractfile(member)
                     if file:
-                        file_content = file.read(500).decode('utf-8', errors='ignore')
+                        file_content = file.read(CONTENT_SNIFF_BYTES).decode('utf-8', errors='ignore')
                         if is_latex_file_by_content(file_content):
                             result['contains_content_latex'] = True
+                    if scan_limit is not None and member.offset_data + member.size > scan_limit:
+                        result['scan_truncated'] = True
+                        break
+                if tar_metrics is not None:
+                    # How far into the decompressed paper the scan got, and what it never inflated
+                    decompressed = tar.fileobj.tell()
+                    tar_metrics.add(bytes_decompressed=decompressed,
+                                    bytes_skipped=max(size - decompressed, 0) if size is not None else 0)
         else:
-            content = decompressed_data.read(500).decode('utf-8', errors='ignore')
+            gz_file_obj.seek(start)
+            content = gz_file_obj.read(CONTENT_SNIFF_BYTES).decode('utf-8', errors='ignore')
             if is_latex_file_by_content(content):
                 result['contains_content_latex'] = True
     except Exception as e:
-        print(f"Error inspecting .gz file {gz_file_obj.name}: {e}")
+        print(f"Error inspecting .gz file {name}: {e}")
 
     return result
 
@@ -56,23 +139,31 @@ def categorize_gz_file(gz_result):
 
     return None
 
-def process_tar_archive(tar_path):
+def process_tar_archive(tar_path, tar_metrics=None, scan_limit=None, decode_cache=None):
     gz_results = []
 
     try:
+        gz_files = sorted([tar_info for tar_info in tar_members(tar_path)
+                         if tar_info.name.endswith('.gz') and 
+                         not tar_info.name.startswith('__MACOSX')],
+                        key=lambda x: x.name)
+
         with tarfile.open(tar_path, 'r') as tar_ref:
-            gz_files = sorted([tar_info for tar_info in tar_ref.getmembers() 
-                             if tar_info.name.endswith('.gz') and 
-                             not tar_info.name.startswith('__MACOSX')],
-                            key=lambda x: x.name)
-            
             for tar_info in gz_files:
+                member_start_time = time.perf_counter()
                 try:
                     with tar_ref.extractfile(tar_info) as gz_file_obj:
-                        gz_result = inspect_gz_file(gz_file_obj)
+                        gz_result = inspect_gz_file(gz_file_obj, tar_metrics, scan_limit,
+                                                    cached_paper(decode_cache, tar_path, tar_info), tar_info.name)
                         gz_results.append(gz_result)
                 except Exception as e:
                     print(f"Error processing .gz file {tar_info.name} in {tar_path}: {e}")
+                    if tar_metrics is not None:
+                        tar_metrics.add(errors=1)
+                    continue
+                if tar_metrics is not None:
+                    tar_metrics.member(tar_info.name, time.perf_counter() - member_start_time,
+                                       bytes_read=tar_info.size)
     except tarfile.TarError as e:
         print(f"Tar file error for {tar_path}: {e}")
         raise  # Re-raise the exception to be caught outside
@@ -85,60 +176,110 @@ def process_tar_archive(tar_path):
         'gz_files': gz_results
     }
 
-def process_parent_directory(parent_dir):
+def summarize_archive_results(archive_results, start_time):
+    tex_count = 0
+    other_latex_count = 0
+    content_latex_count = 0
+    
+    for gz_result in archive_results['gz_files']:
+        category = categorize_gz_file(gz_result)
+        if category == 'tex':
+            tex_count += 1
+        elif category == 'other_latex':
+            other_latex_count += 1
+        elif category == 'content_latex':
+            content_latex_count += 1
+    
+    total_latex = tex_count + other_latex_count + content_latex_count
+
+    return {
+        'tar_file': archive_results['tar_file'],
+        'total_gz_files': len(archive_results['gz_files']),
+        'gz_files_with_latex': total_latex,
+        'gz_files_with_tex': tex_count,
+        'gz_files_with_content_latex': content_latex_count,
+        'gz_files_with_other_latex': other_latex_count,
+        'processing_time': round(time.time() - start_time, 2)
+    }
+
+def process_parent_directory(parent_dir, cache=None, checkpoint=None, sink=None, metrics=None, latex_mode='full',
+                             decode_cache=None, store=None):
+    """
+    latex_mode is one of LATEX_MODES; 'headers' bounds how much of each paper is inflated.
+    Papers figureTable left in decode_cache (a decodeCache.DecodeCache) aren't decompressed again.
+    With store (a paperStore.PaperStore) the tars it holds unchanged are skipped, the others are
+    stored per paper, and both JSONL files are exported from it in the end.
+    """
+    stage = latex_stage(latex_mode)
     all_tar_stats = []
     processed_files = []
     corrupted_files = []
-    start_time = time.time()
     summary_file = os.path.join(parent_dir, "insideTarAnalysisNumbers.jsonl")
     output_file = os.path.join(parent_dir, "insideTarAnalysis.jsonl")
 
-    with open(summary_file, 'w') as summary_f, open(output_file, 'w') as output_f:
+    if checkpoint is not None:
+        checkpoint.start(stage)
+    if sink is not None:
+        sink.start(stage)
+    if metrics is not None:
+        metrics.start(stage)
+    mode = output_mode(checkpoint)
+
+    with open(summary_file, mode) as summary_f, open(output_file, mode) as output_f:
         for filename in os.listdir(parent_dir):
             if filename.endswith('.tar'):  # Change to match tar files directly
                 tar_path = os.path.join(parent_dir, filename)
-                print(f"Processing {tar_path}...")
+                if checkpoint is not None and checkpoint.done(stage, [tar_path]):
+                    continue
+                if store is not None and store.has(stage, [tar_path]):
+                    continue
 
+                tar_metrics = start_tar(metrics, stage, [tar_path])
+                cached = None
                 try:
-                    archive_results = process_tar_archive(tar_path)
-                    tex_count = 0
-                    other_latex_count = 0
-                    content_latex_count = 0
-                    
-                    for gz_result in archive_results['gz_files']:
-                        category = categorize_gz_file(gz_result)
-                        if category == 'tex':
-                            tex_count += 1
-                        elif category == 'other_latex':
-                            other_latex_count += 1
-                        elif category == 'content_latex':
-                            content_latex_count += 1
-                    
-                    total_latex = tex_count + other_latex_count + content_latex_count
+                    cached = cache.get(stage, [tar_path]) if cache is not None else None
+                    if cached is not None:
+                        print(f"Using cached result for {tar_path}")
+                        archive_results, tar_stats = cached
+                    else:
+                        print(f"Processing {tar_path}...")
+                        tar_start_time = time.time()
+                        archive_results = process_tar_archive(tar_path, tar_metrics, latex_scan_limit(latex_mode),
+                                                              decode_cache)
+                        tar_stats = summarize_archive_results(archive_results, tar_start_time)
+                        if cache is not None:
+                            cache.put(stage, [tar_path], [archive_results, tar_stats])
 
                     output_f.write(json.dumps(archive_results) + '\n')
                     output_f.flush()
 
-                    tar_stats = {
-                        'tar_file': os.path.abspath(tar_path),
-                        'total_gz_files': len(archive_results['gz_files']),
-                        'gz_files_with_latex': total_latex,
-                        'gz_files_with_tex': tex_count,
-                        'gz_files_with_content_latex': content_latex_count,
-                        'gz_files_with_other_latex': other_latex_count,
-                        'processing_time': round(time.time() - start_time, 2)
-                    }
                     all_tar_stats.append(tar_stats)
 
                     summary_f.write(json.dumps(tar_stats) + '\n')
                     summary_f.flush()
+                    if sink is not None:
+                        sink.write(stage, [tar_path], [archive_results, tar_stats])
+                    if store is not None:
+                        store.write(stage, [tar_path], [archive_results, tar_stats])
 
                     print(f"Done processing {tar_path}")
                     processed_files.append(tar_path)
+                    finish_tar(metrics, tar_metrics, cached is not None)
 
                 except Exception as e:
                     print(f"Error processing tar file {tar_path}: {e}")
                     corrupted_files.append(tar_path)
+                    finish_tar(metrics, tar_metrics, error=e)
+                    if store is not None:
+                        store.discard(stage, [tar_path])
+
+                if checkpoint is not None:
+                    checkpoint.mark(stage, [tar_path])
+
+    if metrics is not None:
+        metrics.finish(stage)
+    if store is not None:
+        store.export(stage, parent_dir, output_file, summary_file)
 
     # Print Stats
     print(f"\nProcessing complete. Stats:")
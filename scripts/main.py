@@ -3,14 +3,23 @@ import time
 import subprocess
 import logging
 import sys
+import argparse
 from pathlib import Path
 
 # Import all modules
 from figureTable import process_parent_directory as process_figure_table
-from latexType import process_parent_directory as process_latex_type
-from mapping import compare_directories
-from pdfPageCount import process_tar_files
+from latexType import process_parent_directory as process_latex_type, LATEX_MODES, HEADER_SCAN_BYTES
+from mapping import compare_directories, MAPPING_MODES
+from pdfPageCount import process_tar_files, PAGE_COUNT_ENGINES, DEFAULT_ENGINE
 from sourcePDFcopy import process_directory as process_source_pdf
+from archiveScanner import scan_archives
+from resultCache import ResultCache, DEFAULT_CACHE_PATH
+from runCheckpoint import Checkpoint, DEFAULT_CHECKPOINT_DIR
+from fileTransfer import TRANSFER_STRATEGIES, DEFAULT_TRANSFER
+from outputSink import ParquetSink
+from runMetrics import Metrics, DEFAULT_METRICS_FILE
+from decodeCache import DecodeCache, DEFAULT_DECODE_CACHE_MB
+from paperStore import PaperStore, DEFAULT_STORE_PATH
 
 # Configure logging to write to both terminal and a file
 logging.basicConfig(
@@ -32,13 +41,139 @@ TARGET_DIR = "test_data"
 OUTPUT_JSONL = "pdf_copy_results.jsonl"
 MAPPED_JSONL = "mapped.jsonl"
 
+def run_figure_table(workers, cache=None, checkpoint=None, sink=None, metrics=None, decode_cache=None, store=None):
+    logger.info("Running figure table analysis...")
+    start_time = time.time()
+    process_figure_table(EDA_DIR, workers=workers, cache=cache, checkpoint=checkpoint, sink=sink, metrics=metrics,
+                         decode_cache=decode_cache, store=store)
+    logger.info(f"figureTable.py processing time: {time.time() - start_time:.2f} seconds")
+
+def run_mapping(cache=None, checkpoint=None, mapping_mode='extract', workers=1, use_processes=False,
+                transfer=DEFAULT_TRANSFER, sink=None, metrics=None):
+    logger.info("Running mapping analysis...")
+    start_time = time.time()
+    compare_directories(EDA_DIR, PDF_DIR, MAPPED_DIR, MAPPED_JSONL, cache=cache, checkpoint=checkpoint,
+                        mapping_mode=mapping_mode, workers=workers, use_processes=use_processes,
+                        transfer=transfer, sink=sink, metrics=metrics)
+    logger.info(f"mapping.py processing time: {time.time() - start_time:.2f} seconds")
+
+def run_multi_pass(workers=1, cache=None, checkpoint=None, page_engine=DEFAULT_ENGINE, mapping_mode='extract',
+                   mapping_workers=1, mapping_processes=False, transfer=DEFAULT_TRANSFER, sink=None, metrics=None,
+                   latex_mode='full', decode_cache=None, store=None):
+    """Run the five scripts one after another, each reading the tars itself."""
+    # Run figureTable analysis
+    run_figure_table(workers, cache, checkpoint, sink, metrics, decode_cache, store)
+
+    # Run LaTeX type analysis
+    logger.info("Running LaTeX type analysis...")
+    start_time = time.time()
+    process_latex_type(EDA_DIR, cache=cache, checkpoint=checkpoint, sink=sink, metrics=metrics, latex_mode=latex_mode,
+                       decode_cache=decode_cache, store=store)
+    logger.info(f"latexType.py processing time: {time.time() - start_time:.2f} seconds")
+
+    # Run mapping analysis with new parameters
+    run_mapping(cache, checkpoint, mapping_mode, mapping_workers, mapping_processes, transfer, sink, metrics)
+
+    # Run PDF page count analysis
+    logger.info("Running PDF page count analysis...")
+    start_time = time.time()
+    process_tar_files(PDF_DIR, cache=cache, checkpoint=checkpoint, engine=page_engine, sink=sink, metrics=metrics)
+    logger.info(f"pdfPageCount.py processing time: {time.time() - start_time:.2f} seconds")
+
+    # Run source PDF copy
+    logger.info("Running source PDF copy...")
+    start_time = time.time()
+    process_source_pdf(EDA_DIR, TARGET_DIR, OUTPUT_JSONL, cache=cache, checkpoint=checkpoint, sink=sink,
+                       metrics=metrics)
+    logger.info(f"sourcePDFcopy.py processing time: {time.time() - start_time:.2f} seconds")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the arXiv EDA pipeline")
+    parser.add_argument("--multi-pass", action="store_true",
+                        help="run each script separately instead of the single-pass archive scan")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes for the figure table analysis; above 1 it runs on its own "
+                             "process pool and the single-pass scan handles the other analyses")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help="SQLite file holding per-tar results reused by later runs")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="analyze every tar again and don't store results")
+    parser.add_argument("--hash", action="store_true",
+                        help="recognize unchanged tars by SHA-256 instead of size and mtime")
+    parser.add_argument("--page-engine", choices=PAGE_COUNT_ENGINES, default=DEFAULT_ENGINE,
+                        help="'fast' reads the page count from the PDF trailer and falls back to a full "
+                             "PyPDF2 parse; 'pypdf2' always parses the whole PDF")
+    parser.add_argument("--mapping-mode", choices=MAPPING_MODES, default='direct',
+                        help="'extract' stages both tars on disk before copying matched papers into "
+                             "mapped_data, 'direct' copies them straight from the tars, 'manifest' only "
+                             "records their offsets in the tars (default: %(default)s)")
+    parser.add_argument("--latex-mode", choices=LATEX_MODES, default='full',
+                        help="'full' reads each paper's inner tar up to its first .tex member; 'headers' also stops "
+                             f"before inflating more than {HEADER_SCAN_BYTES // 1024} KB of it, so big figures ahead "
+                             "of the .tex are skipped and such papers are marked scan_truncated (default: %(default)s)")
+    parser.add_argument("--decode-cache-mb", type=int, default=DEFAULT_DECODE_CACHE_MB,
+                        help="memory for the member lists and file heads the figure/table analysis leaves for the "
+                             "LaTeX type analysis, so each paper is decompressed once; 0 turns it off "
+                             "(default: %(default)s)")
+    parser.add_argument("--decode-cache-spill", metavar="PATH",
+                        help="keep the papers evicted from --decode-cache-mb in a temporary SQLite file at PATH "
+                             "instead of dropping them; with --multi-pass every paper is read by the figure/table "
+                             "analysis before the LaTeX type analysis starts")
+    parser.add_argument("--mapping-workers", type=int, default=1,
+                        help="tar pairs mapped in parallel; above 1 mapping runs on its own pool "
+                             "and the single-pass scan handles the other analyses")
+    parser.add_argument("--mapping-processes", action="store_true",
+                        help="use a process pool instead of threads for --mapping-workers")
+    parser.add_argument("--transfer", choices=TRANSFER_STRATEGIES, default='move',
+                        help="how extracted files reach mapped_data: 'move' them out of the "
+                             "temporary extraction, 'hardlink' or 'reflink' them (falling back to a copy), "
+                             "or 'copy' them again (default: %(default)s)")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="in the single-pass scan, read and decompress tars ahead on background threads "
+                             "while the analyses run, so disk and CPU work overlap")
+    parser.add_argument("--parquet", metavar="DIR",
+                        help="also write every stage's records as Parquet tables, one file per tar, "
+                             "under DIR/<table>/ (needs pyarrow)")
+    parser.add_argument("--paper-store", nargs='?', const=DEFAULT_STORE_PATH, metavar="PATH",
+                        help="keep the figure/table and LaTeX type results per paper in a SQLite store at PATH "
+                             f"(default: {DEFAULT_STORE_PATH}): tars it already holds unchanged are skipped, new ones "
+                             "are added paper by paper, and their JSONL files are exported from it at the end")
+    parser.add_argument("--metrics", nargs='?', const=DEFAULT_METRICS_FILE, metavar="PATH",
+                        help="write per-stage and per-tar wall times, member and byte counts and errors "
+                             f"as JSON lines to PATH (default: {DEFAULT_METRICS_FILE})")
+    parser.add_argument("--metrics-members", action="store_true",
+                        help="also write one metrics line per member processed")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="run every stage under cProfile and save DIR/<stage>.prof (implies --metrics)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted run: skip the tars each stage already finished "
+                             "and append to its outputs")
+    parser.add_argument("--checkpoint-dir", default=DEFAULT_CHECKPOINT_DIR,
+                        help="directory holding the per-stage lists of finished tars")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+
     # Start the total processing timer
     total_start_time = time.time()
 
-    # Clear the output file at the start of the script
-    with open("out.txt", "w") as outfile:
-        outfile.write("")
+    # Clear the output file at the start of the script, unless continuing an earlier run
+    if not args.resume:
+        with open("out.txt", "w") as outfile:
+            outfile.write("")
+
+    cache = None if args.no_cache else ResultCache(args.cache, use_hash=args.hash)
+    checkpoint = Checkpoint(args.checkpoint_dir, resume=args.resume)
+    sink = ParquetSink(args.parquet, resume=args.resume) if args.parquet else None
+    metrics = None
+    if args.metrics or args.profile or args.metrics_members:
+        metrics = Metrics(args.metrics or DEFAULT_METRICS_FILE, resume=args.resume, profile_dir=args.profile,
+                          member_records=args.metrics_members)
+    store = PaperStore(args.paper_store, use_hash=args.hash) if args.paper_store else None
+    decode_cache = None
+    if args.decode_cache_mb > 0 or args.decode_cache_spill:
+        decode_cache = DecodeCache(args.decode_cache_mb * 1024 * 1024, args.decode_cache_spill)
 
     try:
         # Create directories if they don't exist
@@ -47,39 +182,43 @@ def main():
         os.makedirs(TARGET_DIR, exist_ok=True)
         os.makedirs(MAPPED_DIR, exist_ok=True)
 
-        # Run figureTable analysis
-        logger.info("Running figure table analysis...")
-        start_time = time.time()
-        process_figure_table(EDA_DIR)
-        logger.info(f"figureTable.py processing time: {time.time() - start_time:.2f} seconds")
-
-        # Run LaTeX type analysis
-        logger.info("Running LaTeX type analysis...")
-        start_time = time.time()
-        process_latex_type(EDA_DIR)
-        logger.info(f"latexType.py processing time: {time.time() - start_time:.2f} seconds")
-
-        # Run mapping analysis with new parameters
-        logger.info("Running mapping analysis...")
-        start_time = time.time()
-        compare_directories(EDA_DIR, PDF_DIR, MAPPED_DIR, MAPPED_JSONL)
-        logger.info(f"mapping.py processing time: {time.time() - start_time:.2f} seconds")
-
-        # Run PDF page count analysis
-        logger.info("Running PDF page count analysis...")
-        start_time = time.time()
-        process_tar_files(PDF_DIR)
-        logger.info(f"pdfPageCount.py processing time: {time.time() - start_time:.2f} seconds")
-
-        # Run source PDF copy
-        logger.info("Running source PDF copy...")
-        start_time = time.time()
-        process_source_pdf(EDA_DIR, TARGET_DIR, OUTPUT_JSONL)
-        logger.info(f"sourcePDFcopy.py processing time: {time.time() - start_time:.2f} seconds")
+        if args.multi_pass:
+            run_multi_pass(args.workers, cache, checkpoint, args.page_engine, args.mapping_mode,
+                           args.mapping_workers, args.mapping_processes, args.transfer, sink, metrics, args.latex_mode,
+                           decode_cache, store)
+        else:
+            # The regex-heavy figure table analysis scales across cores better than it
+            # shares a single read, so give it its own pool when workers are requested
+            if args.workers > 1:
+                run_figure_table(args.workers, cache, checkpoint, sink, metrics, store=store)
+            # Mapping is bound by copying papers out of the tars, which overlaps well across pairs
+            if args.mapping_workers > 1:
+                run_mapping(cache, checkpoint, args.mapping_mode, args.mapping_workers, args.mapping_processes,
+                            args.transfer, sink, metrics)
+
+            # Read every tar once and feed all five analyses from that single pass
+            logger.info("Running single-pass archive scan...")
+            start_time = time.time()
+            scan_archives(EDA_DIR, PDF_DIR, MAPPED_DIR, MAPPED_JSONL, TARGET_DIR, OUTPUT_JSONL,
+                          figure_table=args.workers <= 1, map_pairs=args.mapping_workers <= 1, cache=cache, checkpoint=checkpoint,
+                          page_engine=args.page_engine, mapping_mode=args.mapping_mode, transfer=args.transfer,
+                          sink=sink, pipelined=args.pipelined, metrics=metrics, latex_mode=args.latex_mode,
+                          decode_cache=decode_cache, store=store)
+            logger.info(f"archiveScanner.py processing time: {time.time() - start_time:.2f} seconds")
 
     except Exception as e:
         logger.error(f"Error in main processing: {e}")
         raise
+    finally:
+        checkpoint.close()
+        if cache is not None:
+            cache.close()
+        if metrics is not None:
+            metrics.close()
+        if decode_cache is not None:
+            decode_cache.close()
+        if store is not None:
+            store.close()
 
     # Calculate total processing time
     total_processing_time = time.time() - total_start_time
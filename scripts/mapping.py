@@ -3,28 +3,93 @@ import tarfile
 import json
 import shutil
 import time
+import argparse
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
 import re
 
-def extract_tar(tar_path, extract_to, file_ext):
-    """Extract files from TAR archive."""
+from runCheckpoint import output_mode
+from tarIndex import tar_members
+from fileTransfer import transfer_file, TRANSFER_STRATEGIES, DEFAULT_TRANSFER
+from runMetrics import start_tar, finish_tar, measured
+
+# Name of this analysis in the result cache and run checkpoints
+CACHE_STAGE = 'mapping'
+
+# 'extract' extracts both tars and copies the matched files into mapped_dir;
+# 'direct' only lists the tars and copies each matched member straight from its tar;
+# 'manifest' only lists the tars and records where each matched member sits in its tar
+MAPPING_MODES = ['extract', 'direct', 'manifest']
+
+COPY_CHUNK_BYTES = 1024 * 1024
+
+def extract_tar(tar_path, extract_to, file_ext, tar_metrics=None):
+    """Extract files from TAR archive, timing and counting each in tar_metrics if given."""
     extracted_files = set()
     Path(extract_to).mkdir(parents=True, exist_ok=True)
     
     try:
+        # The member list comes from the tar's sidecar index, so the headers are walked once
+        members = tar_members(tar_path)
         with tarfile.open(tar_path, 'r') as tar:
-            for member in tar.getmembers():
+            for member in members:
                 if (member.name.lower().endswith(file_ext) and 
                     "__MACOSX" not in member.name):
-                    member = tar.getmember(member.name)
+                    member_start_time = time.perf_counter()
                     tar.extract(member, extract_to, filter='data')
                     base_name = os.path.splitext(os.path.basename(member.name))[0]
                     extracted_files.add((base_name, member.name))
+                    if tar_metrics is not None:
+                        tar_metrics.member(member.name, time.perf_counter() - member_start_time,
+                                           bytes_read=member.size, bytes_written=member.size)
     except tarfile.ReadError:
         print(f"Error: Unable to read tar file {tar_path}")
         return None
     return extracted_files
 
+def list_tar(tar_path, file_ext):
+    """
+    Like extract_tar without extracting anything: the matching members keyed by
+    (base name, member name), read from the tar's member list only.
+    """
+    try:
+        members = tar_members(tar_path)
+    except tarfile.ReadError:
+        print(f"Error: Unable to read tar file {tar_path}")
+        return None
+    return listed_members(members, file_ext)
+
+def listed_members(members, file_ext):
+    """The members list_tar keeps, keyed by (base name, member name)."""
+    listed_files = {}
+    for member in members:
+        if (member.name.lower().endswith(file_ext) and
+            "__MACOSX" not in member.name):
+            base_name = os.path.splitext(os.path.basename(member.name))[0]
+            listed_files[(base_name, member.name)] = member
+    return listed_files
+
+def listed_bases(tar_path, file_ext):
+    """Base names of the papers list_tar finds in tar_path, from its sidecar index when there is one; empty if unreadable."""
+    try:
+        members = tar_members(tar_path)
+    except (tarfile.TarError, OSError):
+        return set()
+    return {base for base, _ in listed_members(members, file_ext)}
+
+def copy_members(tar_path, copies, tar_metrics=None):
+    """Copy (member, destination path) pairs out of a tar in archive order, keeping member mtimes like extract + copy2."""
+    with tarfile.open(tar_path, 'r') as tar:
+        for member, dst_path in sorted(copies, key=lambda copy: copy[0].offset_data):
+            member_start_time = time.perf_counter()
+            with tar.extractfile(member) as src, open(dst_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK_BYTES)
+            os.utime(dst_path, (member.mtime, member.mtime))
+            if tar_metrics is not None:
+                tar_metrics.member(member.name, time.perf_counter() - member_start_time,
+                                   bytes_read=member.size, bytes_written=member.size)
+
 def parse_filename(filename):
     """Parse filename to extract values from pattern arXiv_[src/pdf]_XXXX_YYY.tar"""
     pattern = r"arXiv_(src|pdf)_(\d+)_(\d+)\.tar"
@@ -34,8 +99,12 @@ def parse_filename(filename):
         return x, y, file_type
     return None
 
-def create_mapped_directory(src_files, pdf_files, mapped_dir, tar_pair_name, src_extract_dir, pdf_extract_dir):
-    """Create directory with mapped files and return mapping information."""
+def create_mapped_directory(src_files, pdf_files, mapped_dir, tar_pair_name, src_extract_dir, pdf_extract_dir,
+                            transfer=DEFAULT_TRANSFER):
+    """
+    Create directory with mapped files and return mapping information.
+    transfer (see fileTransfer.TRANSFER_STRATEGIES) is how files leave the extraction directories.
+    """
     mapped_files = []
     tar_dir = os.path.join(mapped_dir, tar_pair_name)
     os.makedirs(tar_dir, exist_ok=True)
@@ -55,12 +124,12 @@ def create_mapped_directory(src_files, pdf_files, mapped_dir, tar_pair_name, src
         # Copy source file
         src_path = os.path.join(src_extract_dir, src_dict[base])
         dst_src_path = os.path.join(base_dir, f"{base}.gz")
-        shutil.copy2(src_path, dst_src_path)
+        transfer_file(src_path, dst_src_path, transfer)
 
         # Copy PDF file
         pdf_path = os.path.join(pdf_extract_dir, pdf_dict[base])
         dst_pdf_path = os.path.join(base_dir, f"{base}.pdf")
-        shutil.copy2(pdf_path, dst_pdf_path)
+        transfer_file(pdf_path, dst_pdf_path, transfer)
 
         mapped_files.append({
             "base_name": base,
@@ -71,22 +140,165 @@ def create_mapped_directory(src_files, pdf_files, mapped_dir, tar_pair_name, src
 
     return mapped_files
 
+def create_mapped_directory_from_tars(src_files, pdf_files, mapped_dir, tar_pair_name, src_tar_path, pdf_tar_path,
+                                      tar_metrics=None):
+    """
+    Like create_mapped_directory, but for listings from list_tar: each matched member is
+    copied straight from its tar to its place in mapped_dir, without a temporary extraction.
+    """
+    mapped_files = []
+    tar_dir = os.path.join(mapped_dir, tar_pair_name)
+    os.makedirs(tar_dir, exist_ok=True)
+
+    src_dict = {base: member for (base, _), member in src_files.items()}
+    pdf_dict = {base: member for (base, _), member in pdf_files.items()}
+    common_bases = set(src_dict.keys()) & set(pdf_dict.keys())
+
+    src_copies = []
+    pdf_copies = []
+    for base in common_bases:
+        base_dir, dst_src_path, dst_pdf_path = mapped_paths(mapped_dir, tar_pair_name, base)
+        os.makedirs(base_dir, exist_ok=True)
+
+        src_copies.append((src_dict[base], dst_src_path))
+        pdf_copies.append((pdf_dict[base], dst_pdf_path))
+
+        mapped_files.append({
+            "base_name": base,
+            "directory": base_dir,
+            "source_file": dst_src_path,
+            "pdf_file": dst_pdf_path
+        })
+
+    copy_members(src_tar_path, src_copies, tar_metrics)
+    copy_members(pdf_tar_path, pdf_copies, tar_metrics)
+    return mapped_files
+
+def mapped_paths(mapped_dir, tar_pair_name, base):
+    """Directory, source file and PDF file of a matched paper in mapped_dir."""
+    base_dir = os.path.join(mapped_dir, tar_pair_name, base)
+    return base_dir, os.path.join(base_dir, f"{base}.gz"), os.path.join(base_dir, f"{base}.pdf")
+
+def remove_written_files(written, keep=()):
+    """
+    Remove the files written ahead to mapped_dir ({path: base name}) of every paper not in keep,
+    e.g. all of a pair found corrupted, and the paper and pair directories left empty.
+    """
+    for path, base in written.items():
+        if base in keep:
+            continue
+        if os.path.exists(path):
+            os.remove(path)
+        for directory in (os.path.dirname(path), os.path.dirname(os.path.dirname(path))):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+
+def written_mapped_files(src_files, pdf_files, mapped_dir, tar_pair_name, written):
+    """
+    Like create_mapped_directory_from_tars for a pair whose matched members were already written to
+    their places in mapped_dir as its tars were read (written maps their paths to base names).
+    Should a written paper turn out unmatched after all, its files are removed.
+    """
+    src_bases = {base for base, _ in src_files}
+    pdf_bases = {base for base, _ in pdf_files}
+    common_bases = src_bases & pdf_bases
+    remove_written_files(written, keep=common_bases)
+    os.makedirs(os.path.join(mapped_dir, tar_pair_name), exist_ok=True)
+
+    mapped_files = []
+    for base in common_bases:
+        base_dir, src_path, pdf_path = mapped_paths(mapped_dir, tar_pair_name, base)
+        mapped_files.append({
+            "base_name": base,
+            "directory": base_dir,
+            "source_file": src_path,
+            "pdf_file": pdf_path
+        })
+    return mapped_files
+
+def manifest_mapped_files(src_files, pdf_files, src_tar_path, pdf_tar_path):
+    """For listings from list_tar, describe where both files of every matched paper sit in their tars."""
+    src_dict = {base: member for (base, _), member in src_files.items()}
+    pdf_dict = {base: member for (base, _), member in pdf_files.items()}
+    common_bases = set(src_dict.keys()) & set(pdf_dict.keys())
+
+    return [{
+        "base_name": base,
+        "source_tar": os.path.abspath(src_tar_path),
+        "source_member": src_dict[base].name,
+        "source_offset": src_dict[base].offset_data,
+        "source_size": src_dict[base].size,
+        "pdf_tar": os.path.abspath(pdf_tar_path),
+        "pdf_member": pdf_dict[base].name,
+        "pdf_offset": pdf_dict[base].offset_data,
+        "pdf_size": pdf_dict[base].size
+    } for base in common_bases]
+
 def process_tar_pair(src_tar_path, pdf_tar_path, mapping_file, mapped_file, pair_name, 
-                    src_dir, pdf_dir, src_file_name, pdf_file_name, mapped_dir):
-    """Process a pair of TAR files and create mapped directory structure."""
+                    src_dir, pdf_dir, src_file_name, pdf_file_name, mapped_dir, mapping_mode='extract',
+                    transfer=DEFAULT_TRANSFER, tar_metrics=None):
+    """
+    Process a pair of TAR files and create mapped directory structure (see MAPPING_MODES).
+    transfer only applies to the 'extract' mode, the others never write an extracted copy.
+    Members read out of the tars are timed and counted in tar_metrics if given.
+    """
     start_time = time.time()
 
+    if mapping_mode != 'extract':
+        # Both sides are worked out from the member lists alone
+        gz_files = list_tar(src_tar_path, ".gz")
+        pdf_files = list_tar(pdf_tar_path, ".pdf")
+        return record_tar_pair(gz_files, pdf_files, mapping_file, mapped_file, pair_name,
+                               src_dir, pdf_dir, src_file_name, pdf_file_name, mapped_dir,
+                               None, None, start_time,
+                               pair_materializer(mapping_mode, mapped_dir, pair_name, src_tar_path, pdf_tar_path,
+                                                 tar_metrics))
+
     # Extract files from both archives
     src_extract_dir = f"./gz_extracted/{pair_name}"
     pdf_extract_dir = f"./pdf_extracted/{pair_name}"
     
-    gz_files = extract_tar(src_tar_path, src_extract_dir, ".gz")
-    pdf_files = extract_tar(pdf_tar_path, pdf_extract_dir, ".pdf")
-
+    gz_files = extract_tar(src_tar_path, src_extract_dir, ".gz", tar_metrics)
+    pdf_files = extract_tar(pdf_tar_path, pdf_extract_dir, ".pdf", tar_metrics)
+
+    return record_tar_pair(gz_files, pdf_files, mapping_file, mapped_file, pair_name,
+                           src_dir, pdf_dir, src_file_name, pdf_file_name, mapped_dir,
+                           src_extract_dir, pdf_extract_dir, start_time, transfer=transfer)
+
+def pair_materializer(mapping_mode, mapped_dir, pair_name, src_tar_path, pdf_tar_path, tar_metrics=None,
+                      written=None):
+    """
+    The materialize function record_tar_pair needs for a listed (not extracted) pair.
+    In the 'direct' mode, written maps the files already written to mapped_dir to their base
+    names (see written_mapped_files); without it the matched members are copied from the tars.
+    """
+    if mapping_mode == 'direct' and written is not None:
+        return partial(written_mapped_files, mapped_dir=mapped_dir, tar_pair_name=pair_name, written=written)
+    if mapping_mode == 'direct':
+        return partial(create_mapped_directory_from_tars, mapped_dir=mapped_dir, tar_pair_name=pair_name,
+                       src_tar_path=src_tar_path, pdf_tar_path=pdf_tar_path, tar_metrics=tar_metrics)
+    return partial(manifest_mapped_files, src_tar_path=src_tar_path, pdf_tar_path=pdf_tar_path)
+
+def remove_extract_dirs(*extract_dirs):
+    for extract_dir in extract_dirs:
+        if extract_dir is not None:
+            shutil.rmtree(extract_dir, ignore_errors=True)
+
+def record_tar_pair(gz_files, pdf_files, mapping_file, mapped_file, pair_name,
+                    src_dir, pdf_dir, src_file_name, pdf_file_name, mapped_dir,
+                    src_extract_dir, pdf_extract_dir, start_time, materialize=None, transfer=DEFAULT_TRANSFER):
+    """
+    Write mapping results for an extracted pair of TAR files and clean up the extraction.
+    materialize(gz_files, pdf_files) replaces copying from the extraction directories
+    (which are then None) when the pair was only listed; otherwise files leave them by transfer.
+    With mapping_file and mapped_file None nothing is written, e.g. in a worker of compare_directories.
+    Returns the pair's stats with the lines written for it, or None if a tar is corrupted.
+    """
     # If either tar file is corrupted, consider it unpaired
     if gz_files is None or pdf_files is None:
-        shutil.rmtree(src_extract_dir, ignore_errors=True)
-        shutil.rmtree(pdf_extract_dir, ignore_errors=True)
+        remove_extract_dirs(src_extract_dir, pdf_extract_dir)
         return None
 
     # Create sets of base names for traditional mapping analysis
@@ -97,27 +309,31 @@ def process_tar_pair(src_tar_path, pdf_tar_path, mapping_file, mapped_file, pair
     missing_gz = pdf_bases - gz_bases
     missing_pdf = gz_bases - pdf_bases
 
-    # Write to mapping.jsonl
+    # Entries for mapping.jsonl
+    mapping_entries = []
     for base in missing_gz:
-        mapping_file.write(json.dumps({
+        mapping_entries.append({
             "path": f"{pdf_dir}/{pdf_file_name}/{base}.pdf",
             "status": "Missing .gz"
-        }) + '\n')
+        })
         
     for base in missing_pdf:
-        mapping_file.write(json.dumps({
+        mapping_entries.append({
             "path": f"{src_dir}/{src_file_name}/{base}.gz",
             "status": "Missing .pdf"
-        }) + '\n')
+        })
 
     # Create mapped directory structure and get mapping information
-    mapped_files = create_mapped_directory(gz_files, pdf_files, mapped_dir, pair_name, 
-                                         src_extract_dir, pdf_extract_dir)
+    if materialize is None:
+        mapped_files = create_mapped_directory(gz_files, pdf_files, mapped_dir, pair_name, 
+                                             src_extract_dir, pdf_extract_dir, transfer)
+    else:
+        mapped_files = materialize(gz_files, pdf_files)
 
     # Calculate processing time
     processing_time = time.time() - start_time
 
-    # Write to mapped.jsonl
+    # Entry for mapped.jsonl
     mapped_entry = {
         "tar_pair": pair_name,
         "mapped_directory": os.path.join(mapped_dir, pair_name),
@@ -127,13 +343,13 @@ def process_tar_pair(src_tar_path, pdf_tar_path, mapping_file, mapped_file, pair
         "source_tar": src_file_name,
         "pdf_tar": pdf_file_name
     }
-    mapped_file.write(json.dumps(mapped_entry) + '\n')
+    if mapping_file is not None:
+        write_pair_results(mapping_file, mapped_file, mapping_entries, mapped_entry)
 
     # Cleanup temporary extraction directories
-    shutil.rmtree(src_extract_dir, ignore_errors=True)
-    shutil.rmtree(pdf_extract_dir, ignore_errors=True)
+    remove_extract_dirs(src_extract_dir, pdf_extract_dir)
 
-    return {
+    stats = {
         "pair_name": pair_name,
         "total_gz": len(gz_bases),
         "total_pdf": len(pdf_bases),
@@ -141,15 +357,29 @@ def process_tar_pair(src_tar_path, pdf_tar_path, mapping_file, mapped_file, pair
         "missing_gz": len(missing_gz),
         "missing_pdf": len(missing_pdf)
     }
+    return {
+        "stats": stats,
+        "mapping_entries": mapping_entries,
+        "mapped_entry": mapped_entry
+    }
 
-def compare_directories(src_dir, pdf_dir, mapped_dir="./mapped_data", mapped_jsonl="mapped.jsonl"):
-    """Compare TAR files and create mapped directory structure."""
-    total_stats = []    
-    unpaired_files = []
-    
-    # Create mapped directory
-    os.makedirs(mapped_dir, exist_ok=True)
+def write_pair_results(mapping_file, mapped_file, mapping_entries, mapped_entry):
+    """Write one pair's lines to mapping.jsonl and mapped.jsonl."""
+    for entry in mapping_entries:
+        mapping_file.write(json.dumps(entry) + '\n')
+    mapped_file.write(json.dumps(mapped_entry) + '\n')
 
+def mapped_files_exist(mapped_entry):
+    """Check that the files a pair's mapped entry points to are still in place (manifests point to none)."""
+    return all(os.path.exists(mapped[key]) for mapped in mapped_entry["mapped_files"]
+               for key in ("source_file", "pdf_file") if key in mapped)
+
+def mapping_stage(mapping_mode):
+    """Cache and checkpoint stage name; manifests are recorded apart from mapped directories."""
+    return CACHE_STAGE if mapping_mode != 'manifest' else f"{CACHE_STAGE}-manifest"
+
+def find_tar_pairs(src_dir, pdf_dir):
+    """List TAR files in both directories and key them by their x and y values."""
     # Get lists of files
     src_files = [f for f in os.listdir(src_dir) if f.endswith('.tar')]
     pdf_files = [f for f in os.listdir(pdf_dir) if f.endswith('.tar')]
@@ -170,54 +400,22 @@ def compare_directories(src_dir, pdf_dir, mapped_dir="./mapped_data", mapped_jso
             x, y, _ = parsed
             pdf_mapping[(x, y)] = pdf_file
 
-    # Find matching pairs
-    matching_pairs = set(src_mapping.keys()) & set(pdf_mapping.keys())
-    
-    current_dir = Path(os.getcwd())
-    mapping_path = current_dir / "mapping.jsonl"
-    mapped_path = current_dir / mapped_jsonl
+    return src_mapping, pdf_mapping
 
-    with mapping_path.open('w') as mapping_file, mapped_path.open('w') as mapped_file:
-        # Process matching pairs
-        for x, y in matching_pairs:
-            src_file = src_mapping[(x, y)]
-            pdf_file = pdf_mapping[(x, y)]
-            pair_name = f"{x}_{y}"
-            
-            stats = process_tar_pair(
-                os.path.join(src_dir, src_file),
-                os.path.join(pdf_dir, pdf_file),
-                mapping_file,
-                mapped_file,
-                pair_name,
-                src_dir,
-                pdf_dir,
-                src_file,
-                pdf_file,
-                mapped_dir
-            )
-            
-            if stats is None:
-                unpaired_files.append(f"Corrupted file in pair: {src_file} or {pdf_file}")
-            else:
-                total_stats.append(stats)
-
-    # Find and record unpaired files
-    for src_file in src_files:
-        parsed = parse_filename(src_file)
-        if parsed:
-            x, y, _ = parsed
-            if (x, y) not in pdf_mapping:
-                unpaired_files.append(f"Missing PDF counterpart for source file: {src_file}")
+def find_unpaired_files(src_mapping, pdf_mapping):
+    """Describe TAR files that have no counterpart in the other directory."""
+    unpaired_files = []
+    for (x, y), src_file in src_mapping.items():
+        if (x, y) not in pdf_mapping:
+            unpaired_files.append(f"Missing PDF counterpart for source file: {src_file}")
     
-    for pdf_file in pdf_files:
-        parsed = parse_filename(pdf_file)
-        if parsed:
-            x, y, _ = parsed
-            if (x, y) not in src_mapping:
-                unpaired_files.append(f"Missing source counterpart for PDF file: {pdf_file}")
+    for (x, y), pdf_file in pdf_mapping.items():
+        if (x, y) not in src_mapping:
+            unpaired_files.append(f"Missing source counterpart for PDF file: {pdf_file}")
+    return unpaired_files
 
-    # Generate and print summary report
+def print_summary(total_stats, unpaired_files):
+    """Generate and print the summary report."""
     summary = {
         "total_pairs": len(total_stats),
         "total_gz": sum(s['total_gz'] for s in total_stats),
@@ -239,8 +437,133 @@ def compare_directories(src_dir, pdf_dir, mapped_dir="./mapped_data", mapped_jso
     for msg in unpaired_files:
         print(f" - {msg}")
 
+def compare_directories(src_dir, pdf_dir, mapped_dir="./mapped_data", mapped_jsonl="mapped.jsonl", cache=None,
+                        checkpoint=None, mapping_mode='extract', workers=1, use_processes=False,
+                        transfer=DEFAULT_TRANSFER, sink=None, metrics=None):
+    """
+    Compare TAR files and create mapped directory structure.
+    mapping_mode is one of MAPPING_MODES; 'direct' and 'manifest' never extract the tars.
+    transfer is how the 'extract' mode moves files into mapped_dir (see fileTransfer.TRANSFER_STRATEGIES).
+    With workers > 1 the pairs are mapped concurrently on a thread pool (a process pool with
+    use_processes); this process stays the only writer and records pairs in pair name order.
+    With a ResultCache, pairs mapped by an earlier run are reused while their mapped files exist.
+    With a resuming Checkpoint, pairs done by an interrupted run are skipped and the files appended to.
+    With an outputSink.ParquetSink, every mapped pair is also written as Parquet,
+    and with runMetrics.Metrics every pair's time and counters are recorded.
+    """
+    total_stats = []    
+    unpaired_files = []
+    
+    # Create mapped directory
+    os.makedirs(mapped_dir, exist_ok=True)
+
+    src_mapping, pdf_mapping = find_tar_pairs(src_dir, pdf_dir)
+
+    # Find matching pairs, in a fixed order so outputs don't depend on timing
+    matching_pairs = sorted(set(src_mapping.keys()) & set(pdf_mapping.keys()))
+    
+    current_dir = Path(os.getcwd())
+    mapping_path = current_dir / "mapping.jsonl"
+    mapped_path = current_dir / mapped_jsonl
+
+    stage = mapping_stage(mapping_mode)
+    if checkpoint is not None:
+        checkpoint.start(stage)
+    if sink is not None:
+        sink.start(stage)
+    if metrics is not None:
+        metrics.start(stage)
+    mode = output_mode(checkpoint)
+
+    if workers > 1:
+        executor = (ProcessPoolExecutor if use_processes else ThreadPoolExecutor)(max_workers=workers)
+    else:
+        executor = None
+
+    with mapping_path.open(mode) as mapping_file, mapped_path.open(mode) as mapped_file:
+        try:
+            # Cached pairs are resolved first; the rest are mapped by the pool straight away
+            jobs = []
+            for x, y in matching_pairs:
+                src_file = src_mapping[(x, y)]
+                pdf_file = pdf_mapping[(x, y)]
+                pair_name = f"{x}_{y}"
+                tar_pair = [os.path.join(src_dir, src_file), os.path.join(pdf_dir, pdf_file)]
+                if checkpoint is not None and checkpoint.done(stage, tar_pair):
+                    continue
+
+                cached = cache.get(stage, tar_pair) if cache is not None else None
+                if cached is not None and not mapped_files_exist(cached["mapped_entry"]):
+                    cached = None
+                pair_args = (tar_pair[0], tar_pair[1], None, None, pair_name, src_dir, pdf_dir,
+                             src_file, pdf_file, mapped_dir, mapping_mode, transfer)
+                tar_metrics = start_tar(metrics, stage, tar_pair)
+                if cached is None and executor is not None:
+                    future = executor.submit(measured, tar_metrics, process_tar_pair, *pair_args)
+                else:
+                    future = None
+                jobs.append((pair_name, src_file, pdf_file, tar_pair, pair_args, cached, tar_metrics, future))
+            if executor is not None:
+                print(f"Processing {len(jobs)} tar pairs with {workers} workers...")
+
+            # Process matching pairs
+            for pair_name, src_file, pdf_file, tar_pair, pair_args, cached, tar_metrics, future in jobs:
+                if cached is not None:
+                    tar_metrics.restart()
+                    print(f"Using cached result for pair {pair_name}")
+                    pair_result = cached
+                else:
+                    if future is not None:
+                        pair_result, tar_metrics = future.result()
+                    else:
+                        tar_metrics.restart()
+                        pair_result = process_tar_pair(*pair_args, tar_metrics=tar_metrics)
+                    if cache is not None and pair_result is not None:
+                        cache.put(stage, tar_pair, pair_result)
+
+                if pair_result is None:
+                    unpaired_files.append(f"Corrupted file in pair: {src_file} or {pdf_file}")
+                else:
+                    write_pair_results(mapping_file, mapped_file, pair_result["mapping_entries"],
+                                       pair_result["mapped_entry"])
+                    total_stats.append(pair_result["stats"])
+                    if sink is not None:
+                        sink.write(stage, tar_pair, pair_result)
+
+                finish_tar(metrics, tar_metrics, cached is not None,
+                           None if pair_result is not None else f"Corrupted file in pair: {src_file} or {pdf_file}")
+                if checkpoint is not None:
+                    mapping_file.flush()
+                    mapped_file.flush()
+                    checkpoint.mark(stage, tar_pair)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if metrics is not None:
+                metrics.finish(stage)
+
+    # Find and record unpaired files
+    unpaired_files.extend(find_unpaired_files(src_mapping, pdf_mapping))
+
+    print_summary(total_stats, unpaired_files)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Map arXiv source tars to their PDF tars")
+    parser.add_argument("--workers", type=int, default=1, help="number of tar pairs mapped in parallel")
+    parser.add_argument("--processes", action="store_true",
+                        help="map pairs on a process pool instead of threads, for CPU-heavy copying")
+    parser.add_argument("--mode", choices=MAPPING_MODES, default='extract',
+                        help="'direct' copies matched members straight from the tars, 'manifest' only "
+                             "records their tar offsets; neither extracts the tars (default: %(default)s)")
+    parser.add_argument("--transfer", choices=TRANSFER_STRATEGIES, default=DEFAULT_TRANSFER,
+                        help="how the extract mode puts files into mapped_data: copy them again, move them "
+                             "out of the extraction, hardlink or reflink them (default: %(default)s)")
+    args = parser.parse_args()
     compare_directories(
         src_dir="workingData/eda",
-        pdf_dir="workingData/pdf"
+        pdf_dir="workingData/pdf",
+        mapping_mode=args.mode,
+        workers=args.workers,
+        use_processes=args.processes,
+        transfer=args.transfer
     )
\ No newline at end of file
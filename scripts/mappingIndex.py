@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import mmap
+import time
+import argparse
+from collections import Counter, defaultdict
+
+# Bump when the file layout changes so older indexes are rebuilt
+INDEX_VERSION = 1
+
+DEFAULT_MAPPING_FILE = "mapping.jsonl"
+
+# The index of mapping.jsonl is stored next to it as mapping.jsonl.index: one JSON header line
+# (per-status and per-tar counts) followed by one "<paper id>\t<status>\t<path>" line per entry,
+# sorted by paper id so a lookup is a binary search over the memory-mapped file
+INDEX_SUFFIX = '.index'
+
+
+def index_path(mapping_path):
+    return mapping_path + INDEX_SUFFIX
+
+def paper_id(name):
+    """
+    Paper id of a mapping.jsonl path, a file name or an id as queried:
+    .../cond-mat0005116.pdf, cond-mat0005116.gz and cond-mat/0005116 all give cond-mat0005116.
+    """
+    name = name.rsplit('/', 1)[-1] if name.endswith(('.gz', '.pdf')) else name.replace('/', '')
+    for extension in ('.gz', '.pdf'):
+        if name.endswith(extension):
+            return name[:-len(extension)]
+    return name
+
+def tar_name(path):
+    # Same tar file name as task-1.py, e.g. "arXiv_pdf_2310_104.tar"
+    return path.split("/")[-2]
+
+def read_entries(mapping_path):
+    with open(mapping_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # e.g. the last line of a run that was killed while writing it
+                print(f"Skipping invalid line in {mapping_path}: {line.strip()[:80]}")
+
+def build_index(mapping_path=DEFAULT_MAPPING_FILE):
+    """Write the index of mapping_path next to it and return its path."""
+    st = os.stat(mapping_path)
+    records = []
+    status_counts = Counter()
+    tar_counts = defaultdict(Counter)
+    for entry in read_entries(mapping_path):
+        path, status = entry["path"], entry["status"]
+        records.append(f"{paper_id(path)}\t{status}\t{path}\n".encode('utf-8'))
+        status_counts[status] += 1
+        tar_counts[tar_name(path)][status] += 1
+    # Byte order is the order lookups compare in; the tab sorts "abc" before "abcd"
+    records.sort()
+
+    header = {
+        'version': INDEX_VERSION,
+        'mapping_size': st.st_size,
+        'mapping_mtime_ns': st.st_mtime_ns,
+        'entries': len(records),
+        'status_counts': dict(status_counts),
+        'tar_counts': {tar: dict(counts) for tar, counts in tar_counts.items()}
+    }
+    path = index_path(mapping_path)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(json.dumps(header, separators=(',', ':')).encode('utf-8') + b'\n')
+        f.writelines(records)
+    os.replace(temp_path, path)
+    return path
+
+def index_is_current(mapping_path):
+    """Whether the index of mapping_path exists and was built from its current contents."""
+    try:
+        with open(index_path(mapping_path), 'rb') as f:
+            header = json.loads(f.readline())
+        st = os.stat(mapping_path)
+    except (OSError, ValueError):
+        return False
+    return (header.get('version') == INDEX_VERSION and header.get('mapping_size') == st.st_size
+            and header.get('mapping_mtime_ns') == st.st_mtime_ns)
+
+
+class MappingIndex:
+    """
+    Read-only view of a mapping.jsonl index: which entries a paper has (point lookups in
+    O(log n) reads of the mapped file) and the per-status counts of every tar, without
+    scanning mapping.jsonl. Use open_index() to get one that is up to date.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        header = self.file.readline()
+        self.header = json.loads(header)
+        self.data_start = len(header)
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def line_start(self, pos):
+        return self.data.rfind(b'\n', self.data_start - 1, pos) + 1
+
+    def lookup(self, paper):
+        """mapping.jsonl entries ({"path", "status"}) of a paper id, or [] if it has none."""
+        key = paper_id(paper).encode('utf-8') + b'\t'
+        data = self.data
+        # First line not below key: lines starting before lo are below it, lines from hi on are not
+        lo, hi = self.data_start, len(data)
+        while lo < hi:
+            start = self.line_start((lo + hi) // 2)
+            end = data.find(b'\n', start) + 1
+            if data[start:end] < key:
+                lo = end
+            else:
+                hi = start
+
+        entries = []
+        while data[lo:lo + len(key)] == key:
+            end = data.find(b'\n', lo) + 1
+            _, status, path = data[lo:end - 1].decode('utf-8').split('\t', 2)
+            entries.append({"path": path, "status": status})
+            lo = end
+        return entries
+
+    @property
+    def status_counts(self):
+        return self.header['status_counts']
+
+    @property
+    def tar_counts(self):
+        """{tar file name: {status: number of entries}} for every tar with entries."""
+        return self.header['tar_counts']
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def open_index(mapping_path=DEFAULT_MAPPING_FILE, rebuild=False):
+    """MappingIndex of mapping_path, (re)building it first if it is missing or out of date."""
+    if rebuild or not index_is_current(mapping_path):
+        print(f"Indexing {mapping_path}...")
+        build_index(mapping_path)
+    return MappingIndex(index_path(mapping_path))
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up papers and per-tar counts in mapping.jsonl through its index")
+    parser.add_argument("papers", nargs='*', help="paper ids (e.g. 2310.12345 or cond-mat/0005116) or file names")
+    parser.add_argument("--mapping", default=DEFAULT_MAPPING_FILE, help="mapping.jsonl to index (default: %(default)s)")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index even if it is up to date")
+    parser.add_argument("--tar", action="append", default=[], help="print the counts of this tar file (repeatable)")
+    parser.add_argument("--counts", action="store_true", help="print the counts of every tar file")
+    args = parser.parse_args()
+
+    try:
+        index = open_index(args.mapping, rebuild=args.rebuild)
+    except OSError as e:
+        sys.exit(f"Cannot index {args.mapping}: {e}")
+
+    with index:
+        for paper in args.papers:
+            start_time = time.perf_counter()
+            entries = index.lookup(paper)
+            elapsed_us = (time.perf_counter() - start_time) * 1e6
+            if not entries:
+                print(f"{paper}: not in {args.mapping} ({elapsed_us:.0f} us)")
+            for entry in entries:
+                print(f"{paper}: {entry['status']} - {entry['path']} ({elapsed_us:.0f} us)")
+
+        tars = sorted(index.tar_counts) if args.counts else args.tar
+        for tar in tars:
+            counts = index.tar_counts.get(tar, {})
+            print(f"{tar}: " + (", ".join(f"{status}: {count}" for status, count in sorted(counts.items()))
+                                or "no entries"))
+        if args.counts or (not args.papers and not args.tar):
+            print(f"Total: {index.header['entries']} entries ("
+                  + ", ".join(f"{status}: {count}" for status, count in sorted(index.status_counts.items())) + ")")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import os
+import shutil
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = pq = None
+
+DEFAULT_PARQUET_DIR = "parquet"
+
+
+def figure_table_rows(value):
+    result, non_processed_files = value
+    tar_row = {'tar_file': result['tar_file'], **result['stats'],
+               'processing_time_seconds': result['processing_time_seconds']}
+    file_rows = []
+    for entry in result['detailed_analysis']:
+        for file_analysis in entry['analysis'].get('files', []):
+            analysis = file_analysis['analysis']
+            file_rows.append({
+                'tar_file': result['tar_file'],
+                'gz_file': entry['file'],
+                'filename': file_analysis['filename'],
+                'figures': len(analysis['figures']),
+                'tables': analysis['tables'],
+                'equations': analysis['equations'],
+                'column_format': analysis['column_format'],
+                'found_figures': len(file_analysis['found_figures']),
+                'missing_figures': len(file_analysis['missing_figures'])
+            })
+    return {'figure_table_tars': [tar_row], 'figure_table_files': file_rows}
+
+def latex_type_rows(value):
+    archive_results, tar_stats = value
+    gz_rows = [{'tar_file': archive_results['tar_file'], **gz_result} for gz_result in archive_results['gz_files']]
+    return {'latex_type_tars': [tar_stats], 'latex_type_files': gz_rows}
+
+def latex_type_headers_rows(value):
+    # Kept apart from the full results, which the bounded scan must not replace
+    archive_results, tar_stats = value
+    gz_rows = [{'tar_file': archive_results['tar_file'], **gz_result,
+                'scan_truncated': gz_result.get('scan_truncated', False)} for gz_result in archive_results['gz_files']]
+    return {'latex_type_headers_tars': [tar_stats], 'latex_type_headers_files': gz_rows}
+
+def mapping_rows(value):
+    mapped_entry = value['mapped_entry']
+    pair_name = mapped_entry['tar_pair']
+    return {
+        'mapping': [{'tar_pair': pair_name, 'tar_file': entry['path'].split('/')[-2], **entry}
+                    for entry in value['mapping_entries']],
+        'mapped_files': [{'tar_pair': pair_name, 'source_tar_file': mapped_entry['source_tar'],
+                          'pdf_tar_file': mapped_entry['pdf_tar'], **mapped}
+                         for mapped in mapped_entry['mapped_files']]
+    }
+
+def page_count_rows(value):
+    pdf_data, stats = value
+    rows = []
+    for entry in pdf_data:
+        tar_file, filename = entry['filepath'].rsplit('/', 1)
+        rows.append({'tar_file': tar_file, 'filename': filename, **entry})
+    return {'pdf_page_counts': rows}
+
+def pdf_copy_rows(value):
+    return {'pdf_copies': [{'tar_file': value['tar_file'], 'pdf_file': pdf_file}
+                           for pdf_file in value['pdfs_copied']]}
+
+# Every stage's records flattened into per-paper (or per-tar) tables, keyed by the same
+# stage names the result cache uses; each function takes the stage's cached value
+STAGE_ROWS = {
+    'figureTable': figure_table_rows,
+    'latexType': latex_type_rows,
+    'latexType-headers': latex_type_headers_rows,
+    'mapping': mapping_rows,
+    'mapping-manifest': mapping_rows,
+    'pdfPageCount': page_count_rows,
+    'pdfPageCount-pypdf2': page_count_rows,
+    'sourcePDFcopy': pdf_copy_rows,
+}
+
+STAGE_TABLES = {
+    'figureTable': ['figure_table_tars', 'figure_table_files'],
+    'latexType': ['latex_type_tars', 'latex_type_files'],
+    'latexType-headers': ['latex_type_headers_tars', 'latex_type_headers_files'],
+    'mapping': ['mapping', 'mapped_files'],
+    'mapping-manifest': ['mapping', 'mapped_files'],
+    'pdfPageCount': ['pdf_page_counts'],
+    'pdfPageCount-pypdf2': ['pdf_page_counts'],
+    'sourcePDFcopy': ['pdf_copies'],
+}
+
+# Fixed schemas keep the partitions of a table readable as one dataset, empty ones included
+if pa is not None:
+    FIGURE_TABLE_STATS = ['total_files', 'total_gz_files', 'gz_files_with_figures', 'gz_files_with_tables',
+                          'gz_files_with_equations', 'gz_files_with_single_column', 'gz_files_with_multi_column',
+                          'total_figures', 'total_tables', 'total_equations', 'total_missing_figures',
+                          'total_found_figures', 'gz_files_missing_figures', 'gz_files_all_figures_present']
+    LATEX_TYPE_TARS = pa.schema([
+        ('tar_file', pa.string()), ('total_gz_files', pa.int64()), ('gz_files_with_latex', pa.int64()),
+        ('gz_files_with_tex', pa.int64()), ('gz_files_with_content_latex', pa.int64()),
+        ('gz_files_with_other_latex', pa.int64()), ('processing_time', pa.float64())])
+    LATEX_TYPE_FILES = pa.schema([
+        ('tar_file', pa.string()), ('gz_file', pa.string()), ('contains_tex', pa.bool_()),
+        ('contains_content_latex', pa.bool_()), ('contains_other_latex', pa.bool_())])
+    TABLE_SCHEMAS = {
+        'figure_table_tars': pa.schema([('tar_file', pa.string())]
+                                       + [(key, pa.int64()) for key in FIGURE_TABLE_STATS]
+                                       + [('processing_time_seconds', pa.float64())]),
+        'figure_table_files': pa.schema([
+            ('tar_file', pa.string()), ('gz_file', pa.string()), ('filename', pa.string()),
+            ('figures', pa.int64()), ('tables', pa.int64()), ('equations', pa.int64()),
+            ('column_format', pa.string()), ('found_figures', pa.int64()), ('missing_figures', pa.int64())]),
+        'latex_type_tars': LATEX_TYPE_TARS,
+        'latex_type_files': LATEX_TYPE_FILES,
+        'latex_type_headers_tars': LATEX_TYPE_TARS,
+        'latex_type_headers_files': LATEX_TYPE_FILES.append(pa.field('scan_truncated', pa.bool_())),
+        'mapping': pa.schema([
+            ('tar_pair', pa.string()), ('tar_file', pa.string()), ('path', pa.string()), ('status', pa.string())]),
+        # 'direct' and 'extract' fill directory/source_file/pdf_file, 'manifest' the tar locations
+        'mapped_files': pa.schema([
+            ('tar_pair', pa.string()), ('source_tar_file', pa.string()), ('pdf_tar_file', pa.string()),
+            ('base_name', pa.string()), ('directory', pa.string()),
+            ('source_file', pa.string()), ('pdf_file', pa.string()),
+            ('source_tar', pa.string()), ('source_member', pa.string()),
+            ('source_offset', pa.int64()), ('source_size', pa.int64()),
+            ('pdf_tar', pa.string()), ('pdf_member', pa.string()),
+            ('pdf_offset', pa.int64()), ('pdf_size', pa.int64())]),
+        'pdf_page_counts': pa.schema([
+            ('tar_file', pa.string()), ('filename', pa.string()), ('filepath', pa.string()),
+            ('page_count', pa.int64())]),
+        'pdf_copies': pa.schema([('tar_file', pa.string()), ('pdf_file', pa.string())]),
+    }
+
+
+def partition_name(tar_paths):
+    """One partition per tar; a mapping pair is named after its source tar."""
+    return os.path.splitext(os.path.basename(tar_paths[0]))[0]
+
+
+class ParquetSink:
+    """
+    Writes the records of every stage, next to its JSONL files, as Parquet tables in
+    <directory>/<table>/<partition>.parquet with one partition per tar (or tar pair).
+    Writing a tar again replaces its partition, so cached and resumed runs never duplicate rows.
+    A normal run starts each stage's tables over, like its JSONL files; with resume they are kept.
+    """
+
+    def __init__(self, directory=DEFAULT_PARQUET_DIR, resume=False):
+        if pq is None:
+            raise ImportError("Parquet output needs pyarrow (pip install pyarrow)")
+        self.directory = directory
+        self.resume = resume
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self, stage):
+        """Clear the tables of stage unless resuming."""
+        if self.resume:
+            return
+        for table in STAGE_TABLES[stage]:
+            shutil.rmtree(os.path.join(self.directory, table), ignore_errors=True)
+
+    def write(self, stage, tar_paths, value):
+        """Write the tables of tar_paths from the stage's value, in the form the result cache stores it."""
+        partition = partition_name(tar_paths)
+        for table, rows in STAGE_ROWS[stage](value).items():
+            table_dir = os.path.join(self.directory, table)
+            os.makedirs(table_dir, exist_ok=True)
+            path = os.path.join(table_dir, f"{partition}.parquet")
+            # Readers of the table directory skip dot files, so a half-written partition is never seen
+            temp_path = os.path.join(table_dir, f".{partition}.parquet.tmp")
+            schema = TABLE_SCHEMAS[table]
+            columns = {name: [row.get(name) for row in rows] for name in schema.names}
+            pq.write_table(pa.table(columns, schema=schema), temp_path)
+            os.replace(temp_path, path)
@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import argparse
+
+from resultCache import ResultCache
+from mappingIndex import paper_id
+from latexType import LATEX_MODES, latex_stage
+
+DEFAULT_STORE_PATH = "paper_store.sqlite"
+
+# Per stage, the list of a tar's record holding one entry per paper and the entry's paper file
+PAPER_LISTS = {
+    'figureTable': ('detailed_analysis', 'file'),
+    'latexType': ('gz_files', 'gz_file'),
+    'latexType-headers': ('gz_files', 'gz_file'),
+}
+
+# The JSONL files exported for each stage: its per-tar records and, for latexType, its per-tar numbers
+EXPORT_FILES = {
+    'figureTable': ("all_tar_analysis.jsonl", None),
+    'latexType': ("insideTarAnalysis.jsonl", "insideTarAnalysisNumbers.jsonl"),
+    'latexType-headers': ("insideTarAnalysis.jsonl", "insideTarAnalysisNumbers.jsonl"),
+}
+
+
+class PaperStore(ResultCache):
+    """
+    The figureTable and latexType results kept per paper in SQLite, so a run only stores the
+    papers of new or changed tars and a paper is looked up without reading its tar's record.
+    A stage's value, [record, extra] as the result cache holds it, is split into one row per
+    paper keyed by its arXiv id (the entries of the record's PAPER_LISTS list) and one row per
+    tar with the rest of the record and extra. export() joins them back into the stage's
+    JSONL files line for line. Unchanged tars are recognized by their ResultCache fingerprint.
+    """
+
+    def __init__(self, db_path=DEFAULT_STORE_PATH, use_hash=False):
+        super().__init__(db_path, use_hash)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tars ("
+            "stage TEXT, tar_key TEXT, fingerprint TEXT, retry INTEGER, record TEXT, extra TEXT, "
+            "PRIMARY KEY (stage, tar_key))")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS papers ("
+            "stage TEXT, tar_key TEXT, position INTEGER, paper_id TEXT, record TEXT, "
+            "PRIMARY KEY (stage, tar_key, position))")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS papers_by_id ON papers (stage, paper_id)")
+        self.conn.commit()
+
+    def has(self, stage, tar_paths):
+        """Whether the results of tar_paths are stored and the tars haven't changed since."""
+        row = self.conn.execute(
+            "SELECT fingerprint, retry FROM tars WHERE stage = ? AND tar_key = ?",
+            (stage, self.tar_key(tar_paths))).fetchone()
+        if row is None or row[1]:
+            return False
+        try:
+            return row[0] == self.fingerprint(tar_paths)
+        except OSError:
+            return False
+
+    def write(self, stage, tar_paths, value, retry=False):
+        """
+        Replace the stored results of tar_paths with value. With retry (e.g. for a tar that
+        could not be read) they are exported all the same, but the next run analyzes the tar again.
+        """
+        list_key, name_key = PAPER_LISTS[stage]
+        record, extra = value
+        tar_key = self.tar_key(tar_paths)
+        with self.conn:
+            self.conn.execute("DELETE FROM papers WHERE stage = ? AND tar_key = ?", (stage, tar_key))
+            self.conn.executemany(
+                "INSERT INTO papers VALUES (?, ?, ?, ?, ?)",
+                [(stage, tar_key, position, paper_id(paper[name_key]), json.dumps(paper))
+                 for position, paper in enumerate(record[list_key])])
+            self.conn.execute(
+                "INSERT OR REPLACE INTO tars VALUES (?, ?, ?, ?, ?, ?)",
+                (stage, tar_key, self.fingerprint(tar_paths), retry, json.dumps({**record, list_key: []}),
+                 json.dumps(extra)))
+
+    def discard(self, stage, tar_paths):
+        """Forget tar_paths, e.g. once it fails where the stage writes no record for it."""
+        tar_key = self.tar_key(tar_paths)
+        with self.conn:
+            self.conn.execute("DELETE FROM papers WHERE stage = ? AND tar_key = ?", (stage, tar_key))
+            self.conn.execute("DELETE FROM tars WHERE stage = ? AND tar_key = ?", (stage, tar_key))
+
+    def tar_lines(self, stage, directory):
+        """(record line, extra line) of every stored tar of stage still in directory, by tar name."""
+        list_key, _ = PAPER_LISTS[stage]
+        directory = os.path.abspath(directory)
+        tars = self.conn.execute(
+            "SELECT tar_key, record, extra FROM tars WHERE stage = ? ORDER BY tar_key", (stage,)).fetchall()
+        for tar_key, record, extra in tars:
+            if os.path.dirname(tar_key) != directory or not os.path.exists(tar_key):
+                continue
+            papers = [row[0] for row in self.conn.execute(
+                "SELECT record FROM papers WHERE stage = ? AND tar_key = ? ORDER BY position", (stage, tar_key))]
+            # The papers are spliced in as stored text, so nothing is parsed again
+            yield record.replace(f'"{list_key}": []', f'"{list_key}": [' + ', '.join(papers) + ']', 1), extra
+
+    def export(self, stage, directory, output_file, extra_file=None):
+        """Write the JSONL view of stage for the tars in directory, and with extra_file their extras."""
+        extra_f = open(extra_file, 'w') if extra_file is not None else None
+        try:
+            with open(output_file, 'w') as f:
+                for line, extra in self.tar_lines(stage, directory):
+                    f.write(line + '\n')
+                    if extra_f is not None:
+                        extra_f.write(extra + '\n')
+        finally:
+            if extra_f is not None:
+                extra_f.close()
+        print(f"Exported {output_file} from {self.db_path}")
+
+    def papers(self, stage, paper):
+        """(tar file, record) of every stored entry of stage for a paper id or file name."""
+        rows = self.conn.execute(
+            "SELECT tar_key, record FROM papers WHERE stage = ? AND paper_id = ? ORDER BY tar_key, position",
+            (stage, paper_id(paper))).fetchall()
+        return [(tar_key, json.loads(record)) for tar_key, record in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up papers in the per-paper analysis store or export its JSONL files")
+    parser.add_argument("papers", nargs='*', help="paper ids (e.g. 2310.12345 or cond-mat/0005116) or file names")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="store to read (default: %(default)s)")
+    parser.add_argument("--stage", choices=sorted(PAPER_LISTS), default='figureTable',
+                        help="analysis to look papers up in (default: %(default)s)")
+    parser.add_argument("--export", metavar="DIR",
+                        help="write the figureTable and latexType JSONL files of the tars in DIR into DIR")
+    parser.add_argument("--latex-mode", choices=LATEX_MODES, default='full',
+                        help="which latexType results --export writes (default: %(default)s)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.store):
+        sys.exit(f"No paper store at {args.store}")
+    store = PaperStore(args.store)
+    try:
+        for paper in args.papers:
+            entries = store.papers(args.stage, paper)
+            if not entries:
+                print(f"{paper}: not in {args.stage}")
+            for tar_file, record in entries:
+                print(f"{paper} ({tar_file}): {json.dumps(record)}")
+
+        if args.export:
+            for stage in ['figureTable', latex_stage(args.latex_mode)]:
+                output_file, extra_file = EXPORT_FILES[stage]
+                store.export(stage, args.export, os.path.join(args.export, output_file),
+                             os.path.join(args.export, extra_file) if extra_file else None)
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+import re
+import zlib
+from collections import namedtuple
+
+# Only the end of the file is searched for startxref; some writers leave junk after %%EOF
+TAIL_BYTES = 4096
+
+WHITESPACE = b' \t\r\n\f\x00'
+DELIMITERS = b'()<>[]{}/%'
+
+STARTXREF_PATTERN = re.compile(rb'startxref\s+(\d+)')
+OBJECT_HEADER_PATTERN = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj')
+NUMBER_PATTERN = re.compile(rb'[+-]?(?:\d+\.?\d*|\.\d+)')
+REFERENCE_PATTERN = re.compile(rb'\s+(\d+)\s+R(?![^\s()<>\[\]{}/%])')
+SUBSECTION_PATTERN = re.compile(rb'\s*(\d+)\s+(\d+)')
+XREF_ENTRY_PATTERN = re.compile(rb'\s*(\d{10})\s+(\d{5})\s+([nf])')
+STREAM_PATTERN = re.compile(rb'\s*stream\r?\n')
+
+Ref = namedtuple('Ref', ['num', 'gen'])
+
+
+def skip_space(data, pos):
+    """Skip whitespace and comments."""
+    size = len(data)
+    while pos < size:
+        c = data[pos]
+        if c in WHITESPACE:
+            pos += 1
+        elif c == 37:  # %
+            while pos < size and data[pos] not in b'\r\n':
+                pos += 1
+        else:
+            break
+    return pos
+
+def parse_object(data, pos):
+    """
+    Parse the PDF object starting at pos and return (value, end position).
+    Dictionaries become dicts keyed by name, names become str, strings bytes,
+    indirect references Ref.
+    """
+    pos = skip_space(data, pos)
+    head = data[pos:pos + 2]
+
+    if head == b'<<':
+        pos += 2
+        value = {}
+        while True:
+            pos = skip_space(data, pos)
+            if data[pos:pos + 2] == b'>>':
+                return value, pos + 2
+            key, pos = parse_object(data, pos)
+            if not isinstance(key, str):
+                raise ValueError(f"Dictionary key is not a name at {pos}")
+            value[key], pos = parse_object(data, pos)
+
+    if head[:1] == b'[':
+        pos += 1
+        value = []
+        while True:
+            pos = skip_space(data, pos)
+            if data[pos:pos + 1] == b']':
+                return value, pos + 1
+            if pos >= len(data):
+                raise ValueError("Unterminated array")
+            item, pos = parse_object(data, pos)
+            value.append(item)
+
+    if head[:1] == b'/':
+        end = pos + 1
+        while end < len(data) and data[end] not in WHITESPACE and data[end] not in DELIMITERS:
+            end += 1
+        name = re.sub(rb'#([0-9A-Fa-f]{2})', lambda m: bytes([int(m.group(1), 16)]), data[pos + 1:end])
+        return name.decode('latin-1'), end
+
+    if head[:1] == b'<':
+        end = data.find(b'>', pos)
+        if end < 0:
+            raise ValueError("Unterminated hex string")
+        hex_digits = re.sub(rb'\s', b'', data[pos + 1:end])
+        return bytes.fromhex((hex_digits + b'0' * (len(hex_digits) % 2)).decode('ascii')), end + 1
+
+    if head[:1] == b'(':
+        # Only skipped over: nothing on the way to /Count needs the text of a string
+        depth = 0
+        end = pos
+        while end < len(data):
+            c = data[end]
+            if c == 92:  # backslash escapes the next byte
+                end += 2
+                continue
+            if c == 40:
+                depth += 1
+            elif c == 41:
+                depth -= 1
+                if depth == 0:
+                    return data[pos + 1:end], end + 1
+            end += 1
+        raise ValueError("Unterminated string")
+
+    match = NUMBER_PATTERN.match(data, pos)
+    if match:
+        token = match.group()
+        if b'.' in token:
+            return float(token), match.end()
+        number = int(token)
+        # "12 0 R" is a reference; a bare integer never has another integer and R after it
+        ref = REFERENCE_PATTERN.match(data, match.end())
+        if ref and token.isdigit():
+            return Ref(number, int(ref.group(1))), ref.end()
+        return number, match.end()
+
+    for keyword, value in ((b'true', True), (b'false', False), (b'null', None)):
+        if data[pos:pos + len(keyword)] == keyword:
+            return value, pos + len(keyword)
+
+    raise ValueError(f"Unexpected token at {pos}: {bytes(data[pos:pos + 20])!r}")
+
+
+class FastPdf:
+    """
+    Just enough of a PDF reader to follow trailer -> /Root -> /Pages -> /Count.
+    Handles classic xref tables, xref streams, object streams and incremental updates
+    (/Prev, /XRefStm). Anything else raises ValueError so the caller can fall back to PyPDF2.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.offsets = {}
+        self.compressed = {}
+        self.object_streams = {}
+        self.trailer = {}
+        self.read_xref_chain()
+
+    def startxref(self):
+        tail_start = max(0, len(self.data) - TAIL_BYTES)
+        matches = list(STARTXREF_PATTERN.finditer(self.data, tail_start))
+        if not matches:
+            raise ValueError("No startxref near the end of the file")
+        return int(matches[-1].group(1))
+
+    def read_xref_chain(self):
+        # Newer sections come first, so the first entry recorded for an object wins
+        pending = [self.startxref()]
+        seen = set()
+        while pending:
+            offset = pending.pop(0)
+            if offset in seen or offset >= len(self.data):
+                continue
+            seen.add(offset)
+            pos = skip_space(self.data, offset)
+            if self.data[pos:pos + 4] == b'xref':
+                trailer = self.read_xref_table(pos + 4)
+            else:
+                trailer = self.read_xref_stream(pos)
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            if isinstance(trailer.get('XRefStm'), int):
+                pending.append(trailer['XRefStm'])
+            if isinstance(trailer.get('Prev'), int):
+                pending.append(trailer['Prev'])
+
+    def read_xref_table(self, pos):
+        while True:
+            pos = skip_space(self.data, pos)
+            if self.data[pos:pos + 7] == b'trailer':
+                trailer, _ = parse_object(self.data, pos + 7)
+                if not isinstance(trailer, dict):
+                    raise ValueError("Malformed trailer")
+                return trailer
+            match = SUBSECTION_PATTERN.match(self.data, pos)
+            if not match:
+                raise ValueError(f"Malformed xref table at {pos}")
+            start, count = int(match.group(1)), int(match.group(2))
+            pos = match.end()
+            for num in range(start, start + count):
+                entry = XREF_ENTRY_PATTERN.match(self.data, pos)
+                if not entry:
+                    raise ValueError(f"Malformed xref entry at {pos}")
+                pos = entry.end()
+                if entry.group(3) == b'n' and num not in self.compressed:
+                    self.offsets.setdefault(num, int(entry.group(1)))
+
+    def read_xref_stream(self, pos):
+        _, stream_dict, content = self.read_indirect_object(pos)
+        if not isinstance(stream_dict, dict) or stream_dict.get('Type') != 'XRef' or content is None:
+            raise ValueError(f"No xref table or stream at {pos}")
+
+        widths = stream_dict.get('W')
+        if not isinstance(widths, list) or len(widths) != 3 or not all(isinstance(w, int) for w in widths):
+            raise ValueError("Malformed /W in xref stream")
+        index = stream_dict.get('Index', [0, stream_dict.get('Size', 0)])
+        entry_size = sum(widths)
+        if entry_size == 0:
+            raise ValueError("Empty xref stream entries")
+
+        entry_pos = 0
+        for i in range(0, len(index) - 1, 2):
+            for num in range(index[i], index[i] + index[i + 1]):
+                entry = content[entry_pos:entry_pos + entry_size]
+                if len(entry) < entry_size:
+                    raise ValueError("Truncated xref stream")
+                entry_pos += entry_size
+                fields = []
+                field_pos = 0
+                for width in widths:
+                    fields.append(int.from_bytes(entry[field_pos:field_pos + width], 'big'))
+                    field_pos += width
+                entry_type = fields[0] if widths[0] else 1
+                if num in self.offsets or num in self.compressed:
+                    continue
+                if entry_type == 1:
+                    self.offsets[num] = fields[1]
+                elif entry_type == 2:
+                    self.compressed[num] = (fields[1], fields[2])
+        return stream_dict
+
+    def read_indirect_object(self, pos):
+        """Return (object number, value, decoded stream content or None) of 'n g obj ... endobj' at pos."""
+        header = OBJECT_HEADER_PATTERN.match(self.data, pos)
+        if not header:
+            raise ValueError(f"No object at {pos}")
+        value, pos = parse_object(self.data, header.end())
+        content = None
+        stream = STREAM_PATTERN.match(self.data, pos)
+        if stream and isinstance(value, dict):
+            content = self.read_stream(value, stream.end())
+        return int(header.group(1)), value, content
+
+    def read_stream(self, stream_dict, start):
+        try:
+            length = self.resolve(stream_dict.get('Length'))
+        except ValueError:
+            length = None
+        if not isinstance(length, int) or self.data[start + length:start + length + 20].lstrip()[:9] != b'endstream':
+            # Wrong or missing /Length: the data runs up to endstream
+            end = self.data.find(b'endstream', start)
+            if end < 0:
+                raise ValueError("Unterminated stream")
+            length = end - start
+        return decode_stream(stream_dict, self.data[start:start + length])
+
+    def read_object(self, num):
+        """(value, decoded stream content or None) of object num, read at its offset in the xref."""
+        found, value, content = self.read_indirect_object(self.offsets[num])
+        if found != num:
+            raise ValueError(f"Object {found} found where the xref puts object {num}")
+        return value, content
+
+    def object_stream(self, num):
+        if num not in self.object_streams:
+            stream_dict, content = self.read_object(num)
+            if content is None:
+                raise ValueError(f"Object {num} is not an object stream")
+            count, first = stream_dict.get('N'), stream_dict.get('First')
+            header = content[:first].split()
+            offsets = {int(header[i]): first + int(header[i + 1]) for i in range(0, 2 * count, 2)}
+            self.object_streams[num] = (content, offsets)
+        return self.object_streams[num]
+
+    def resolve(self, value):
+        """Follow indirect references until a direct object is reached."""
+        depth = 0
+        while isinstance(value, Ref):
+            depth += 1
+            if depth > 32:
+                raise ValueError("Reference loop")
+            num = value.num
+            if num in self.offsets:
+                value, _ = self.read_object(num)
+            elif num in self.compressed:
+                content, offsets = self.object_stream(self.compressed[num][0])
+                if num not in offsets:
+                    raise ValueError(f"Object {num} missing from its object stream")
+                value, _ = parse_object(content, offsets[num])
+            else:
+                raise ValueError(f"Object {num} is not in the xref")
+        return value
+
+    def page_count(self):
+        root = self.resolve(self.trailer.get('Root'))
+        if not isinstance(root, dict) or root.get('Type') != 'Catalog':
+            raise ValueError("No document catalog")
+        pages = self.resolve(root.get('Pages'))
+        if not isinstance(pages, dict) or pages.get('Type') != 'Pages':
+            raise ValueError("No page tree")
+        count = self.resolve(pages.get('Count'))
+        if not isinstance(count, int) or count < 1:
+            raise ValueError(f"Unusable /Count {count!r}")
+        return count
+
+
+def decode_stream(stream_dict, raw):
+    filters = stream_dict.get('Filter', [])
+    if not isinstance(filters, list):
+        filters = [filters]
+    params = stream_dict.get('DecodeParms', [])
+    if not isinstance(params, list):
+        params = [params]
+    data = bytes(raw)
+    for i, name in enumerate(filters):
+        if name not in ('FlateDecode', 'Fl'):
+            raise ValueError(f"Unsupported stream filter {name}")
+        data = zlib.decompressobj().decompress(data)
+        param = params[i] if i < len(params) and isinstance(params[i], dict) else {}
+        if param.get('Predictor', 1) >= 10:
+            data = undo_png_predictor(data, param.get('Columns', 1))
+        elif param.get('Predictor', 1) != 1:
+            raise ValueError(f"Unsupported predictor {param.get('Predictor')}")
+    return data
+
+def undo_png_predictor(data, columns):
+    """Reverse the per-row PNG filters xref streams use (one byte per sample)."""
+    row_size = columns + 1
+    previous = bytearray(columns)
+    output = bytearray()
+    for row_start in range(0, len(data) - row_size + 1, row_size):
+        filter_type = data[row_start]
+        row = bytearray(data[row_start + 1:row_start + row_size])
+        for i in range(columns):
+            left = row[i - 1] if i else 0
+            up = previous[i]
+            if filter_type == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif filter_type == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif filter_type == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif filter_type == 4:
+                upper_left = previous[i - 1] if i else 0
+                estimate = left + up - upper_left
+                pa, pb, pc = abs(estimate - left), abs(estimate - up), abs(estimate - upper_left)
+                row[i] = (row[i] + (left if pa <= pb and pa <= pc else up if pb <= pc else upper_left)) & 0xFF
+            elif filter_type != 0:
+                raise ValueError(f"Unknown PNG filter {filter_type}")
+        output += row
+        previous = row
+    return bytes(output)
+
+def fast_page_count(data):
+    """Page count from the document catalog's /Pages /Count; raises ValueError when it can't be found."""
+    if data[:1024].find(b'%PDF') < 0:
+        raise ValueError("Not a PDF")
+    try:
+        return FastPdf(data).page_count()
+    except (IndexError, KeyError, TypeError, RecursionError, zlib.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed PDF: {e}") from e
@@ -1,12 +1,70 @@
 import os
+import io
 import json
+import mmap
+import time
 import tarfile
+import argparse
 from PyPDF2 import PdfReader
 from pathlib import Path
 import statistics
 import shutil
 
-def count_pdf_pages(directory, file, tar_path):
+from pdfFastCount import fast_page_count
+from runMetrics import start_tar, finish_tar
+
+# Name of this analysis in the result cache and run checkpoints
+CACHE_STAGE = 'pdfPageCount'
+
+# 'fast' reads /Pages /Count through the trailer and only parses the whole PDF with
+# PyPDF2 when that fails; 'pypdf2' always does the full parse
+PAGE_COUNT_ENGINES = ['fast', 'pypdf2']
+DEFAULT_ENGINE = 'fast'
+
+def page_count_stage(engine):
+    """Cache and checkpoint stage name; each engine's counts are kept apart."""
+    return CACHE_STAGE if engine == DEFAULT_ENGINE else f"{CACHE_STAGE}-{engine}"
+
+def fast_count(source):
+    """Page count via the document catalog, memory-mapping paths; raises ValueError if not found."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return fast_page_count(data)
+    if isinstance(source, (bytes, bytearray)):
+        return fast_page_count(source)
+    if isinstance(source, io.BytesIO):
+        return fast_page_count(source.getvalue())
+    start = source.tell()
+    try:
+        return fast_page_count(source.read())
+    finally:
+        source.seek(start)
+
+def count_pages(source, engine=DEFAULT_ENGINE):
+    """Return the number of pages of a PDF given as a path, bytes or a binary file object."""
+    if engine == 'fast':
+        try:
+            return fast_count(source)
+        except ValueError:
+            pass
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    reader = PdfReader(source)
+    return len(reader.pages)
+
+def page_count_stats(page_counts):
+    return {
+        "total_files": len(page_counts),
+        "total_pages": sum(page_counts),
+        "average_pages": round(statistics.mean(page_counts), 2) if page_counts else 0,
+        "median_pages": round(statistics.median(page_counts), 2) if page_counts else 0,
+        "std_dev_pages": round(statistics.stdev(page_counts), 2) if len(page_counts) > 1 else 0,
+        "min_pages": min(page_counts) if page_counts else 0,
+        "max_pages": max(page_counts) if page_counts else 0
+    }
+
+def count_pdf_pages(directory, tar_path, engine=DEFAULT_ENGINE, tar_metrics=None):
     pdf_data = []
     page_counts = []
 
@@ -16,63 +74,150 @@ def count_pdf_pages(directory, file, tar_path):
     for filename in os.listdir(directory):
         if filename.lower().endswith('.pdf'):
             file_path = os.path.join(directory, filename)
+            member_start_time = time.perf_counter()
             try:
-                reader = PdfReader(file_path)
-                num_pages = len(reader.pages)
+                num_pages = count_pages(file_path, engine)
                 entry = {
                     "filepath": f"{tar_path}/{filename}",
                     "page_count": num_pages
                 }
                 pdf_data.append(entry)
-                file.write(json.dumps(entry) + '\n')
-                file.flush()
                 page_counts.append(num_pages)
             except Exception as e:
                 print(f"Error processing {filename}: {str(e)}")
+                if tar_metrics is not None:
+                    tar_metrics.add(errors=1)
+                continue
+            if tar_metrics is not None:
+                tar_metrics.member(filename, time.perf_counter() - member_start_time,
+                                   bytes_read=os.path.getsize(file_path))
 
-    stats = {
-        "total_files": len(pdf_data),
-        "total_pages": sum(page_counts),
-        "average_pages": round(statistics.mean(page_counts), 2) if page_counts else 0,
-        "median_pages": round(statistics.median(page_counts), 2) if page_counts else 0,
-        "std_dev_pages": round(statistics.stdev(page_counts), 2) if len(page_counts) > 1 else 0,
-        "min_pages": min(page_counts) if page_counts else 0,
-        "max_pages": max(page_counts) if page_counts else 0
-    }
+    return page_count_stats(page_counts), pdf_data
+
+def count_tar_pages(tar_path, engine=DEFAULT_ENGINE, tar_metrics=None):
+    """
+    Like count_pdf_pages on the extracted tar, but every PDF is read straight out of the
+    tar in stream mode and counted in memory, so nothing is written to disk.
+    Only PDFs directly inside the tar's top-level directory are counted.
+    """
+    pdf_data = []
+    page_counts = []
+    top_dir = None
+
+    with tarfile.open(tar_path, 'r|*') as tar_ref:
+        for member in tar_ref:
+            if top_dir is None:
+                top_dir = member.name.split('/')[0]
+            filename = os.path.basename(member.name)
+            if (not member.isfile() or os.path.dirname(member.name) != top_dir
+                    or not filename.lower().endswith('.pdf')):
+                continue
+            member_start_time = time.perf_counter()
+            data = tar_ref.extractfile(member).read()
+            try:
+                num_pages = count_pages(data, engine)
+                pdf_data.append({
+                    "filepath": f"{tar_path}/{filename}",
+                    "page_count": num_pages
+                })
+                page_counts.append(num_pages)
+            except Exception as e:
+                print(f"Error processing {filename}: {str(e)}")
+                if tar_metrics is not None:
+                    tar_metrics.add(errors=1)
+                continue
+            if tar_metrics is not None:
+                tar_metrics.member(member.name, time.perf_counter() - member_start_time, bytes_read=len(data))
+
+    return page_count_stats(page_counts), pdf_data
 
-    return stats
+def write_entries(file, pdf_data):
+    for entry in pdf_data:
+        file.write(json.dumps(entry) + '\n')
+    file.flush()
 
-def process_tar_files(directory):
+def process_tar_files(directory, cache=None, checkpoint=None, engine=DEFAULT_ENGINE, extract=False, sink=None,
+                      metrics=None):
+    """
+    Count the pages of the PDFs in every tar of directory into pdf_page_counts.jsonl.
+    PDFs are streamed out of the tars; extract=True extracts each tar to disk first as before.
+    With an outputSink.ParquetSink the counts are also written as Parquet,
+    and with runMetrics.Metrics every tar's time and counters are recorded.
+    """
     current_dir = Path(os.getcwd())
     output_file = current_dir / f"pdf_page_counts.jsonl"
     
     processed_files = []
     corrupted_files = []
+    stage = page_count_stage(engine)
     
+    if checkpoint is not None:
+        checkpoint.start(stage)
+    if sink is not None:
+        sink.start(stage)
+    if metrics is not None:
+        metrics.start(stage)
+
     with open(output_file, 'a', buffering=1, encoding='utf-8') as f:
         for tar_filename in os.listdir(directory):
             if tar_filename.lower().endswith('.tar'):
                 tar_path = os.path.join(directory, tar_filename)
                 extract_dir = os.path.join(directory, Path(tar_filename).stem)
+                if checkpoint is not None and checkpoint.done(stage, [tar_path]):
+                    continue
                 
+                tar_metrics = start_tar(metrics, stage, [tar_path])
+                cached = cache.get(stage, [tar_path]) if cache is not None else None
+                if cached is not None:
+                    print(f"Using cached result for {tar_filename}")
+                    pdf_data, stats = cached
+                    write_entries(f, pdf_data)
+                    if sink is not None:
+                        sink.write(stage, [tar_path], cached)
+                    print(stats)
+                    processed_files.append(tar_filename)
+                    finish_tar(metrics, tar_metrics, cached=True)
+                    if checkpoint is not None:
+                        checkpoint.mark(stage, [tar_path])
+                    continue
+
                 print(f"Processing {tar_filename}...")
                 try:
-                    with tarfile.open(tar_path, 'r') as tar_ref:
-                        tar_ref.extractall(extract_dir, filter=None)  # Avoiding DeprecationWarning
+                    if extract:
+                        with tarfile.open(tar_path, 'r') as tar_ref:
+                            tar_ref.extractall(extract_dir, filter=None)  # Avoiding DeprecationWarning
+
+                        extracted_subdir = os.path.join(extract_dir, os.listdir(extract_dir)[0])
+                        stats, pdf_data = count_pdf_pages(extracted_subdir, tar_path, engine, tar_metrics)
+                    else:
+                        stats, pdf_data = count_tar_pages(tar_path, engine, tar_metrics)
 
-                    extracted_subdir = os.path.join(extract_dir, os.listdir(extract_dir)[0])
-                    stats = count_pdf_pages(extracted_subdir, f, tar_path)
+                    # A tar's entries are written together so an interrupted run never leaves half of them
+                    write_entries(f, pdf_data)
+                    if sink is not None:
+                        sink.write(stage, [tar_path], [pdf_data, stats])
 
                     print(f"Done processing {tar_filename}")
                     print(stats)
 
                     processed_files.append(tar_filename)
+                    if cache is not None:
+                        cache.put(stage, [tar_path], [pdf_data, stats])
 
                     # Remove the extracted subdirectory after processing
-                    shutil.rmtree(extract_dir)
+                    if extract:
+                        shutil.rmtree(extract_dir)
+                    finish_tar(metrics, tar_metrics)
                 except Exception as e:
                     print(f"Error processing {tar_filename}: {str(e)}")
                     corrupted_files.append(tar_filename)
+                    finish_tar(metrics, tar_metrics, error=e)
+
+                if checkpoint is not None:
+                    checkpoint.mark(stage, [tar_path])
+
+    if metrics is not None:
+        metrics.finish(stage)
 
     # Final statistics
     print(f"\nProcessing complete. Stats:")
@@ -81,9 +226,78 @@ def process_tar_files(directory):
     if corrupted_files:
         print(f"Corrupted .tar files: {', '.join(corrupted_files)}")
 
+def validate_page_counts(jsonl_path):
+    """
+    Recount the PDFs listed in an earlier pdf_page_counts.jsonl, straight from their tars,
+    with the fast path alone and with PyPDF2, and report where either disagrees with the file.
+    """
+    expected = {}
+    with open(jsonl_path) as f:
+        for line in f:
+            entry = json.loads(line)
+            tar_path, filename = entry["filepath"].rsplit('/', 1)
+            expected.setdefault(tar_path, {})[filename] = entry["page_count"]
+
+    checked = fallbacks = 0
+    fast_time = pypdf2_time = 0.0
+    mismatches = []
+    missing = []
+    for tar_path, counts in expected.items():
+        remaining = dict(counts)
+        try:
+            with tarfile.open(tar_path, 'r|') as tar:
+                for member in tar:
+                    filename = os.path.basename(member.name)
+                    if not member.isfile() or filename not in remaining:
+                        continue
+                    data = tar.extractfile(member).read()
+                    recorded = remaining.pop(filename)
+                    checked += 1
+
+                    start = time.perf_counter()
+                    try:
+                        fast = fast_page_count(data)
+                    except ValueError:
+                        fast = None
+                        fallbacks += 1
+                    fast_time += time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    try:
+                        full = len(PdfReader(io.BytesIO(data)).pages)
+                    except Exception as e:
+                        full = f"error: {e}"
+                    pypdf2_time += time.perf_counter() - start
+
+                    if (fast is not None and fast != recorded) or full != recorded:
+                        mismatches.append((f"{tar_path}/{filename}", recorded, fast, full))
+        except (OSError, tarfile.TarError) as e:
+            print(f"Error reading {tar_path}: {e}")
+        missing.extend(f"{tar_path}/{filename}" for filename in remaining)
+
+    print(f"\nValidated {checked} PDFs against {jsonl_path}")
+    print(f"Fast path fell back to PyPDF2 for {fallbacks} PDFs")
+    print(f"Fast path time: {fast_time:.2f} seconds, PyPDF2 time: {pypdf2_time:.2f} seconds")
+    print(f"PDFs not found in their tar: {len(missing)}")
+    print(f"Mismatches (path, recorded, fast, PyPDF2): {len(mismatches)}")
+    for mismatch in mismatches:
+        print(f" - {mismatch}")
+
 def main():
-    tar_dir = 'workingData/pdf/'
-    process_tar_files(tar_dir)
+    parser = argparse.ArgumentParser(description="Count the pages of the PDFs in arXiv_pdf_*.tar files")
+    parser.add_argument("directory", nargs='?', default='workingData/pdf/', help="directory containing the tar files")
+    parser.add_argument("--engine", choices=PAGE_COUNT_ENGINES, default=DEFAULT_ENGINE,
+                        help="how pages are counted (default: %(default)s)")
+    parser.add_argument("--extract", action="store_true",
+                        help="extract each tar to disk before counting instead of streaming its PDFs")
+    parser.add_argument("--validate", metavar="JSONL",
+                        help="check both engines against an earlier pdf_page_counts.jsonl instead of counting")
+    args = parser.parse_args()
+
+    if args.validate:
+        validate_page_counts(args.validate)
+    else:
+        process_tar_files(args.directory, engine=args.engine, extract=args.extract)
 
 if __name__ == "__main__":
     main()
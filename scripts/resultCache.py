@@ -0,0 +1,88 @@
+import os
+import json
+import sqlite3
+import hashlib
+
+# Bump when an analysis changes so that results cached by older code are ignored
+# 2: latexType records each paper's member name as gz_file rather than its tar's path
+CACHE_VERSION = 2
+
+DEFAULT_CACHE_PATH = "analysis_cache.sqlite"
+
+HASH_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+class ResultCache:
+    """
+    Persistent per-stage, per-tar results stored in SQLite.
+    arXiv bulk tars never change once published, so a stored result stays valid as long as
+    its tars keep the same fingerprint: size and mtime, or their SHA-256 with use_hash.
+    Results of tar pairs (mapping) are keyed by both tars.
+    """
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, use_hash=False):
+        self.db_path = db_path
+        self.use_hash = use_hash
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "stage TEXT, tar_key TEXT, fingerprint TEXT, result TEXT, "
+            "PRIMARY KEY (stage, tar_key))")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "tar_path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT)")
+        self.conn.commit()
+
+    def file_hash(self, tar_path, st):
+        """SHA-256 of a tar, remembered until its size or mtime changes."""
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, sha256 FROM hashes WHERE tar_path = ?", (tar_path,)).fetchone()
+        if row is not None and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+
+        digest = hashlib.sha256()
+        with open(tar_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)",
+            (tar_path, st.st_size, st.st_mtime_ns, sha256))
+        self.conn.commit()
+        return sha256
+
+    def fingerprint(self, tar_paths):
+        parts = [CACHE_VERSION]
+        for tar_path in tar_paths:
+            st = os.stat(tar_path)
+            if self.use_hash:
+                parts.append(self.file_hash(os.path.abspath(tar_path), st))
+            else:
+                parts.append([st.st_size, st.st_mtime_ns])
+        return json.dumps(parts)
+
+    def tar_key(self, tar_paths):
+        return "|".join(os.path.abspath(tar_path) for tar_path in tar_paths)
+
+    def get(self, stage, tar_paths):
+        """Return the stored result of stage for tar_paths, or None if missing or outdated."""
+        row = self.conn.execute(
+            "SELECT fingerprint, result FROM results WHERE stage = ? AND tar_key = ?",
+            (stage, self.tar_key(tar_paths))).fetchone()
+        if row is None:
+            return None
+        try:
+            if row[0] != self.fingerprint(tar_paths):
+                return None
+        except OSError:
+            return None
+        return json.loads(row[1])
+
+    def put(self, stage, tar_paths, result):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+            (stage, self.tar_key(tar_paths), self.fingerprint(tar_paths), json.dumps(result)))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
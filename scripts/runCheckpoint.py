@@ -0,0 +1,61 @@
+import os
+
+DEFAULT_CHECKPOINT_DIR = "checkpoints"
+
+
+def output_mode(checkpoint):
+    """File mode for a stage's outputs: resumed runs append to what earlier runs wrote."""
+    return 'a' if checkpoint is not None and checkpoint.resume else 'w'
+
+
+class Checkpoint:
+    """
+    Per-stage manifests of the tars whose results are already written, one line per tar
+    (or '|'-joined tar pair for mapping) in <directory>/<stage>.done.
+    A stage marks a tar right after its output is written. A normal run starts each
+    manifest over; with resume the listed tars are skipped and outputs are appended to.
+    """
+
+    def __init__(self, directory=DEFAULT_CHECKPOINT_DIR, resume=False):
+        self.directory = directory
+        self.resume = resume
+        self.completed = {}
+        self.manifests = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def manifest_path(self, stage):
+        return os.path.join(self.directory, f"{stage}.done")
+
+    def start(self, stage):
+        """Load (resume) or reset the manifest of stage."""
+        path = self.manifest_path(stage)
+        completed = set()
+        if self.resume and os.path.exists(path):
+            with open(path) as f:
+                completed = {line.rstrip('\n') for line in f if line.strip()}
+            print(f"Resuming {stage}: {len(completed)} tar files already done")
+        self.completed[stage] = completed
+        if stage in self.manifests:
+            self.manifests[stage].close()
+        self.manifests[stage] = open(path, 'a' if self.resume else 'w')
+
+    def tar_key(self, tar_paths):
+        return "|".join(os.path.abspath(tar_path) for tar_path in tar_paths)
+
+    def done(self, stage, tar_paths):
+        return self.tar_key(tar_paths) in self.completed.get(stage, ())
+
+    def mark(self, stage, tar_paths):
+        key = self.tar_key(tar_paths)
+        if key in self.completed[stage]:
+            return
+        self.completed[stage].add(key)
+        manifest = self.manifests[stage]
+        manifest.write(key + '\n')
+        manifest.flush()
+        os.fsync(manifest.fileno())
+
+    def close(self):
+        for manifest in self.manifests.values():
+            manifest.close()
+        self.manifests = {}
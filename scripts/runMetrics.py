@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import cProfile
+
+DEFAULT_METRICS_FILE = "metrics.jsonl"
+
+# Counters every tar record has; stage records carry their sums. bytes_skipped counts the
+# decompressed bytes of papers an early exit never had to inflate, and decode_hits the papers
+# taken from a decodeCache.DecodeCache instead of being decompressed again
+COUNTERS = ['members', 'bytes_read', 'bytes_decompressed', 'bytes_skipped', 'decode_hits', 'bytes_written',
+            'errors']
+
+
+class TarMetrics:
+    """
+    Wall time and counters of one tar (or tar pair) in one stage. Wall time is the sum of the
+    intervals from restart() (or creation) to stop(), so work on a tar spread over several
+    calls is timed without the time in between. members counts the members the stage worked
+    on, each timed by member(); errors counts members that could not be processed.
+    It is plain data, so a pool worker can fill it in.
+    """
+
+    def __init__(self, stage, tar_paths, member_records=False):
+        self.record = {
+            'type': 'tar',
+            'stage': stage,
+            'tars': [os.path.abspath(tar_path) for tar_path in tar_paths],
+            'cached': False,
+            'error': None,
+            'wall_seconds': 0.0,
+            'member_seconds': 0.0,
+            'slowest_member': None,
+            'slowest_member_seconds': 0.0,
+            **dict.fromkeys(COUNTERS, 0)
+        }
+        self.member_records = [] if member_records else None
+        self.restart()
+
+    def restart(self):
+        self.started = time.perf_counter()
+        self.stopped = False
+
+    def stop(self):
+        if not self.stopped:
+            self.record['wall_seconds'] += time.perf_counter() - self.started
+            self.stopped = True
+
+    def add(self, **counts):
+        for key, value in counts.items():
+            self.record[key] += value
+
+    def member(self, name, seconds, **counts):
+        """Count a processed member that took seconds, with its other counters."""
+        record = self.record
+        record['members'] += 1
+        record['member_seconds'] += seconds
+        if seconds > record['slowest_member_seconds']:
+            record['slowest_member'] = name
+            record['slowest_member_seconds'] = round(seconds, 6)
+        self.add(**counts)
+        if self.member_records is not None:
+            self.member_records.append({'type': 'member', 'stage': record['stage'], 'tar': record['tars'][0],
+                                        'member': name, 'seconds': round(seconds, 6), **counts})
+
+
+def start_tar(metrics, stage, tar_paths):
+    """A TarMetrics for tar_paths; without metrics it is still filled in but never written."""
+    return TarMetrics(stage, tar_paths, metrics is not None and metrics.member_records)
+
+def finish_tar(metrics, tar_metrics, cached=False, error=None):
+    tar_metrics.stop()
+    if metrics is not None:
+        metrics.write_tar(tar_metrics, cached, error)
+
+def measured(tar_metrics, function, *args):
+    """
+    Run function(*args, tar_metrics=tar_metrics) and return its result with tar_metrics,
+    timing only the run itself, e.g. in a pool worker rather than in the queue before it.
+    """
+    tar_metrics.restart()
+    result = function(*args, tar_metrics=tar_metrics)
+    tar_metrics.stop()
+    return result, tar_metrics
+
+
+class Metrics:
+    """
+    Machine-readable run metrics in a JSONL file: one 'tar' record per tar (or tar pair) of
+    every stage with its wall time and counters, one 'stage' record with the totals when a
+    stage finishes and, with member_records, one 'member' record per member processed.
+    With profile_dir every stage also runs under cProfile, saved as <profile_dir>/<stage>.prof
+    for pstats or snakeviz (pool workers are not profiled).
+    A normal run starts the file over; with resume it is appended to.
+    """
+
+    def __init__(self, path=DEFAULT_METRICS_FILE, resume=False, profile_dir=None, member_records=False):
+        self.out = open(path, 'a' if resume else 'w', encoding='utf-8')
+        self.profile_dir = profile_dir
+        self.member_records = member_records
+        self.stages = {}
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def write(self, record):
+        self.out.write(json.dumps(record) + '\n')
+        self.out.flush()
+
+    def start(self, stage, profile=True):
+        """Start the totals (and unless profile is False the profiler) of stage."""
+        profiler = None
+        if profile and self.profile_dir is not None:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        self.stages[stage] = {
+            'started': time.perf_counter(),
+            'profiler': profiler,
+            'record': {'type': 'stage', 'stage': stage, 'wall_seconds': 0.0, 'tars': 0, 'cached_tars': 0,
+                       'failed_tars': 0, **dict.fromkeys(COUNTERS, 0)}
+        }
+
+    def write_tar(self, tar_metrics, cached=False, error=None):
+        record = tar_metrics.record
+        record['cached'] = cached
+        record['error'] = None if error is None else str(error)
+        record['wall_seconds'] = round(record['wall_seconds'], 6)
+        record['member_seconds'] = round(record['member_seconds'], 6)
+        for member_record in tar_metrics.member_records or []:
+            self.write(member_record)
+        self.write(record)
+
+        stage = self.stages.get(record['stage'])
+        if stage is not None:
+            totals = stage['record']
+            totals['tars'] += 1
+            totals['cached_tars'] += cached
+            totals['failed_tars'] += error is not None
+            for key in COUNTERS:
+                totals[key] += record[key]
+
+    def finish(self, stage):
+        """Write the totals of stage and save its profile."""
+        stage_state = self.stages.pop(stage)
+        record = stage_state['record']
+        record['wall_seconds'] = round(time.perf_counter() - stage_state['started'], 6)
+        profiler = stage_state['profiler']
+        if profiler is not None:
+            profiler.disable()
+            record['profile'] = os.path.join(self.profile_dir, f"{stage}.prof")
+            profiler.dump_stats(record['profile'])
+        self.write(record)
+
+    def close(self):
+        for stage in list(self.stages):
+            self.finish(stage)
+        self.out.close()
@@ -6,8 +6,33 @@ import time
 from pathlib import Path
 import re
 
-def process_tar_file(tar_file_path, target_dir, output_jsonl, processed_files, corrupted_files):
-    """Extracts PDFs from a .tar file and saves results in a JSONL file."""
+from tarIndex import tar_members
+from fileTransfer import atomic_write
+from runMetrics import start_tar, finish_tar
+
+# Name of this analysis in the result cache and run checkpoints
+CACHE_STAGE = 'sourcePDFcopy'
+
+COPY_CHUNK_BYTES = 1024 * 1024
+
+def is_source_tar(file_name):
+    """Check whether a file name looks like arXiv_src_XXXX_YYY.tar"""
+    return re.match(r"arXiv_src_\d+_\d+\.tar$", file_name) is not None
+
+def is_copied_pdf(member):
+    """Whether a tar member is one of the PDFs copied to test_data (macOS metadata is skipped)."""
+    file = os.path.basename(member.name)
+    return (member.isfile() and '__MACOSX' not in os.path.dirname(member.name)
+            and not file.startswith('._') and file.endswith('.pdf'))
+
+def process_tar_file(tar_file_path, target_dir, output_jsonl, processed_files, corrupted_files, tar_metrics=None):
+    """
+    Extracts PDFs from a .tar file and saves results in a JSONL file.
+    Only the PDF members are read, found through the tar's member list. Each is streamed to a
+    temporary name next to its final one and renamed into place once complete
+    (fileTransfer.atomic_write), so it is written only once. Every PDF is timed and counted
+    in tar_metrics if given.
+    """
     tar_name_without_ext = os.path.splitext(os.path.basename(tar_file_path))[0]
     target_subdir = os.path.join(target_dir, f"{tar_name_without_ext}_test")
     os.makedirs(target_subdir, exist_ok=True)
@@ -17,35 +42,22 @@ def process_tar_file(tar_file_path, target_dir, output_jsonl, processed_files, c
 
     try:
         print(f"Processing {tar_file_path}...")
+        pdf_members = [member for member in tar_members(tar_file_path) if is_copied_pdf(member)]
         with tarfile.open(tar_file_path, 'r') as tar_ref:
-            temp_extract_dir = os.path.join(os.path.dirname(tar_file_path), 'temp_extract')
-            os.makedirs(temp_extract_dir, exist_ok=True)
-            
-            try:
-                # Adding filter argument to avoid deprecation warning
-                tar_ref.extractall(temp_extract_dir, filter=None)
-            except tarfile.ReadError:
-                corrupted_files.append(tar_file_path)
-                shutil.rmtree(temp_extract_dir, ignore_errors=True)
-                return
-
-            for root, _, files in os.walk(temp_extract_dir):
-                if '__MACOSX' in root:
-                    continue
-                for file in files:
-                    if file.startswith('._'):
-                        continue
-                    if file.endswith('.pdf'):
-                        file_path = os.path.join(root, file)
-                        target_pdf_path = os.path.join(target_subdir, file)
-                        shutil.copy(file_path, target_pdf_path)
-                        pdfs_copied.append(os.path.abspath(target_pdf_path))
-
-            shutil.rmtree(temp_extract_dir)
+            for member in pdf_members:
+                member_start_time = time.perf_counter()
+                file = os.path.basename(member.name)
+                target_pdf_path = os.path.join(target_subdir, file)
+                with tar_ref.extractfile(member) as src:
+                    atomic_write(target_pdf_path, lambda dst: shutil.copyfileobj(src, dst, COPY_CHUNK_BYTES))
+                pdfs_copied.append(os.path.abspath(target_pdf_path))
+                if tar_metrics is not None:
+                    tar_metrics.member(member.name, time.perf_counter() - member_start_time,
+                                       bytes_read=member.size, bytes_written=member.size)
 
     except Exception as e:
         corrupted_files.append(tar_file_path)
-        return
+        return None
 
     processing_time = round(time.time() - start_time, 2)
     result = {
@@ -60,9 +72,13 @@ def process_tar_file(tar_file_path, target_dir, output_jsonl, processed_files, c
 
     processed_files.append(tar_file_path)
     print(f"Done processing {tar_file_path}")
+    return result
 
-def process_directory(root_dir, target_dir, output_jsonl):
-    """Processes all tar files in a directory."""
+def process_directory(root_dir, target_dir, output_jsonl, cache=None, checkpoint=None, sink=None, metrics=None):
+    """
+    Processes all tar files in a directory, also writing their results as Parquet with an
+    outputSink.ParquetSink and recording every tar's time and counters with runMetrics.Metrics.
+    """
     os.makedirs(target_dir, exist_ok=True)
 
     processed_files = []
@@ -70,10 +86,46 @@ def process_directory(root_dir, target_dir, output_jsonl):
 
     files = os.listdir(root_dir)
 
+    if checkpoint is not None:
+        checkpoint.start(CACHE_STAGE)
+    if sink is not None:
+        sink.start(CACHE_STAGE)
+    if metrics is not None:
+        metrics.start(CACHE_STAGE)
+
     for tar_file_name in files:
-        if re.match(r"arXiv_src_\d+_\d+\.tar$", tar_file_name):  # Updated regex
+        if is_source_tar(tar_file_name):
             tar_file_path = os.path.join(root_dir, tar_file_name)
-            process_tar_file(tar_file_path, target_dir, output_jsonl, processed_files, corrupted_files)
+            if checkpoint is not None and checkpoint.done(CACHE_STAGE, [tar_file_path]):
+                continue
+
+            # A cached result is only reused while the PDFs it copied are still in place
+            tar_metrics = start_tar(metrics, CACHE_STAGE, [tar_file_path])
+            cached = cache.get(CACHE_STAGE, [tar_file_path]) if cache is not None else None
+            if cached is not None and all(os.path.exists(path) for path in cached['pdfs_copied']):
+                print(f"Using cached result for {tar_file_path}")
+                with open(output_jsonl, 'a') as jsonl_file:
+                    jsonl_file.write(json.dumps(cached) + '\n')
+                if sink is not None:
+                    sink.write(CACHE_STAGE, [tar_file_path], cached)
+                processed_files.append(tar_file_path)
+                finish_tar(metrics, tar_metrics, cached=True)
+                if checkpoint is not None:
+                    checkpoint.mark(CACHE_STAGE, [tar_file_path])
+                continue
+
+            result = process_tar_file(tar_file_path, target_dir, output_jsonl, processed_files, corrupted_files,
+                                      tar_metrics)
+            finish_tar(metrics, tar_metrics, error=None if result is not None else f"{tar_file_path} could not be read")
+            if cache is not None and result is not None:
+                cache.put(CACHE_STAGE, [tar_file_path], result)
+            if sink is not None and result is not None:
+                sink.write(CACHE_STAGE, [tar_file_path], result)
+            if checkpoint is not None:
+                checkpoint.mark(CACHE_STAGE, [tar_file_path])
+
+    if metrics is not None:
+        metrics.finish(CACHE_STAGE)
 
     # Final statistics
     print(f"\nProcessing complete. Stats:")
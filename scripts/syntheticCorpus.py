@@ -0,0 +1,284 @@
+import os
+import io
+import sys
+import json
+import gzip
+import zlib
+import random
+import tarfile
+import argparse
+
+# Same directory names as main.py's EDA_DIR and PDF_DIR, under the corpus root
+SRC_DIR_NAME = "arxiv_data_s3"
+PDF_DIR_NAME = "arxiv_s3_pdf"
+MANIFEST_FILE = "corpus.json"
+
+# Every tar member and .gz gets this mtime so the same seed always gives byte-identical tars
+MTIME = 1262304000
+
+# Kinds of source papers and how often they occur: a .gz holding a tar of the paper's files,
+# a .gz holding a single .tex, a .gz of something that isn't LaTeX, and a truncated .gz
+PAPER_KINDS = {'tar': 0.7, 'tex': 0.15, 'other': 0.1, 'corrupt': 0.05}
+
+FIGURE_EXTENSIONS = ['.eps', '.ps', '.png', '.pdf', '.jpg']
+
+WORDS = ("the of a model we data field energy results which show that for is on with this as by "
+         "are from at an be observed mass two phase spin these theory our density function using "
+         "galaxies temperature order large system quantum can where between two-dimensional").split()
+
+DEFAULT_MONTHS = 2
+DEFAULT_TARS_PER_MONTH = 2
+DEFAULT_PAPERS_PER_TAR = 50
+
+
+def paper_id(month, number):
+    """arXiv id of a paper: new-style 2310.00042 from 0704 on, old-style astro-ph0001042 before."""
+    if month >= '0704':
+        return f"{month}.{number:05d}"
+    return f"astro-ph{month}{number:03d}"
+
+def months_back(first_month, count):
+    """count YYMM months going back from first_month, e.g. 2310, 2309, ..."""
+    year, month = int(first_month[:2]), int(first_month[2:])
+    months = []
+    for _ in range(count):
+        months.append(f"{year:02d}{month:02d}")
+        year, month = (year, month - 1) if month > 1 else ((year - 1) % 100, 12)
+    return months
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+def tar_bytes(files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w', format=tarfile.GNU_FORMAT) as tar:
+        for name, data in files:
+            add_member(tar, name, data)
+    return buffer.getvalue()
+
+def add_member(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = MTIME
+    tar.addfile(info, io.BytesIO(data))
+
+
+def latex_source(rng, figures, tex_kb):
+    """
+    A paper's main .tex with the figure references, tables and equations figureTable looks for,
+    in every syntax it knows, with body text up to about tex_kb KB.
+    """
+    columns = '[twocolumn]' if rng.random() < 0.4 else '[12pt]'
+    lines = [f"\\documentclass{columns}{{article}}", "\\usepackage{graphicx}", "\\usepackage{amsmath}",
+             "\\begin{document}", f"\\title{{{words(rng, 6)}}}", "\\maketitle",
+             # Commented out figures are not counted
+             "% \\includegraphics{old_figure}"]
+    figure_lines = []
+    for reference in figures:
+        style = rng.random()
+        if style < 0.7:
+            figure_lines.append(f"\\begin{{figure}}\\includegraphics[width=0.45\\textwidth]{{{reference}}}"
+                                f"\\caption{{{words(rng, 8)}}}\\end{{figure}}")
+        elif style < 0.85:
+            figure_lines.append(f"\\psfig{{file={reference},width=7cm}}")
+        else:
+            figure_lines.append(f"\\epsfbox{{{reference}}}")
+    for _ in range(rng.randint(0, 3)):
+        figure_lines.append(f"\\begin{{table}}\\begin{{tabular}}{{cc}} {words(rng, 2)} & {rng.random():.3f} "
+                            f"\\\\ \\end{{tabular}}\\end{{table}}")
+    equations = ["\\begin{equation} E = mc^2 \\end{equation}", "$$ \\int_0^1 f(x) dx $$",
+                 "\\[ a^2 + b^2 = c^2 \\]", "\\begin{align*} x &= y \\\\ y &= z \\end{align*}",
+                 "\\begin{eqnarray} H \\psi = E \\psi \\end{eqnarray}"]
+    figure_lines.extend(rng.choice(equations) for _ in range(rng.randint(0, 6)))
+    rng.shuffle(figure_lines)
+
+    size = sum(len(line) for line in lines)
+    for line in figure_lines:
+        lines.append(f"\\section{{{words(rng, 3)}}}")
+        lines.append(words(rng, rng.randint(20, 80)))
+        lines.append(line)
+        size += len(line) + 600
+    while size < tex_kb * 1024:
+        paragraph = words(rng, rng.randint(40, 160))
+        lines.append(paragraph)
+        size += len(paragraph)
+    lines.append("\\end{document}")
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+def figure_files(rng):
+    """(reference in the .tex, file name in the paper's tar or None if it is missing) for a paper's figures."""
+    figures = []
+    for i in range(rng.randint(0, 6)):
+        extension = rng.choice(FIGURE_EXTENSIONS)
+        file_name = f"figs/fig{i + 1}{extension}" if rng.random() < 0.5 else f"fig{i + 1}{extension}"
+        # References often leave out the extension
+        reference = file_name if rng.random() < 0.5 else file_name[:-len(extension)]
+        figures.append((reference, None if rng.random() < 0.15 else file_name))
+    return figures
+
+def source_paper(rng, kind, figure_kb, tex_kb):
+    """The .gz of a source paper of the given PAPER_KINDS kind."""
+    if kind == 'tar':
+        figures = figure_files(rng)
+        files = [("main.tex", latex_source(rng, [reference for reference, _ in figures], tex_kb))]
+        # Figures are as incompressible as real images
+        files += [(file_name, rng.randbytes(rng.randint(figure_kb * 512, figure_kb * 1536)))
+                  for _, file_name in figures if file_name is not None]
+        if rng.random() < 0.3:
+            files.append(("refs.bib", f"@article{{ref1, title={{{words(rng, 5)}}}}}\n".encode('utf-8')))
+        if rng.random() < 0.3:
+            files.append(("macros.sty", b"\\newcommand{\\vect}[1]{\\mathbf{#1}}\n"))
+        if rng.random() < 0.2:
+            files.append(("__MACOSX/._main.tex", rng.randbytes(82)))
+        return gzip.compress(tar_bytes(files), mtime=MTIME)
+    if kind == 'tex':
+        return gzip.compress(latex_source(rng, [], tex_kb), mtime=MTIME)
+    if kind == 'other':
+        return gzip.compress(b"%!PS-Adobe-2.0\n" + words(rng, 200).encode('utf-8'), mtime=MTIME)
+    data = gzip.compress(latex_source(rng, [], tex_kb), mtime=MTIME)
+    return data[:len(data) // 2]
+
+def pdf_document(rng, pages, pdf_kb):
+    """A valid PDF of the given number of pages, about pdf_kb KB, with a classic xref table."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % (3 + 2 * i) for i in range(pages))
+               + b"] /Count %d >>" % pages]
+    per_page = max(pdf_kb * 1024 // pages, 64)
+    for i in range(pages):
+        text = (f"BT /F1 10 Tf 72 720 Td ({words(rng, 12)}) Tj ET\n".encode('utf-8')
+                + rng.randbytes(per_page).hex().encode('ascii'))
+        content = zlib.compress(text)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> >> >> >>"
+                       % (4 + 2 * i))
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(content) + content + b"\nendstream")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.writelines(b"%010d 00000 n \n" % offset for offset in offsets)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def generate_corpus(root, months=DEFAULT_MONTHS, tars_per_month=DEFAULT_TARS_PER_MONTH,
+                    papers_per_tar=DEFAULT_PAPERS_PER_TAR, first_month='2310', seed=0, figure_kb=64, tex_kb=16,
+                    pdf_kb=128, max_pages=30, missing_pdf_rate=0.03, missing_source_rate=0.03,
+                    source_pdf_rate=0.02, corrupt_tars=0):
+    """
+    Write a reproducible fake arXiv dump under root: arXiv_src_YYMM_NNN.tar files of .gz papers in
+    SRC_DIR_NAME and the matching arXiv_pdf_YYMM_NNN.tar files in PDF_DIR_NAME, plus a MANIFEST_FILE
+    with the parameters and counts. Some papers have no PDF or no source, some source tars hold
+    PDFs (with __MACOSX junk) for sourcePDFcopy, and corrupt_tars source tars are cut short.
+    Returns the manifest.
+    """
+    rng = random.Random(seed)
+    src_dir = os.path.join(root, SRC_DIR_NAME)
+    pdf_dir = os.path.join(root, PDF_DIR_NAME)
+    os.makedirs(src_dir, exist_ok=True)
+    os.makedirs(pdf_dir, exist_ok=True)
+    kinds, weights = zip(*PAPER_KINDS.items())
+
+    counts = {'source_tars': 0, 'pdf_tars': 0, 'papers': 0, 'source_papers': 0, 'pdf_papers': 0,
+              'source_pdfs': 0, 'corrupt_tars': 0, 'source_bytes': 0, 'pdf_bytes': 0}
+    kind_counts = dict.fromkeys(kinds, 0)
+    tar_names = [(month, chunk) for month in months_back(first_month, months) for chunk in range(1, tars_per_month + 1)]
+    corrupt = set(rng.sample(range(len(tar_names)), min(corrupt_tars, len(tar_names))))
+
+    for index, (month, chunk) in enumerate(tar_names):
+        src_path = os.path.join(src_dir, f"arXiv_src_{month}_{chunk:03d}.tar")
+        pdf_path = os.path.join(pdf_dir, f"arXiv_pdf_{month}_{chunk:03d}.tar")
+        with tarfile.open(src_path, 'w', format=tarfile.GNU_FORMAT) as src_tar, \
+                tarfile.open(pdf_path, 'w', format=tarfile.GNU_FORMAT) as pdf_tar:
+            for number in range((chunk - 1) * papers_per_tar + 1, chunk * papers_per_tar + 1):
+                paper = paper_id(month, number)
+                counts['papers'] += 1
+                missing = rng.random()
+                if missing >= missing_source_rate:
+                    kind = rng.choices(kinds, weights)[0]
+                    kind_counts[kind] += 1
+                    add_member(src_tar, f"{month}/{paper}.gz", source_paper(rng, kind, figure_kb, tex_kb))
+                    counts['source_papers'] += 1
+                if missing < missing_source_rate or missing >= missing_source_rate + missing_pdf_rate:
+                    pdf = pdf_document(rng, rng.randint(1, max_pages), rng.randint(pdf_kb // 2, pdf_kb * 3 // 2))
+                    add_member(pdf_tar, f"{month}/{paper}.pdf", pdf)
+                    counts['pdf_papers'] += 1
+                if rng.random() < source_pdf_rate:
+                    # A paper submitted as PDF only, as sourcePDFcopy finds them, and its macOS metadata
+                    add_member(src_tar, f"{month}/{paper}v2.pdf", pdf_document(rng, rng.randint(1, max_pages), pdf_kb))
+                    add_member(src_tar, f"__MACOSX/{month}/._{paper}v2.pdf", rng.randbytes(82))
+                    counts['source_pdfs'] += 1
+        if index in corrupt:
+            with open(src_path, 'r+b') as f:
+                f.truncate(os.path.getsize(src_path) * 2 // 3)
+            counts['corrupt_tars'] += 1
+        counts['source_tars'] += 1
+        counts['pdf_tars'] += 1
+        counts['source_bytes'] += os.path.getsize(src_path)
+        counts['pdf_bytes'] += os.path.getsize(pdf_path)
+
+    manifest = {
+        'parameters': {
+            'months': months, 'tars_per_month': tars_per_month, 'papers_per_tar': papers_per_tar,
+            'first_month': first_month, 'seed': seed, 'figure_kb': figure_kb, 'tex_kb': tex_kb, 'pdf_kb': pdf_kb,
+            'max_pages': max_pages, 'missing_pdf_rate': missing_pdf_rate,
+            'missing_source_rate': missing_source_rate, 'source_pdf_rate': source_pdf_rate,
+            'corrupt_tars': corrupt_tars
+        },
+        'counts': counts,
+        'source_paper_kinds': kind_counts
+    }
+    with open(os.path.join(root, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def add_corpus_arguments(parser):
+    """The generate_corpus parameters as options, shared with benchPipeline.py."""
+    parser.add_argument("--months", type=int, default=DEFAULT_MONTHS, help="months of tars (default: %(default)s)")
+    parser.add_argument("--tars-per-month", type=int, default=DEFAULT_TARS_PER_MONTH,
+                        help="source/PDF tar pairs per month (default: %(default)s)")
+    parser.add_argument("--papers", type=int, default=DEFAULT_PAPERS_PER_TAR,
+                        help="papers per tar (default: %(default)s)")
+    parser.add_argument("--first-month", default='2310',
+                        help="YYMM of the newest month; months before 0704 get old-style ids (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed; the same seed gives the same tars")
+    parser.add_argument("--figure-kb", type=int, default=64, help="average size of a figure file in KB")
+    parser.add_argument("--tex-kb", type=int, default=16, help="approximate size of a paper's .tex in KB")
+    parser.add_argument("--pdf-kb", type=int, default=128, help="average size of a PDF in KB")
+    parser.add_argument("--max-pages", type=int, default=30, help="most pages a PDF can have")
+    parser.add_argument("--missing-pdf-rate", type=float, default=0.03, help="share of papers without a PDF")
+    parser.add_argument("--missing-source-rate", type=float, default=0.03, help="share of papers without a source")
+    parser.add_argument("--source-pdf-rate", type=float, default=0.02,
+                        help="share of papers that also have a PDF inside the source tar")
+    parser.add_argument("--corrupt-tars", type=int, default=0, help="number of source tars to cut short")
+
+def corpus_options(args):
+    return dict(months=args.months, tars_per_month=args.tars_per_month, papers_per_tar=args.papers,
+                first_month=args.first_month, seed=args.seed, figure_kb=args.figure_kb, tex_kb=args.tex_kb,
+                pdf_kb=args.pdf_kb, max_pages=args.max_pages, missing_pdf_rate=args.missing_pdf_rate,
+                missing_source_rate=args.missing_source_rate, source_pdf_rate=args.source_pdf_rate,
+                corrupt_tars=args.corrupt_tars)
+
+def print_manifest(root, manifest):
+    counts = manifest['counts']
+    print(f"Corpus in {root}: {counts['source_tars']} source tars ({counts['source_bytes'] / 1e6:.1f} MB, "
+          f"{counts['source_papers']} papers), {counts['pdf_tars']} PDF tars ({counts['pdf_bytes'] / 1e6:.1f} MB, "
+          f"{counts['pdf_papers']} PDFs)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic arXiv source/PDF tar dump")
+    parser.add_argument("root", help=f"directory to write {SRC_DIR_NAME}/ and {PDF_DIR_NAME}/ into")
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+
+    if os.path.exists(os.path.join(args.root, MANIFEST_FILE)):
+        sys.exit(f"{args.root} already holds a corpus; remove it or pick another directory")
+    print_manifest(args.root, generate_corpus(args.root, **corpus_options(args)))
+
+if __name__ == "__main__":
+    main()
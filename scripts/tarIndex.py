@@ -0,0 +1,102 @@
+import os
+import json
+import tarfile
+import argparse
+
+# Bump when the record layout changes so older sidecars are rebuilt
+INDEX_VERSION = 1
+
+# The index of arXiv_src_0001_001.tar is stored next to it as arXiv_src_0001_001.tar.index.json
+INDEX_SUFFIX = '.index.json'
+
+
+def index_path(tar_path):
+    return tar_path + INDEX_SUFFIX
+
+def member_record(member):
+    return [member.name, member.type.decode('latin-1'), member.offset, member.offset_data,
+            member.size, member.mode, member.mtime, member.linkname]
+
+def member_from_record(record):
+    """Rebuild a TarInfo that extractfile/extract can use without reading its header."""
+    name, member_type, offset, offset_data, size, mode, mtime, linkname = record
+    member = tarfile.TarInfo(name)
+    member.type = member_type.encode('latin-1')
+    member.offset = offset
+    member.offset_data = offset_data
+    member.size = size
+    member.mode = mode
+    member.mtime = mtime
+    member.linkname = linkname
+    return member
+
+def load_index(tar_path):
+    """Members from the sidecar index, or None if there is none or the tar changed since."""
+    try:
+        with open(index_path(tar_path)) as f:
+            index = json.load(f)
+        st = os.stat(tar_path)
+    except (OSError, ValueError):
+        return None
+    if (index.get('version') != INDEX_VERSION or index.get('tar_size') != st.st_size
+            or index.get('tar_mtime_ns') != st.st_mtime_ns):
+        return None
+    return [member_from_record(record) for record in index['members']]
+
+def save_index(tar_path, members):
+    st = os.stat(tar_path)
+    index = {
+        'version': INDEX_VERSION,
+        'tar_size': st.st_size,
+        'tar_mtime_ns': st.st_mtime_ns,
+        'members': [member_record(member) for member in members]
+    }
+    path = index_path(tar_path)
+    temp_path = path + '.tmp'
+    try:
+        with open(temp_path, 'w') as f:
+            json.dump(index, f, separators=(',', ':'))
+        os.replace(temp_path, path)
+    except OSError as e:
+        # A read-only data directory only costs the header walk on the next run
+        print(f"Could not save tar index {path}: {e}")
+
+def tar_members(tar_path):
+    """
+    Members of tar_path in archive order, like TarFile.getmembers().
+    The header chain is only walked when there is no valid sidecar index, which is then saved;
+    a broken tar raises the same tarfile errors as getmembers().
+    """
+    members = load_index(tar_path)
+    if members is None:
+        with tarfile.open(tar_path, 'r') as tar:
+            members = tar.getmembers()
+        save_index(tar_path, members)
+    return members
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or show the sidecar member indexes of tar files")
+    parser.add_argument("paths", nargs='+', help="tar files or directories containing them")
+    parser.add_argument("--list", action="store_true", help="print each member's name, offset and size")
+    args = parser.parse_args()
+
+    tar_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            tar_paths.extend(os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith('.tar'))
+        else:
+            tar_paths.append(path)
+
+    for tar_path in tar_paths:
+        try:
+            members = tar_members(tar_path)
+        except (OSError, tarfile.TarError) as e:
+            print(f"Error indexing {tar_path}: {e}")
+            continue
+        print(f"{tar_path}: {len(members)} members")
+        if args.list:
+            for member in members:
+                print(f"  {member.offset_data:>12} {member.size:>12} {member.name}")
+
+if __name__ == "__main__":
+    main()